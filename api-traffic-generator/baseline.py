@@ -0,0 +1,146 @@
+import os, json, logging, tempfile, time
+from typing import Any, Dict, List, Optional
+from .config import get_settings
+from . import keyspace, metrics, saturation
+
+log = logging.getLogger("baseline")
+
+# Exit code of a run whose summary regressed against the baseline
+EXIT_REGRESSION = 3
+
+def _key(row: Dict[str, Any]) -> str:
+    return f"{row['scenario']} {row['route']}"
+
+def _current_rows() -> List[Dict[str, Any]]:
+    return [r for r in metrics.REGISTRY.summary() if metrics.is_http_route(r["route"])]
+
+def _key_selection() -> Dict[str, Any]:
+    # what decides which keys were hot; pick counts vary run to run
+    d = keyspace.describe()
+    return {"seed": d["seed"], "distribution": d["distribution"],
+            "kinds": {k: {f: v for f, v in row.items() if f not in ("picks", "top_decile_share")}
+                      for k, row in d["kinds"].items()}}
+
+# ---------- baseline file ----------
+def save(path: str, rows: List[Dict[str, Any]]) -> None:
+    doc = {
+        "task": os.environ.get("TASK"),
+        "recorded_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "key_selection": _key_selection(),
+        "routes": {
+            _key(r): {k: r[k] for k in ("scenario", "route", "count", "rps", "error_rate", "p50_ms", "p99_ms")}
+            for r in rows
+        },
+    }
+    d = os.path.dirname(path) or "."
+    os.makedirs(d, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(prefix=".baseline.", dir=d)
+    with os.fdopen(fd, "w") as f:
+        json.dump(doc, f, indent=2, sort_keys=True)
+    os.chmod(tmp, 0o644)
+    os.replace(tmp, path)
+
+def load(path: str) -> Dict[str, Any]:
+    with open(path) as f:
+        return json.load(f)
+
+# ---------- comparison ----------
+def compare(baseline: Dict[str, Dict[str, Any]], rows: List[Dict[str, Any]],
+            p50_tol: float, p99_tol: float, error_rate_tol: float, rps_tol: float,
+            min_count: int) -> Dict[str, Any]:
+    """
+    Latency tolerances are relative increases (0.25 = p50 may grow 25%), rps a
+    relative drop, error rate an absolute increase (0.01 = one percentage point).
+    Routes with fewer than `min_count` requests on either side are too noisy
+    to judge and are reported as skipped.
+    """
+    current = {_key(r): r for r in rows}
+    routes: List[Dict[str, Any]] = []
+    regressions: List[Dict[str, Any]] = []
+    skipped: List[str] = []
+
+    def check(key: str, metric: str, base: Optional[float], cur: Optional[float], limit: Optional[float], worse: bool):
+        entry = {"baseline": base, "current": cur, "limit": limit, "regressed": worse}
+        if worse:
+            regressions.append({"key": key, "metric": metric, "baseline": base, "current": cur, "limit": limit})
+        return entry
+
+    for key, base in sorted(baseline.items()):
+        cur = current.get(key)
+        if cur is None:
+            skipped.append(key)
+            routes.append({"key": key, "status": "missing"})
+            continue
+        if cur["count"] < min_count or base.get("count", 0) < min_count:
+            skipped.append(key)
+            routes.append({"key": key, "status": "too_few_requests", "count": cur["count"]})
+            continue
+        m: Dict[str, Any] = {}
+        for metric, tol in (("p50_ms", p50_tol), ("p99_ms", p99_tol)):
+            b, c = base.get(metric), cur.get(metric)
+            limit = round(b * (1 + tol), 3) if b is not None else None
+            m[metric] = check(key, metric, b, c, limit, limit is not None and c is not None and c > limit)
+        b, c = base.get("error_rate") or 0.0, cur.get("error_rate") or 0.0
+        limit = round(b + error_rate_tol, 5)
+        m["error_rate"] = check(key, "error_rate", b, c, limit, c > limit)
+        b, c = base.get("rps"), cur.get("rps")
+        limit = round(b * (1 - rps_tol), 3) if b is not None else None
+        m["rps"] = check(key, "rps", b, c, limit, limit is not None and c is not None and c < limit)
+        routes.append({"key": key, "status": "regressed" if any(v["regressed"] for v in m.values()) else "ok", **m})
+
+    return {
+        "passed": not regressions,
+        "regressions": regressions,
+        "skipped": skipped,
+        "new_routes": sorted(set(current) - set(baseline)),
+        "routes": routes,
+    }
+
+# ---------- end-of-run gate ----------
+def gate() -> bool:
+    """
+    BASELINE_MODE=record writes this run's summary to BASELINE_FILE;
+    BASELINE_MODE=check compares against it. False means a regression (the
+    caller exits with EXIT_REGRESSION); disabled or recording always passes.
+    """
+    s = get_settings()
+    if not s.baseline_file or s.baseline_mode not in ("check", "record"):
+        return True
+    rows = _current_rows()
+
+    if s.baseline_mode == "record":
+        save(s.baseline_file, rows)
+        log.info(json.dumps({"event": "baseline_recorded", "path": s.baseline_file, "routes": len(rows)}))
+        return True
+
+    try:
+        doc = load(s.baseline_file)
+    except (OSError, ValueError) as e:
+        # no baseline yet: nothing to regress against
+        log.warning(json.dumps({"event": "baseline_unavailable", "path": s.baseline_file, "error": str(e)}))
+        return True
+
+    result = compare(
+        doc.get("routes") or {}, rows,
+        p50_tol=s.baseline_p50_tolerance,
+        p99_tol=s.baseline_p99_tolerance,
+        error_rate_tol=s.baseline_error_rate_tolerance,
+        rps_tol=s.baseline_rps_tolerance,
+        min_count=s.baseline_min_count,
+    )
+    event = {
+        "event": "baseline_check",
+        "path": s.baseline_file,
+        "baseline_recorded_at": doc.get("recorded_at"),
+        # a regression measured by a saturated generator may be our own queueing
+        "generator_bound": saturation.generator_bound(),
+        **result,
+    }
+    # a different key skew changes cache hit rates: latency deltas may not be the server's doing
+    if "key_selection" in doc and doc["key_selection"] != _key_selection():
+        event["key_selection_differs"] = {"baseline": doc["key_selection"], "current": _key_selection()}
+    if result["passed"]:
+        log.info(json.dumps(event))
+    else:
+        log.error(json.dumps(event))
+    return result["passed"]
@@ -0,0 +1,184 @@
+import os, json, logging, time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from .mix import WeightedPicker, parse_spec
+from .pacing import run_open_loop
+from . import checkpoint, metrics
+
+log = logging.getLogger("capacity")
+
+# ---------- what to load ----------
+def _target(tasks: Dict[str, Callable[[], None]], name: str) -> Callable[[], None]:
+    """One call of scenario `name`, or of a MIX_SPEC-weighted pick when name is "mix"."""
+    if name == "mix":
+        picker = WeightedPicker(parse_spec(os.getenv("MIX_SPEC", ""), tasks))
+        pick = picker.next
+    elif name in tasks:
+        pick = lambda: name
+    else:
+        raise ValueError(f"unknown CAPACITY_TARGET: {name!r}")
+
+    def _one():
+        sc = pick()
+        t0 = time.perf_counter()
+        ok = False
+        try:
+            with metrics.scenario(sc):
+                tasks[sc]()
+            ok = True
+        finally:
+            metrics.record_op(sc, ok, time.perf_counter() - t0)
+    return _one
+
+# ---------- one load level ----------
+class Level:
+    def __init__(self, rate: float, stats: Dict[str, int], elapsed: float,
+                 routes: Dict[str, Dict[str, Any]], slo_p99_ms: float, slo_error_rate: float):
+        self.rate = rate
+        self.stats = stats
+        self.routes = routes
+        offered = stats["submitted"] + stats["dropped"]
+        self.achieved_rps = round(stats["submitted"] / elapsed, 3) if elapsed > 0 else 0.0
+        self.drop_rate = round(stats["dropped"] / offered, 5) if offered else 0.0
+        # per endpoint: the reasons it missed the SLO at this level (empty = ok)
+        self.violations: Dict[str, List[str]] = {}
+        for key, r in routes.items():
+            v = []
+            # judged from intended send time: queueing behind slow calls is part of what users see
+            p99 = r.get("p99_from_intended_ms") or r["p99_ms"]
+            if p99 is not None and p99 > slo_p99_ms:
+                v.append("p99")
+            if r["error_rate"] > slo_error_rate:
+                v.append("error_rate")
+            self.violations[key] = v
+        # ticks the pacer had to drop mean calls were backing up: the offered load wasn't sustained
+        self.saturated = self.drop_rate > slo_error_rate
+        self.ok = not self.saturated and not any(self.violations.values())
+
+    def event(self, phase: str) -> Dict[str, Any]:
+        return {
+            "event": "capacity_level",
+            "phase": phase,
+            "target_rps": self.rate,
+            "achieved_rps": self.achieved_rps,
+            "drop_rate": self.drop_rate,
+            "ok": self.ok,
+            "failed_endpoints": {k: v for k, v in self.violations.items() if v},
+            "saturated": self.saturated,
+            "routes": self.routes,
+        }
+
+def _window(before: Dict[Tuple[str, str], metrics.Series], elapsed: float) -> Dict[str, Dict[str, Any]]:
+    out = {}
+    for (sc, rt), s in sorted(metrics.REGISTRY.series().items()):
+        if not metrics.is_http_route(rt):
+            continue
+        w = s.since(before.get((sc, rt)))
+        if w.hist.count:
+            row = w.summary(elapsed)
+            out[f"{sc} {rt}"] = {k: row[k] for k in ("count", "rps", "error_rate", "p50_ms", "p99_ms")}
+            if "from_intended" in row:
+                out[f"{sc} {rt}"]["p99_from_intended_ms"] = row["from_intended"]["p99_ms"]
+    return out
+
+# ---------- search ----------
+class CapacitySearch:
+    """
+    Stepped load (start, start*factor, ...) until a level misses the SLO, then
+    binary search between the last good and first bad rate. Each level runs
+    open-loop for `step_seconds` and is judged only on the requests it made.
+    """
+
+    def __init__(self, fn: Callable[[], None], name: str):
+        self.fn = fn
+        self.name = name
+        self.start_rps = float(os.getenv("CAPACITY_START_RPS", "1"))
+        self.factor = float(os.getenv("CAPACITY_FACTOR", "2"))
+        self.max_rps = float(os.getenv("CAPACITY_MAX_RPS", "1000"))
+        self.step_seconds = float(os.getenv("CAPACITY_STEP_SECONDS", "30"))
+        self.cooldown = float(os.getenv("CAPACITY_COOLDOWN_SECONDS", "5"))
+        self.precision = float(os.getenv("CAPACITY_PRECISION", "0.1"))
+        if self.start_rps <= 0 or self.max_rps <= 0:
+            raise ValueError("CAPACITY_START_RPS and CAPACITY_MAX_RPS must be > 0")
+        if self.factor <= 1:
+            raise ValueError(f"CAPACITY_FACTOR must be > 1, got {self.factor:g}")
+        self.concurrency = int(os.getenv("CAPACITY_CONCURRENCY", "64"))
+        self.slo_p99_ms = float(os.getenv("CAPACITY_SLO_P99_MS", "500"))
+        self.slo_error_rate = float(os.getenv("CAPACITY_SLO_ERROR_RATE", "0.01"))
+        self.levels: List[Level] = []
+
+    def _run_level(self, rate: float, phase: str) -> Level:
+        if self.levels and self.cooldown > 0:
+            time.sleep(self.cooldown)
+        before = metrics.REGISTRY.series()
+        t0 = time.monotonic()
+        stats = run_open_loop(self.fn, rate, self.step_seconds, self.concurrency, f"capacity_{self.name}")
+        elapsed = time.monotonic() - t0
+        level = Level(rate, stats, elapsed, _window(before, elapsed), self.slo_p99_ms, self.slo_error_rate)
+        self.levels.append(level)
+        log.info(json.dumps(level.event(phase)))
+        return level
+
+    def run(self) -> Dict[str, Any]:
+        good: Optional[float] = None
+        bad: Optional[float] = None
+        rate = self.start_rps
+        while rate <= self.max_rps:
+            if self._run_level(rate, "step").ok:
+                good = rate
+                rate = round(rate * self.factor, 3)
+            else:
+                bad = rate
+                break
+        if bad is not None and good is not None:
+            while (bad - good) / good > self.precision:
+                mid = round((good + bad) / 2, 3)
+                if self._run_level(mid, "bisect").ok:
+                    good = mid
+                else:
+                    bad = mid
+        return self.result(good, bad)
+
+    def result(self, good: Optional[float], bad: Optional[float]) -> Dict[str, Any]:
+        # per endpoint: its own rps at the highest offered level it still met the SLO at
+        # (and every lower level too), and what broke it first
+        endpoints: Dict[str, Dict[str, Any]] = {}
+        for level in sorted(self.levels, key=lambda l: l.rate):
+            for key, r in level.routes.items():
+                e = endpoints.setdefault(key, {"max_sustainable_rps": None, "at_target_rps": None,
+                                               "p99_ms": None, "error_rate": None,
+                                               "first_failed_at_target_rps": None, "failed_on": None})
+                if e["first_failed_at_target_rps"] is not None:
+                    continue
+                if level.violations.get(key):
+                    e["first_failed_at_target_rps"] = level.rate
+                    e["failed_on"] = level.violations[key]
+                else:
+                    e.update(max_sustainable_rps=r["rps"], at_target_rps=level.rate,
+                             p99_ms=r["p99_ms"], error_rate=r["error_rate"])
+        return {
+            "event": "capacity_result",
+            "target": self.name,
+            "slo": {"p99_ms": self.slo_p99_ms, "error_rate": self.slo_error_rate},
+            "max_sustainable_rps": good,
+            "first_failing_rps": bad,
+            # every level passed up to CAPACITY_MAX_RPS: capacity is at least `good`
+            "hit_max_rps": bad is None and good is not None,
+            "levels_run": len(self.levels),
+            "endpoints": endpoints,
+        }
+
+def run_capacity_search(tasks: Dict[str, Callable[[], None]]) -> None:
+    """TASK=capacity_search: find the highest rate CAPACITY_TARGET sustains within the SLO."""
+    name = os.getenv("CAPACITY_TARGET", "mix")
+    checkpoint.set_durable(False)
+    search = CapacitySearch(_target(tasks, name), name)
+    log.info(json.dumps({
+        "event": "capacity_search_started",
+        "target": name,
+        "start_rps": search.start_rps,
+        "factor": search.factor,
+        "max_rps": search.max_rps,
+        "step_seconds": search.step_seconds,
+        "slo": {"p99_ms": search.slo_p99_ms, "error_rate": search.slo_error_rate},
+    }))
+    log.info(json.dumps(search.run()))
@@ -0,0 +1,145 @@
+import os, json, logging, tempfile, time
+from typing import Any, Dict, Optional, Set
+from .config import get_settings
+
+log = logging.getLogger("checkpoint")
+
+# Checkpoints opened but not completed in this process; flushed by save_open() on exit
+_open: Set["Checkpoint"] = set()
+_durable = True
+
+class Checkpoint:
+    """
+    Durable page cursor + completed-entity set for one scenario run.
+
+    `cursor` is the next page to fetch: every page before it has been fully
+    processed. `done` holds entity keys already created/handled so a resumed run
+    never re-posts them. State is written atomically at most every
+    `interval_seconds`; with no `path` it is kept in memory only.
+    """
+
+    def __init__(self, name: str, path: Optional[str], interval_seconds: float,
+                 params: Dict[str, Any], start_cursor: Any):
+        self.name = name
+        self.path = path
+        self.interval_seconds = interval_seconds
+        self.params = params
+        self.cursor = start_cursor
+        self.done: Set[str] = set()
+        self.resumed = False
+        self._dirty = False
+        self._last_commit = time.monotonic()
+        self._load()
+
+    # ----- persistence -----
+    def _load(self) -> None:
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path) as f:
+                state = json.load(f)
+        except (OSError, ValueError) as e:
+            log.warning(json.dumps({"event": "checkpoint_unreadable", "name": self.name, "error": str(e)}))
+            return
+        # A checkpoint from a run with different knobs (page size, floors, ...) does not apply
+        if state.get("params") != self.params:
+            log.info(json.dumps({"event": "checkpoint_params_changed", "name": self.name}))
+            return
+        self.cursor = state.get("cursor", self.cursor)
+        self.done = set(state.get("done") or [])
+        self.resumed = True
+        log.info(json.dumps({
+            "event": "checkpoint_resumed",
+            "name": self.name,
+            "cursor": self.cursor,
+            "done": len(self.done),
+            "saved_at": state.get("saved_at"),
+        }))
+
+    def commit(self) -> None:
+        self._last_commit = time.monotonic()
+        if not self.path or not self._dirty:
+            return
+        state = {
+            "name": self.name,
+            "params": self.params,
+            "cursor": self.cursor,
+            "done": sorted(self.done),
+            "saved_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        }
+        d = os.path.dirname(self.path) or "."
+        fd, tmp = tempfile.mkstemp(prefix=f".{self.name}.", dir=d)
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(state, f, separators=(",", ":"))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, self.path)
+        except OSError as e:
+            log.warning(json.dumps({"event": "checkpoint_write_failed", "name": self.name, "error": str(e)}))
+            try:
+                os.unlink(tmp)
+            except OSError:
+                pass
+            return
+        self._dirty = False
+
+    def _maybe_commit(self) -> None:
+        if time.monotonic() - self._last_commit >= self.interval_seconds:
+            self.commit()
+
+    # ----- progress -----
+    def is_done(self, key: str) -> bool:
+        return key in self.done
+
+    def mark_done(self, key: str) -> None:
+        self.done.add(key)
+        self._dirty = True
+        self._maybe_commit()
+
+    def advance(self, cursor: Any) -> None:
+        """Record that everything before `cursor` is processed."""
+        self.cursor = cursor
+        self._dirty = True
+        self._maybe_commit()
+
+    def complete(self) -> None:
+        """The run finished: the next run starts from scratch."""
+        _open.discard(self)
+        if not self.path:
+            return
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+        log.info(json.dumps({"event": "checkpoint_complete", "name": self.name, "done": len(self.done)}))
+
+def open_checkpoint(name: str, params: Dict[str, Any], start_cursor: Any = 0) -> Checkpoint:
+    """Checkpoint for scenario `name`; durable when CHECKPOINT_DIR is set."""
+    s = get_settings()
+    path = None
+    if s.checkpoint_dir and _durable:
+        os.makedirs(s.checkpoint_dir, exist_ok=True)
+        path = os.path.join(s.checkpoint_dir, f"{name}.json")
+    ck = Checkpoint(name, path, s.checkpoint_interval_seconds, params, start_cursor)
+    if path:
+        _open.add(ck)
+    return ck
+
+def set_durable(durable: bool) -> None:
+    """Turn file checkpoints off for modes that run the same scenario concurrently (mix)."""
+    global _durable
+    _durable = durable
+
+def save_open(reason: str) -> None:
+    """Commit every unfinished checkpoint; run_task calls this when a task dies or is terminated."""
+    for ck in list(_open):
+        ck._dirty = True
+        ck.commit()
+        log.info(json.dumps({
+            "event": "checkpoint_saved_on_exit",
+            "name": ck.name,
+            "cursor": ck.cursor,
+            "done": len(ck.done),
+            "reason": reason,
+        }))
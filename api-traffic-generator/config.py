@@ -1,22 +1,145 @@
 import os
+from typing import Dict
 from pydantic import BaseModel, Field
 
 class Settings(BaseModel):
-    base_url: str = Field(..., alias="BASE_URL")
+    # Default for every named target (see Target); may be left unset when each target has its own
+    base_url: str | None = Field(default=None, alias="BASE_URL")
     api_token: str | None = Field(default=None, alias="API_TOKEN")  # e.g., Bearer token
     connect_timeout: float = Field(default=3.0, alias="CONNECT_TIMEOUT")
     read_timeout: float = Field(default=10.0, alias="READ_TIMEOUT")
     log_level: str = Field(default="INFO", alias="LOG_LEVEL")
+    # Shared connection pool (one per process, used by every scenario)
+    max_connections: int = Field(default=100, alias="HTTP_MAX_CONNECTIONS")
+    max_keepalive_connections: int = Field(default=20, alias="HTTP_MAX_KEEPALIVE")
 
     # How long a scenario should run when looping (seconds)
     duration_seconds: int = Field(default=60, alias="DURATION_SECONDS")
 
+    # Local SQLite entity index (unset = disabled); mount a volume at this path to share across runs
+    entity_index_path: str | None = Field(default=None, alias="ENTITY_INDEX_PATH")
+    # How long a completed crawl of an entity kind is trusted before scenarios re-crawl it
+    entity_index_ttl_seconds: float = Field(default=300.0, alias="ENTITY_INDEX_TTL_SECONDS")
+
+    # Reproducible runs: one seed for generated data, key picks and arrival times (unset = unseeded)
+    seed: int | None = Field(default=None, alias="SEED")
+    # How scenarios pick chains/motels/categories/dates: uniform, zipf[:s], hot[:fraction[:share]]
+    # (KEY_DISTRIBUTION_<KIND> overrides it per kind, see keyspace.py)
+    key_distribution: str = Field(default="uniform", alias="KEY_DISTRIBUTION")
+
+    # Crawl/seed checkpoints (unset = in-memory only); a killed run resumes from here
+    checkpoint_dir: str | None = Field(default=None, alias="CHECKPOINT_DIR")
+    checkpoint_interval_seconds: float = Field(default=5.0, alias="CHECKPOINT_INTERVAL_SECONDS")
+
+    # Page sizes chosen by PAGE_SIZE=auto / TASK=tune_page_size (unset = re-tuned in every process)
+    page_size_cache: str | None = Field(default=None, alias="PAGE_SIZE_CACHE")
+
+    # Warm-up: recorded separately (warmup_summary) until both thresholds are met and,
+    # with STEADY_STATE, the rolling mean latency has settled (or STEADY_STATE_MAX_SECONDS)
+    warmup_seconds: float = Field(default=0.0, alias="WARMUP_SECONDS")
+    warmup_requests: int = Field(default=0, alias="WARMUP_REQUESTS")
+    steady_state: bool = Field(default=False, alias="STEADY_STATE")
+    steady_state_window_seconds: float = Field(default=1.0, alias="STEADY_STATE_WINDOW_SECONDS")
+    steady_state_windows: int = Field(default=5, alias="STEADY_STATE_WINDOWS")
+    steady_state_cv: float = Field(default=0.15, alias="STEADY_STATE_CV")
+    steady_state_max_seconds: float = Field(default=30.0, alias="STEADY_STATE_MAX_SECONDS")
+
+    # Prometheus export: scrape endpoint for long-running pods, textfile/push at exit for one-shot pods
+    metrics_port: int | None = Field(default=None, alias="METRICS_PORT")
+    metrics_textfile: str | None = Field(default=None, alias="METRICS_TEXTFILE")
+    metrics_push_url: str | None = Field(default=None, alias="METRICS_PUSH_URL")
+
+    # Binary per-request results file (unset = disabled); read it with `python -m api-traffic-generator.report`
+    results_file: str | None = Field(default=None, alias="RESULTS_FILE")
+
+    # Shadow mode: requests also go to this candidate deployment and are compared (unset = disabled).
+    # Only reads are copied unless SHADOW_MIRROR_WRITES; SHADOW_API_TOKEN replaces API_TOKEN for it.
+    shadow_base_url: str | None = Field(default=None, alias="SHADOW_BASE_URL")
+    shadow_mirror_writes: bool = Field(default=False, alias="SHADOW_MIRROR_WRITES")
+    shadow_api_token: str | None = Field(default=None, alias="SHADOW_API_TOKEN")
+
+    # HTTP diagnostics (see diagnostics.py): failed requests, plus a sampled fraction of all requests,
+    # are logged with their bodies cut to DIAG_BODY_BYTES; headers only with DIAG_HEADERS
+    diag_on_error: bool = Field(default=True, alias="DIAG_ON_ERROR")
+    diag_sample_rate: float = Field(default=0.0, alias="DIAG_SAMPLE_RATE")
+    diag_body_bytes: int = Field(default=512, alias="DIAG_BODY_BYTES")
+    diag_headers: bool = Field(default=False, alias="DIAG_HEADERS")
+    diag_max_per_route: int = Field(default=20, alias="DIAG_MAX_PER_ROUTE")
+
+    # Live SLO: each HTTP route is judged over a sliding window while the run is going; a
+    # breach held for SLO_SUSTAIN evaluations aborts the run (unset thresholds = not checked)
+    slo_p99_ms: float | None = Field(default=None, alias="SLO_P99_MS")
+    slo_error_rate: float | None = Field(default=None, alias="SLO_ERROR_RATE")
+    slo_window_seconds: float = Field(default=30.0, alias="SLO_WINDOW_SECONDS")
+    slo_min_requests: int = Field(default=20, ge=1, alias="SLO_MIN_REQUESTS")
+    slo_sustain: int = Field(default=5, alias="SLO_SUSTAIN")
+    slo_interval_seconds: float = Field(default=1.0, alias="SLO_INTERVAL_SECONDS")
+
+    # Regression gate: "record" stores this run's per-route summary, "check" compares against it
+    baseline_file: str | None = Field(default=None, alias="BASELINE_FILE")
+    baseline_mode: str = Field(default="check", alias="BASELINE_MODE")
+    baseline_p50_tolerance: float = Field(default=0.25, alias="BASELINE_P50_TOLERANCE")  # relative increase
+    baseline_p99_tolerance: float = Field(default=0.5, alias="BASELINE_P99_TOLERANCE")   # relative increase
+    baseline_error_rate_tolerance: float = Field(default=0.01, alias="BASELINE_ERROR_RATE_TOLERANCE")  # absolute
+    baseline_rps_tolerance: float = Field(default=0.2, alias="BASELINE_RPS_TOLERANCE")   # relative drop
+    baseline_min_count: int = Field(default=20, alias="BASELINE_MIN_COUNT")
+
     class Config:
         populate_by_name = True
 
+# ---------- named targets ----------
+# Each service gets its own client (pool, timeouts, token, limits). A target reads
+# <NAME>_BASE_URL, <NAME>_API_TOKEN, <NAME>_CONNECT_TIMEOUT, <NAME>_READ_TIMEOUT,
+# <NAME>_HTTP_MAX_CONNECTIONS, <NAME>_HTTP_MAX_KEEPALIVE, <NAME>_SHADOW_BASE_URL and
+# <NAME>_SHADOW_API_TOKEN, falling back to the unprefixed setting.
+TARGETS = ("motel", "reservation")
+
+class Target(BaseModel):
+    name: str
+    base_url: str
+    api_token: str | None = None
+    connect_timeout: float
+    read_timeout: float
+    max_connections: int
+    max_keepalive_connections: int
+    shadow_base_url: str | None = None
+    shadow_api_token: str | None = None
+
+# Target field -> unprefixed env name (= Settings alias)
+_TARGET_ENV: Dict[str, str] = {
+    "base_url": "BASE_URL",
+    "api_token": "API_TOKEN",
+    "connect_timeout": "CONNECT_TIMEOUT",
+    "read_timeout": "READ_TIMEOUT",
+    "max_connections": "HTTP_MAX_CONNECTIONS",
+    "max_keepalive_connections": "HTTP_MAX_KEEPALIVE",
+    "shadow_base_url": "SHADOW_BASE_URL",
+    "shadow_api_token": "SHADOW_API_TOKEN",
+}
+
+def get_target(name: str) -> Target:
+    settings = get_settings()
+    prefix = name.upper() + "_"
+    values = {field: os.environ.get(prefix + env, getattr(settings, field)) for field, env in _TARGET_ENV.items()}
+    if not values["base_url"]:
+        raise ValueError(f"no base URL for target {name!r}: set {prefix}BASE_URL or BASE_URL")
+    return Target(name=name, **values)
+
 def get_settings() -> Settings:
     return Settings(
         **{k: v for k, v in os.environ.items() if k in {
-            "BASE_URL","API_TOKEN","CONNECT_TIMEOUT","READ_TIMEOUT","LOG_LEVEL","DURATION_SECONDS"
+            "BASE_URL","API_TOKEN","CONNECT_TIMEOUT","READ_TIMEOUT","LOG_LEVEL","DURATION_SECONDS",
+            "HTTP_MAX_CONNECTIONS","HTTP_MAX_KEEPALIVE",
+            "ENTITY_INDEX_PATH","ENTITY_INDEX_TTL_SECONDS","CHECKPOINT_DIR","CHECKPOINT_INTERVAL_SECONDS",
+            "PAGE_SIZE_CACHE","SEED","KEY_DISTRIBUTION",
+            "WARMUP_SECONDS","WARMUP_REQUESTS","STEADY_STATE","STEADY_STATE_WINDOW_SECONDS",
+            "STEADY_STATE_WINDOWS","STEADY_STATE_CV","STEADY_STATE_MAX_SECONDS",
+            "METRICS_PORT","METRICS_TEXTFILE","METRICS_PUSH_URL","RESULTS_FILE",
+            "SHADOW_BASE_URL","SHADOW_MIRROR_WRITES","SHADOW_API_TOKEN",
+            "DIAG_ON_ERROR","DIAG_SAMPLE_RATE","DIAG_BODY_BYTES","DIAG_HEADERS","DIAG_MAX_PER_ROUTE",
+            "SLO_P99_MS","SLO_ERROR_RATE","SLO_WINDOW_SECONDS","SLO_MIN_REQUESTS","SLO_SUSTAIN",
+            "SLO_INTERVAL_SECONDS",
+            "BASELINE_FILE","BASELINE_MODE","BASELINE_P50_TOLERANCE","BASELINE_P99_TOLERANCE",
+            "BASELINE_ERROR_RATE_TOLERANCE","BASELINE_RPS_TOLERANCE","BASELINE_MIN_COUNT"
         }}
     )
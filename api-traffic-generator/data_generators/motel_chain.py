@@ -1,37 +1,60 @@
-import random, uuid
+import uuid, threading
 from faker import Faker
+from ..keyspace import derive_seed, rng
+from .. import entity_index
+from .unique_names import names
 
 fake = Faker("en_US")
+# with SEED, the same sequence of chains every run
+if derive_seed("motel_chain:faker") is not None:
+    fake.seed_instance(derive_seed("motel_chain:faker"))
+_rng = rng("motel_chain")
 
 US_STATES = ["AL","AK","AZ","AR","CA","CO","CT","DE","FL","GA","HI","ID","IL","IN","IA","KS","KY",
              "LA","ME","MD","MA","MI","MN","MS","MO","MT","NE","NV","NH","NJ","NM","NY","NC","ND",
              "OH","OK","OR","PA","RI","SC","SD","TN","TX","UT","VT","VA","WA","WV","WI","WY"]
 
+_preload_lock = threading.Lock()
+_preloaded = False
+
+def _chain_names():
+    """Unique chain names; chains already in the entity index count as taken."""
+    global _preloaded
+    gen = names("chains")
+    if not _preloaded:
+        with _preload_lock:
+            if not _preloaded:
+                idx = entity_index.get_index()
+                if idx:
+                    gen.preload(row["name"] for row in idx.rows("chains"))
+                _preloaded = True
+    return gen
+
 def motel_chain_payload():
     chain_owner = fake.last_name()
-    brand_tag = random.choice(["Suites","Inns","Lodges","Residency","Boutique","Select"])
-    chain_name = f"The {chain_owner}'s {brand_tag}"
+    brand_tag = _rng.choice(["Suites","Inns","Lodges","Residency","Boutique","Select"])
+    chain_name = _chain_names().make(f"The {chain_owner}'s {brand_tag}")
     addr1 = f"{chain_name} {fake.street_name()}"
 
     payload = {
         "motelChainName": chain_name,
         "displayName": chain_name,
-        "state": random.choice(US_STATES),
+        "state": _rng.choice(US_STATES),
         "pincode": fake.postcode().replace(" ", "")[:10],
-        "status": random.choice(["Active","Active","Active","Inactive"]),
+        "status": _rng.choice(["Active","Active","Active","Inactive"]),
         "address": {
             "addressLine1": addr1[:60],
             "addressLine2": f"{fake.city()}, {fake.state_abbr()}",
-            "landmark": random.choice(["HEB","Walmart","Airport","Convention Center","Downtown"]),
-            "addressName": random.choice(["HeadQuarters","Main Office","Corporate"]),
+            "landmark": _rng.choice(["HEB","Walmart","Airport","Convention Center","Downtown"]),
+            "addressName": _rng.choice(["HeadQuarters","Main Office","Corporate"]),
             "status": "Active",
         },
         "contactInfo": {
             "phoneNumber": fake.msisdn()[:10],
             "email": fake.company_email(),
             "contactName": f"{fake.first_name()} {fake.last_name()}",
-            "contactPosition": random.choice(["CEO","COO","VP Ops","Director"]),
-            "contactType": random.choice(["Executive","Operations","Owner"]),
+            "contactPosition": _rng.choice(["CEO","COO","VP Ops","Director"]),
+            "contactType": _rng.choice(["Executive","Operations","Owner"]),
             "contactDescription": fake.sentence(nb_words=8),
             "status": "Active",
         }
@@ -0,0 +1,119 @@
+import os, hashlib, math, threading
+from typing import Any, Dict, Iterable
+
+# ---------- seen-set ----------
+class BloomFilter:
+    """
+    Fixed-size set membership: no false negatives, false positives at about
+    `error_rate` once `capacity` items are in. Memory is ~1.8 MB per million
+    items at 0.1%, whatever the names look like.
+    """
+
+    def __init__(self, capacity: int, error_rate: float):
+        if capacity <= 0 or not (0 < error_rate < 1):
+            raise ValueError(f"bloom filter needs capacity > 0 and 0 < error_rate < 1, got {capacity}, {error_rate}")
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.bits = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.bits / capacity * math.log(2)))
+        self._array = bytearray((self.bits + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item: str) -> Iterable[int]:
+        # double hashing: k positions from two 64-bit halves of one digest
+        d = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1, h2 = int.from_bytes(d[:8], "big"), int.from_bytes(d[8:], "big") | 1
+        return ((h1 + i * h2) % self.bits for i in range(self.hashes))
+
+    def __contains__(self, item: str) -> bool:
+        return all(self._array[p >> 3] & (1 << (p & 7)) for p in self._positions(item))
+
+    def add(self, item: str) -> None:
+        for p in self._positions(item):
+            self._array[p >> 3] |= 1 << (p & 7)
+        self.count += 1
+
+    def false_positive_rate(self) -> float:
+        """Expected rate at the current fill."""
+        return (1 - math.exp(-self.hashes * self.count / self.bits)) ** self.hashes
+
+# ---------- generator ----------
+class UniqueNames:
+    """
+    Makes generated names unique within the process: a base name seen before
+    gets the first free " 2", " 3", ... suffix. Suffixes depend only on the
+    sequence of base names, so with SEED the same names come out every run.
+    A Bloom false positive only skips a name that was in fact free, never
+    returns a duplicate.
+    """
+    # next suffix to try per base, so a common base doesn't re-probe from 2;
+    # only a hint (the filter decides), cleared when it outgrows this
+    _HINTS_MAX = 100_000
+
+    def __init__(self, kind: str, capacity: int, error_rate: float):
+        self.kind = kind
+        self.seen = BloomFilter(capacity, error_rate)
+        self.generated = 0
+        self.collisions = 0
+        self.probes = 0
+        self.preloaded = 0
+        self._next: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def preload(self, names: Iterable[str]) -> None:
+        """Names that already exist (e.g. from the entity index) so they are not generated again."""
+        with self._lock:
+            for n in names:
+                if n:
+                    self.seen.add(n)
+                    self.preloaded += 1
+
+    def make(self, base: str) -> str:
+        with self._lock:
+            self.generated += 1
+            if base not in self.seen:
+                self.seen.add(base)
+                return base
+            self.collisions += 1
+            n = self._next.get(base, 2)
+            while f"{base} {n}" in self.seen:
+                self.probes += 1
+                n += 1
+            name = f"{base} {n}"
+            self.seen.add(name)
+            if len(self._next) >= self._HINTS_MAX:
+                self._next.clear()
+            self._next[base] = n + 1
+            return name
+
+    def describe(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "generated": self.generated,
+                "collisions": self.collisions,
+                "collision_rate": round(self.collisions / self.generated, 5) if self.generated else None,
+                "extra_probes": self.probes,
+                "preloaded": self.preloaded,
+                "capacity": self.seen.capacity,
+                "filter_bytes": len(self.seen._array),
+                "false_positive_rate": round(self.seen.false_positive_rate(), 6),
+            }
+
+# ---------- one generator per kind ----------
+_gens: Dict[str, UniqueNames] = {}
+_lock = threading.Lock()
+
+def names(kind: str) -> UniqueNames:
+    """UNIQUE_NAMES_CAPACITY / UNIQUE_NAMES_ERROR_RATE size every kind's filter."""
+    g = _gens.get(kind)
+    if g is None:
+        with _lock:
+            g = _gens.get(kind)
+            if g is None:
+                g = _gens[kind] = UniqueNames(kind, int(os.getenv("UNIQUE_NAMES_CAPACITY", "1000000")),
+                                              float(os.getenv("UNIQUE_NAMES_ERROR_RATE", "0.001")))
+    return g
+
+def describe() -> Dict[str, Any]:
+    """Per kind, for the run summary: how often a generated base name was already taken."""
+    return {kind: g.describe() for kind, g in sorted(_gens.items())}
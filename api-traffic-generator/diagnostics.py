@@ -0,0 +1,112 @@
+import json, logging, threading
+from typing import Any, Dict, Optional, Tuple
+import httpx
+from .config import get_settings
+from . import keyspace, metrics
+
+log = logging.getLogger("diagnostics")
+
+# Never logged, even with DIAG_HEADERS
+_REDACT = {"authorization", "cookie", "set-cookie", "proxy-authorization"}
+
+def _body(content: Optional[bytes], limit: int) -> Dict[str, Any]:
+    if content is None:
+        return {}
+    out: Dict[str, Any] = {"bytes": len(content)}
+    if limit > 0 and content:
+        out["text"] = content[:limit].decode("utf-8", errors="replace")
+        if len(content) > limit:
+            out["truncated"] = True
+    return out
+
+def _headers(headers: httpx.Headers) -> Dict[str, str]:
+    return {k: ("<redacted>" if k.lower() in _REDACT else v) for k, v in headers.items()}
+
+class Policy:
+    """
+    What the HTTP layer logs about a request beyond its metrics: nothing for a
+    success unless it falls in the DIAG_SAMPLE_RATE sample; everything (status,
+    error, bodies cut to DIAG_BODY_BYTES, headers with DIAG_HEADERS) for a
+    transport error or 4xx/5xx. At most DIAG_MAX_PER_ROUTE captures per route
+    and reason, so a broken deployment doesn't turn the log into a copy of
+    every response; the rest are only counted.
+    """
+
+    def __init__(self):
+        s = get_settings()
+        self.on_error = s.diag_on_error
+        self.sample_rate = s.diag_sample_rate
+        self.body_bytes = s.diag_body_bytes
+        self.headers = s.diag_headers
+        self.max_per_route = s.diag_max_per_route
+        self.rng = keyspace.rng("diagnostics")
+        self.captured: Dict[Tuple[str, str], int] = {}
+        self.suppressed = 0
+        self.lock = threading.Lock()
+
+    def reason(self, status: int) -> Optional[str]:
+        """Why this request should be captured (None = don't); status 0 = transport error."""
+        if self.on_error and (status == 0 or status >= 400):
+            return "error"
+        if self.sample_rate > 0 and self.rng.random() < self.sample_rate:
+            return "sample"
+        return None
+
+    def capture(self, reason: str, route: str, request: httpx.Request, response: Optional[httpx.Response],
+                seconds: float, error: Optional[BaseException] = None) -> None:
+        key = (route, reason)
+        with self.lock:
+            n = self.captured.get(key, 0)
+            if n >= self.max_per_route:
+                self.suppressed += 1
+                return
+            self.captured[key] = n + 1
+        try:
+            req_content = request.content
+        except httpx.RequestNotRead:
+            req_content = None
+        event: Dict[str, Any] = {
+            "event": "http_diagnostic",
+            "reason": reason,
+            "scenario": metrics.current_scenario(),
+            "route": route,
+            "url": str(request.url),
+            "status": response.status_code if response is not None else 0,
+            "duration_ms": round(seconds * 1000, 3),
+        }
+        if error is not None:
+            event["error"] = str(error)
+            event["error_type"] = type(error).__name__
+        event["request_body"] = _body(req_content, self.body_bytes)
+        if response is not None:
+            # a streamed response hasn't been read; its body stays with the caller
+            event["response_body"] = _body(response.content if response.is_stream_consumed else None,
+                                           self.body_bytes)
+        if self.headers:
+            event["request_headers"] = _headers(request.headers)
+            if response is not None:
+                event["response_headers"] = _headers(response.headers)
+        (log.warning if reason == "error" else log.info)(json.dumps(event))
+
+    def describe(self) -> Dict[str, Any]:
+        with self.lock:
+            return {
+                "captured": sum(self.captured.values()),
+                "suppressed": self.suppressed,
+                "sample_rate": self.sample_rate,
+            }
+
+# ---------- wiring used by http_client / run_task ----------
+_policy: Optional[Policy] = None
+_lock = threading.Lock()
+
+def policy() -> Policy:
+    global _policy
+    if _policy is None:
+        with _lock:
+            if _policy is None:
+                _policy = Policy()
+    return _policy
+
+def describe() -> Dict[str, Any]:
+    return _policy.describe() if _policy is not None else {}
@@ -0,0 +1,286 @@
+import os, json, logging, socket, socketserver, threading, time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+from .config import get_settings
+from . import metrics, saturation
+
+log = logging.getLogger("distributed")
+
+# ---------- wire protocol ----------
+# Newline-delimited JSON over one TCP connection per agent.
+#   agent -> controller  {"type": "hello", "agent": "<id>"}
+#   controller -> agent  {"type": "assign", "task": "...", "env": {...}, "start_at": <unix s>}
+#   agent -> controller  {"type": "snapshot", "agent": "<id>", "series": [...]}   every DIST_SNAPSHOT_SECONDS
+#   agent -> controller  {"type": "done", "agent": "<id>", "ok": bool, "series": [...]}
+# Snapshots are cumulative since the assignment (not deltas), so a lost or
+# late one is simply superseded by the next.
+
+def _send(f, lock: threading.Lock, msg: Dict[str, Any]) -> None:
+    data = (json.dumps(msg, separators=(",", ":")) + "\n").encode()
+    with lock:
+        f.write(data)
+        f.flush()
+
+def _recv(f) -> Optional[Dict[str, Any]]:
+    line = f.readline()
+    return json.loads(line) if line else None
+
+def _encode(series: Dict[Tuple[str, str], metrics.Series]) -> List[Dict[str, Any]]:
+    return [{"scenario": sc, "route": rt, **s.to_dict()} for (sc, rt), s in series.items() if s.hist.count]
+
+def _address(value: str, default_port: int) -> Tuple[str, int]:
+    host, _, port = value.rpartition(":")
+    return (host, int(port)) if host else (value, default_port)
+
+def _port() -> int:
+    return int(os.getenv("DIST_PORT", "7070"))
+
+# ---------- controller ----------
+class _Agent:
+    def __init__(self, name: str, wfile, shard: Dict[Tuple[str, str], metrics.Series]):
+        self.name = name
+        self.wfile = wfile
+        self.lock = threading.Lock()
+        self.shard = shard
+        self.assigned = False
+        self.done = False
+        self.ok: Optional[bool] = None
+        self.generator_bound = False
+
+class Controller:
+    """
+    Waits for DIST_AGENTS agents, gives each an equal share of DIST_RPS for
+    DIST_TASK, and merges their snapshots into this process's metrics
+    registry (one shard per agent). The usual summary, exporter and baseline
+    gate therefore report the whole fleet.
+    """
+
+    def __init__(self, tasks: Dict[str, Callable[[], None]], self_paced: Iterable[str] = ()):
+        self.task = os.getenv("DIST_TASK", "mix")
+        if self.task not in tasks:
+            raise ValueError(f"unknown DIST_TASK: {self.task!r}")
+        # the rate share reaches an agent as MIX_RPS (mix) or LOAD_PROFILE, which
+        # every other self-paced task ignores: the split would silently do nothing
+        if self.task != "mix" and self.task in set(self_paced):
+            raise ValueError(f"DIST_TASK {self.task!r} paces itself and can't take a share of DIST_RPS; "
+                             f"use mix or a scenario run under LOAD_PROFILE")
+        self.expected = int(os.getenv("DIST_AGENTS", "2"))
+        self.rps = float(os.getenv("DIST_RPS", "10"))
+        if self.rps <= 0:
+            raise ValueError(f"DIST_RPS must be > 0, got {self.rps:g}")
+        self.wait_seconds = float(os.getenv("DIST_WAIT_SECONDS", "300"))
+        self.grace_seconds = float(os.getenv("DIST_GRACE_SECONDS", "30"))
+        self.duration = get_settings().duration_seconds
+        self.agents: List[_Agent] = []
+        self._cond = threading.Condition()
+
+    # ----- connection handling (one thread per agent) -----
+    def _serve_agent(self, rfile, wfile) -> None:
+        hello = _recv(rfile)
+        if not hello or hello.get("type") != "hello":
+            return
+        with self._cond:
+            if len(self.agents) >= self.expected:
+                # run already full: tell it to come back for the next one
+                _send(wfile, threading.Lock(), {"type": "busy"})
+                return
+            agent = _Agent(hello.get("agent") or f"agent-{len(self.agents)}", wfile, metrics.REGISTRY.add_shard())
+            self.agents.append(agent)
+            self._cond.notify_all()
+        log.info(json.dumps({"event": "dist_agent_joined", "agent": agent.name, "agents": len(self.agents)}))
+        try:
+            while True:
+                msg = _recv(rfile)
+                if msg is None:
+                    break
+                if msg.get("type") in ("snapshot", "done"):
+                    for row in msg.get("series") or []:
+                        agent.shard[(row["scenario"], row["route"])] = metrics.Series.from_dict(row)
+                if msg.get("type") == "done":
+                    agent.ok = bool(msg.get("ok"))
+                    agent.generator_bound = bool(msg.get("generator_bound"))
+                    break
+        except (OSError, ValueError) as e:
+            log.warning(json.dumps({"event": "dist_agent_error", "agent": agent.name, "error": str(e)}))
+        finally:
+            with self._cond:
+                agent.done = True
+                self._cond.notify_all()
+            log.info(json.dumps({"event": "dist_agent_left", "agent": agent.name, "ok": agent.ok}))
+
+    def _assignment(self) -> Dict[str, Any]:
+        share = round(self.rps / self.expected, 6)
+        env = {"DURATION_SECONDS": str(self.duration)}
+        if self.task == "mix":
+            env["MIX_RPS"] = str(share)
+            if os.getenv("MIX_SPEC"):
+                env["MIX_SPEC"] = os.environ["MIX_SPEC"]
+        else:
+            env["LOAD_PROFILE"] = f"soak:{share}:{self.duration}"
+        return {"type": "assign", "task": self.task, "env": env, "start_at": time.time() + 2.0}
+
+    # ----- live aggregate -----
+    def _live(self, previous: Dict[Tuple[str, str], int]) -> Dict[Tuple[str, str], int]:
+        merged = metrics.REGISTRY.series()
+        routes = {}
+        counts = {}
+        for (sc, rt), s in sorted(merged.items()):
+            h = s.hist
+            counts[(sc, rt)] = h.count
+            p50, p99 = h.percentile(50), h.percentile(99)
+            routes[f"{sc} {rt}"] = {
+                "count": h.count,
+                "rps_1s": h.count - previous.get((sc, rt), 0),
+                "errors": s.errors,
+                "p50_ms": round(p50 * 1000, 3) if p50 is not None else None,
+                "p99_ms": round(p99 * 1000, 3) if p99 is not None else None,
+            }
+        log.info(json.dumps({
+            "event": "dist_live",
+            "agents_running": sum(1 for a in self.agents if not a.done),
+            "routes": routes,
+        }))
+        return counts
+
+    def run(self) -> bool:
+        server = socketserver.ThreadingTCPServer(("", _port()), _make_handler(self))
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, name="dist-controller", daemon=True).start()
+        log.info(json.dumps({"event": "dist_controller_listening", "port": _port(), "agents": self.expected,
+                             "task": self.task, "rps": self.rps, "duration_s": self.duration}))
+        try:
+            with self._cond:
+                if not self._cond.wait_for(lambda: len(self.agents) >= self.expected, timeout=self.wait_seconds):
+                    log.error(json.dumps({"event": "dist_agents_missing", "joined": len(self.agents),
+                                          "expected": self.expected}))
+                    return False
+            assign = self._assignment()
+            for a in self.agents:
+                _send(a.wfile, a.lock, assign)
+                a.assigned = True
+            wait = assign["start_at"] - time.time()
+            if wait > 0:
+                time.sleep(wait)
+            metrics.REGISTRY.started = time.monotonic()
+            log.info(json.dumps({"event": "dist_run_started", "task": self.task,
+                                 "agents": [a.name for a in self.agents], "env": assign["env"]}))
+
+            deadline = time.monotonic() + self.duration + self.grace_seconds
+            previous: Dict[Tuple[str, str], int] = {}
+            while time.monotonic() < deadline:
+                with self._cond:
+                    if self._cond.wait_for(lambda: all(a.done for a in self.agents), timeout=1.0):
+                        break
+                previous = self._live(previous)
+            ok = all(a.ok for a in self.agents)
+            log.info(json.dumps({
+                "event": "dist_run_done",
+                "agents": {a.name: ("ok" if a.ok else "failed" if a.ok is False else "lost") for a in self.agents},
+                "generator_bound_agents": [a.name for a in self.agents if a.generator_bound],
+            }))
+            return ok
+        finally:
+            server.shutdown()
+            server.server_close()
+
+def _make_handler(controller: Controller):
+    class _Handler(socketserver.StreamRequestHandler):
+        def handle(self):
+            controller._serve_agent(self.rfile, self.wfile)
+    return _Handler
+
+def run_controller(tasks: Dict[str, Callable[[], None]], self_paced: Iterable[str] = ()) -> None:
+    """TASK=controller: coordinate DIST_AGENTS agents; fails the run if any agent failed or was lost."""
+    if not Controller(tasks, self_paced).run():
+        raise RuntimeError("distributed run incomplete: an agent failed, was lost or never joined")
+
+# ---------- agent ----------
+def _connect(address: Tuple[str, int], timeout: float):
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            return socket.create_connection(address, timeout=10.0)
+        except OSError:
+            if time.monotonic() >= deadline:
+                raise
+            time.sleep(2.0)
+
+def _snapshots(sock_file, lock: threading.Lock, name: str, base: Dict[Tuple[str, str], metrics.Series],
+               every: float, stop: threading.Event) -> None:
+    while not stop.wait(every):
+        series = {k: s.since(base.get(k)) for k, s in metrics.REGISTRY.series().items()}
+        try:
+            _send(sock_file, lock, {"type": "snapshot", "agent": name, "series": _encode(series)})
+        except OSError:
+            return
+
+def run_one_assignment(run: Callable[[str], None], name: str, address: Tuple[str, int]) -> bool:
+    """Connects, waits for an assignment, runs it while streaming snapshots. False when the controller was busy."""
+    sock = _connect(address, float(os.getenv("DIST_CONNECT_TIMEOUT", "300")))
+    sock.settimeout(None)
+    f = sock.makefile("rwb")
+    lock = threading.Lock()
+    try:
+        _send(f, lock, {"type": "hello", "agent": name})
+        msg = _recv(f)
+        if msg is None or msg.get("type") != "assign":
+            log.info(json.dumps({"event": "dist_agent_not_assigned", "reply": msg and msg.get("type")}))
+            return False
+        log.info(json.dumps({"event": "dist_assigned", "task": msg["task"], "env": msg["env"]}))
+        saved = {k: os.environ.get(k) for k in list(msg["env"]) + ["TASK"]}
+        os.environ.update(msg["env"])
+        # scenario attribution falls back to TASK
+        os.environ["TASK"] = msg["task"]
+        wait = msg["start_at"] - time.time()
+        if wait > 0:
+            time.sleep(wait)
+
+        base = metrics.REGISTRY.series()
+        stop = threading.Event()
+        every = float(os.getenv("DIST_SNAPSHOT_SECONDS", "1"))
+        t = threading.Thread(target=_snapshots, args=(f, lock, name, base, every, stop), name="dist-snapshots", daemon=True)
+        t.start()
+        ok = False
+        try:
+            run(msg["task"])
+            ok = True
+        except Exception as e:
+            # reported to the controller; the agent stays up for the next run
+            log.error(json.dumps({"event": "dist_assignment_failed", "task": msg["task"], "error": str(e)}))
+        finally:
+            stop.set()
+            t.join()
+            for k, v in saved.items():
+                if v is None:
+                    os.environ.pop(k, None)
+                else:
+                    os.environ[k] = v
+            series = {k: s.since(base.get(k)) for k, s in metrics.REGISTRY.series().items()}
+            try:
+                _send(f, lock, {"type": "done", "agent": name, "ok": ok, "series": _encode(series),
+                                "generator_bound": saturation.generator_bound()})
+            except OSError:
+                pass
+        return True
+    finally:
+        f.close()
+        sock.close()
+
+def run_agent(run: Callable[[str], None]) -> None:
+    """
+    TASK=agent: serve assignments from DIST_CONTROLLER (host:port). With
+    DIST_AGENT_RUNS=0 (default) it keeps coming back for the next run, which
+    suits a Deployment; set it to N to exit after N runs.
+    """
+    address = _address(os.environ["DIST_CONTROLLER"], _port())
+    name = os.getenv("DIST_AGENT_NAME") or f"{os.getenv('HOSTNAME') or socket.gethostname()}-{os.getpid()}"
+    runs = int(os.getenv("DIST_AGENT_RUNS", "0"))
+    done = 0
+    while runs == 0 or done < runs:
+        try:
+            if run_one_assignment(run, name, address):
+                done += 1
+            else:
+                time.sleep(5.0)
+        except (OSError, ValueError) as e:
+            log.warning(json.dumps({"event": "dist_controller_unreachable", "error": str(e)}))
+            time.sleep(5.0)
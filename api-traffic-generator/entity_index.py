@@ -0,0 +1,232 @@
+import json, logging, sqlite3, threading, time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+from .config import get_settings
+from . import keyspace
+
+log = logging.getLogger("entity_index")
+
+# ---------- schema ----------
+# Every table keeps the implicit rowid so a random pick is a single indexed
+# seek (rowid >= r LIMIT 1) instead of a scan; `id` is the API's own key.
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS chains (
+    id TEXT PRIMARY KEY, name TEXT, status TEXT, state TEXT, pincode TEXT, seen_at REAL);
+CREATE TABLE IF NOT EXISTS motels (
+    id TEXT PRIMARY KEY, chain_id TEXT, name TEXT, status TEXT, state TEXT, pincode TEXT, seen_at REAL);
+CREATE TABLE IF NOT EXISTS categories (
+    id TEXT PRIMARY KEY, motel_id TEXT, chain_id TEXT, name TEXT, display_name TEXT, status TEXT, seen_at REAL);
+CREATE TABLE IF NOT EXISTS rooms (
+    id TEXT PRIMARY KEY, motel_id TEXT, chain_id TEXT, category_id TEXT, room_number TEXT, floor TEXT,
+    status TEXT, seen_at REAL);
+CREATE TABLE IF NOT EXISTS bookings (
+    id TEXT PRIMARY KEY, motel_id TEXT, chain_id TEXT, category_id TEXT, category_name TEXT, status TEXT,
+    check_in TEXT, check_out TEXT, seen_at REAL);
+CREATE TABLE IF NOT EXISTS refreshes (kind TEXT PRIMARY KEY, refreshed_at REAL);
+CREATE INDEX IF NOT EXISTS motels_chain ON motels(chain_id);
+CREATE INDEX IF NOT EXISTS categories_motel ON categories(motel_id);
+CREATE INDEX IF NOT EXISTS rooms_motel ON rooms(motel_id);
+CREATE INDEX IF NOT EXISTS bookings_motel ON bookings(motel_id);
+"""
+
+KINDS = ("chains", "motels", "categories", "rooms", "bookings")
+
+# ---------- API record -> row (tolerant of the key variants the APIs use) ----------
+def _chain_row(it: Dict[str, Any]) -> Optional[Tuple]:
+    cid = it.get("motelChainId") or it.get("id")
+    if not cid:
+        return None
+    name = it.get("motelChainName") or it.get("displayName")
+    return (str(cid), name, it.get("status"), it.get("state"), it.get("pincode"))
+
+def _motel_row(it: Dict[str, Any]) -> Optional[Tuple]:
+    mid = it.get("motelId") or it.get("id")
+    if not mid:
+        return None
+    return (str(mid), it.get("motelChainId"), it.get("motelName"), it.get("status"),
+            it.get("state"), it.get("pincode"))
+
+def _category_row(it: Dict[str, Any]) -> Optional[Tuple]:
+    cid = it.get("motelRoomCategoryId")
+    if not cid:
+        return None
+    return (str(cid), it.get("motelId"), it.get("motelChainId"), it.get("roomCategoryName"),
+            it.get("displayName") or it.get("displyaName"), it.get("status"))
+
+def _room_row(it: Dict[str, Any]) -> Optional[Tuple]:
+    rid = it.get("roomId") or it.get("motelRoomId") or it.get("id")
+    if not rid:
+        return None
+    return (str(rid), it.get("motelId"), it.get("motelChainId"), it.get("motelRoomCategoryId"),
+            it.get("roomNumber"), it.get("floor"), it.get("status"))
+
+def _booking_row(it: Dict[str, Any]) -> Optional[Tuple]:
+    bid = it.get("motel_reservation_id")
+    if not bid:
+        return None
+    return (str(bid), it.get("motel_id"), it.get("motel_chain_id"), it.get("motel_room_category_id"),
+            it.get("motel_room_category_name"), it.get("status"), it.get("check_in"), it.get("check_out"))
+
+_TABLES = {
+    "chains": (_chain_row, ("id", "name", "status", "state", "pincode")),
+    "motels": (_motel_row, ("id", "chain_id", "name", "status", "state", "pincode")),
+    "categories": (_category_row, ("id", "motel_id", "chain_id", "name", "display_name", "status")),
+    "rooms": (_room_row, ("id", "motel_id", "chain_id", "category_id", "room_number", "floor", "status")),
+    "bookings": (_booking_row, ("id", "motel_id", "chain_id", "category_id", "category_name", "status",
+                                "check_in", "check_out")),
+}
+
+def _bindable(v: Any) -> Any:
+    """What SQLite can bind: nested JSON (a status object, a list) is stored as its JSON text."""
+    if v is None or isinstance(v, (str, int, float)):
+        return v
+    if isinstance(v, (dict, list)):
+        return json.dumps(v, sort_keys=True, default=str)
+    return str(v)
+
+def _upsert_sql(kind: str) -> str:
+    cols = _TABLES[kind][1]
+    # COALESCE keeps what we already know when a partial record (e.g. a POST echo) comes in
+    updates = ", ".join(f"{c}=COALESCE(excluded.{c}, {c})" for c in cols[1:])
+    return (
+        f"INSERT INTO {kind} ({', '.join(cols)}, seen_at) VALUES ({', '.join('?' * (len(cols) + 1))}) "
+        f"ON CONFLICT(id) DO UPDATE SET {updates}, seen_at=excluded.seen_at"
+    )
+
+class EntityIndex:
+    """
+    Local SQLite index of chains, motels, categories, rooms and bookings.
+    Crawls upsert what they see; a completed crawl marks the kind refreshed and
+    drops rows the API no longer returns.
+    """
+
+    def __init__(self, path: str, ttl_seconds: float):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        # WAL so several pods/processes sharing the volume can read while one writes
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SCHEMA)
+
+    # ----- writes -----
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        """BEGIN ... COMMIT under the lock; ROLLBACK on any error so the connection is usable again."""
+        with self._lock:
+            self._db.execute("BEGIN")
+            try:
+                yield self._db
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+            self._db.execute("COMMIT")
+
+    def upsert(self, kind: str, items: Iterable[Dict[str, Any]]) -> int:
+        to_row, _ = _TABLES[kind]
+        now = time.time()
+        rows = [tuple(_bindable(v) for v in r) + (now,)
+                for r in (to_row(it) for it in items if isinstance(it, dict)) if r]
+        if not rows:
+            return 0
+        with self._transaction() as db:
+            db.executemany(_upsert_sql(kind), rows)
+        return len(rows)
+
+    def mark_refreshed(self, kind: str, started_at: float) -> None:
+        """Call after a full crawl that began at `started_at`; rows not seen since are stale."""
+        with self._transaction() as db:
+            pruned = db.execute(f"DELETE FROM {kind} WHERE seen_at < ?", (started_at,)).rowcount
+            db.execute(
+                "INSERT INTO refreshes (kind, refreshed_at) VALUES (?, ?) "
+                "ON CONFLICT(kind) DO UPDATE SET refreshed_at=excluded.refreshed_at",
+                (kind, time.time()),
+            )
+        log.info(json.dumps({"event": "entity_index_refreshed", "kind": kind, "pruned": pruned}))
+
+    # ----- reads -----
+    def is_fresh(self, kind: str) -> bool:
+        with self._lock:
+            row = self._db.execute("SELECT refreshed_at FROM refreshes WHERE kind = ?", (kind,)).fetchone()
+        return bool(row) and (time.time() - row[0]) < self.ttl_seconds
+
+    def count(self, kind: str) -> int:
+        with self._lock:
+            return self._db.execute(f"SELECT COUNT(*) FROM {kind}").fetchone()[0]
+
+    def pick(self, kind: str, where: str = "1") -> Optional[Dict[str, Any]]:
+        """
+        Row via an indexed rowid seek, the rowid drawn from the kind's key
+        distribution (low rowids = first seen = hot); wraps to the start when
+        nothing matches above the probe.
+        """
+        cols = _TABLES[kind][1]
+        with self._lock:
+            lo, hi = self._db.execute(f"SELECT MIN(rowid), MAX(rowid) FROM {kind}").fetchone()
+            if lo is None:
+                return None
+            probe = lo + keyspace.pick_index(kind, hi - lo + 1)
+            sql = f"SELECT {', '.join(cols)} FROM {kind} WHERE rowid >= ? AND {where} ORDER BY rowid LIMIT 1"
+            row = self._db.execute(sql, (probe,)).fetchone()
+            if row is None:
+                row = self._db.execute(sql, (lo,)).fetchone()
+        return dict(zip(cols, row)) if row else None
+
+    def pick_booking_ids(self) -> Optional[Tuple[str, str]]:
+        row = self.pick("bookings", "motel_id IS NOT NULL AND chain_id IS NOT NULL")
+        return (row["motel_id"], row["chain_id"]) if row else None
+
+    def rows(self, kind: str, batch: int = 500) -> Iterator[Dict[str, Any]]:
+        """Stream rows in rowid order without holding the lock across yields."""
+        cols = _TABLES[kind][1]
+        last = 0
+        while True:
+            with self._lock:
+                chunk: List[Tuple] = self._db.execute(
+                    f"SELECT rowid, {', '.join(cols)} FROM {kind} WHERE rowid > ? ORDER BY rowid LIMIT ?",
+                    (last, batch),
+                ).fetchall()
+            if not chunk:
+                return
+            for r in chunk:
+                yield dict(zip(cols, r[1:]))
+            last = chunk[-1][0]
+
+_index: Optional[EntityIndex] = None
+_index_lock = threading.Lock()
+
+def get_index() -> Optional[EntityIndex]:
+    """Process-wide index, or None when ENTITY_INDEX_PATH is unset."""
+    global _index
+    s = get_settings()
+    if not s.entity_index_path:
+        return None
+    with _index_lock:
+        if _index is None:
+            try:
+                _index = EntityIndex(s.entity_index_path, s.entity_index_ttl_seconds)
+            except sqlite3.Error as e:
+                log.error(json.dumps({"event": "entity_index_open_failed", "path": s.entity_index_path, "error": str(e)}))
+                return None
+    return _index
+
+def record(kind: str, items: Iterable[Dict[str, Any]]) -> None:
+    """Side-effect hook for crawls: upsert if the index is enabled, never raise."""
+    idx = get_index()
+    if idx is None:
+        return
+    try:
+        idx.upsert(kind, items)
+    except sqlite3.Error as e:
+        log.warning(json.dumps({"event": "entity_index_upsert_failed", "kind": kind, "error": str(e)}))
+
+def refreshed(kind: str, started_at: float) -> None:
+    """Mark a full crawl of `kind` complete if the index is enabled, never raise."""
+    idx = get_index()
+    if idx is None:
+        return
+    try:
+        idx.mark_refreshed(kind, started_at)
+    except sqlite3.Error as e:
+        log.warning(json.dumps({"event": "entity_index_refresh_failed", "kind": kind, "error": str(e)}))
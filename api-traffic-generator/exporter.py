@@ -0,0 +1,186 @@
+import os, json, logging, tempfile, threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+import httpx
+from .config import get_settings
+from . import metrics, saturation
+
+log = logging.getLogger("exporter")
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Octave boundaries of the metrics histogram (160us .. ~42s): every exported
+# bucket edge is a real edge of the internal layout, so cumulative counts are exact.
+_EXPORT_BUCKETS = range(4 * metrics._PER_OCTAVE, 23 * metrics._PER_OCTAVE, metrics._PER_OCTAVE)
+
+# ---------- text exposition format ----------
+def _escape(v: str) -> str:
+    return v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _labels(**kv: str) -> str:
+    return "{" + ",".join(f'{k}="{_escape(str(v))}"' for k, v in kv.items()) + "}"
+
+def _histogram(out: List[str], name: str, labels: Dict[str, str], h: metrics.Histogram) -> None:
+    seen = 0
+    i = 0
+    for edge in _EXPORT_BUCKETS:
+        while i <= edge:
+            seen += h.counts[i]
+            i += 1
+        out.append(f"{name}_bucket{_labels(**labels, le=f'{metrics.bucket_upper(edge):.6g}')} {seen}")
+    out.append(f"{name}_bucket{_labels(**labels, le='+Inf')} {h.count}")
+    out.append(f"{name}_sum{_labels(**labels)} {h.total:.6f}")
+    out.append(f"{name}_count{_labels(**labels)} {h.count}")
+
+def render() -> str:
+    """Current registry in the Prometheus text format (scrape, textfile or push)."""
+    series = sorted(metrics.REGISTRY.series().items())
+    http = [(sc, rt, s) for (sc, rt), s in series if metrics.is_http_route(rt)]
+    ops = [(sc, rt, s) for (sc, rt), s in series if not metrics.is_http_route(rt)]
+    out: List[str] = []
+
+    out.append("# HELP traffic_requests_total HTTP requests completed, by status class (transport = no response).")
+    out.append("# TYPE traffic_requests_total counter")
+    for sc, rt, s in http:
+        for cls, n in sorted(s.statuses.items()):
+            out.append(f"traffic_requests_total{_labels(scenario=sc, route=rt, status_class=cls)} {n}")
+
+    out.append("# HELP traffic_request_errors_total HTTP requests that failed (4xx, 5xx or transport error).")
+    out.append("# TYPE traffic_request_errors_total counter")
+    for sc, rt, s in http:
+        out.append(f"traffic_request_errors_total{_labels(scenario=sc, route=rt)} {s.errors}")
+
+    out.append("# HELP traffic_requests_in_flight HTTP requests sent and not yet answered.")
+    out.append("# TYPE traffic_requests_in_flight gauge")
+    for sc, rt, s in http:
+        out.append(f"traffic_requests_in_flight{_labels(scenario=sc, route=rt)} {s.inflight}")
+
+    out.append("# HELP traffic_request_retries_total Retries scheduled by the retry policy after a failed request.")
+    out.append("# TYPE traffic_request_retries_total counter")
+    for sc, rt, s in http:
+        out.append(f"traffic_request_retries_total{_labels(scenario=sc, route=rt)} {s.retries}")
+
+    out.append("# HELP traffic_request_duration_seconds HTTP request latency.")
+    out.append("# TYPE traffic_request_duration_seconds histogram")
+    for sc, rt, s in http:
+        _histogram(out, "traffic_request_duration_seconds", {"scenario": sc, "route": rt}, s.hist)
+
+    out.append("# HELP traffic_request_intended_duration_seconds HTTP request latency from the intended send time (coordinated-omission corrected).")
+    out.append("# TYPE traffic_request_intended_duration_seconds histogram")
+    for sc, rt, s in http:
+        if s.scheduled:
+            _histogram(out, "traffic_request_intended_duration_seconds", {"scenario": sc, "route": rt}, s.intended)
+
+    out.append("# HELP traffic_request_phase_seconds HTTP request time by phase (dns/connect/tls only on new connections).")
+    out.append("# TYPE traffic_request_phase_seconds histogram")
+    for sc, rt, s in http:
+        for phase in metrics.PHASES:
+            h = s.phases.get(phase)
+            if h is not None:
+                _histogram(out, "traffic_request_phase_seconds", {"scenario": sc, "route": rt, "phase": phase}, h)
+
+    out.append("# HELP traffic_connections_opened_total Requests that opened a new connection instead of reusing a pooled one.")
+    out.append("# TYPE traffic_connections_opened_total counter")
+    for sc, rt, s in http:
+        out.append(f"traffic_connections_opened_total{_labels(scenario=sc, route=rt)} {s.new_connections}")
+
+    out.append("# HELP traffic_operations_total Scenario operations (whole runs, session steps), by outcome.")
+    out.append("# TYPE traffic_operations_total counter")
+    for sc, rt, s in ops:
+        out.append(f"traffic_operations_total{_labels(scenario=sc, op=rt, outcome='ok')} {s.hist.count - s.errors}")
+        out.append(f"traffic_operations_total{_labels(scenario=sc, op=rt, outcome='failed')} {s.errors}")
+
+    out.append("# HELP traffic_operation_duration_seconds Scenario operation duration.")
+    out.append("# TYPE traffic_operation_duration_seconds histogram")
+    for sc, rt, s in ops:
+        _histogram(out, "traffic_operation_duration_seconds", {"scenario": sc, "op": rt}, s.hist)
+
+    mon = saturation.monitor()
+    if mon is not None and mon.last:
+        out.append("# HELP traffic_generator_cpu_utilization Generator CPU use as a fraction of its cores (cgroup limit).")
+        out.append("# TYPE traffic_generator_cpu_utilization gauge")
+        out.append(f"traffic_generator_cpu_utilization {mon.last['cpu']}")
+        out.append("# HELP traffic_generator_scheduler_lag_seconds How late the generator's sampling thread woke up.")
+        out.append("# TYPE traffic_generator_scheduler_lag_seconds gauge")
+        out.append(f"traffic_generator_scheduler_lag_seconds {mon.last['lag_ms'] / 1000:.6f}")
+        out.append("# HELP traffic_generator_backlog Paced calls waiting for a free worker.")
+        out.append("# TYPE traffic_generator_backlog gauge")
+        out.append(f"traffic_generator_backlog {mon.last['backlog']}")
+        out.append("# HELP traffic_generator_bound 1 once the generator was saturated long enough to skew latency.")
+        out.append("# TYPE traffic_generator_bound gauge")
+        out.append(f"traffic_generator_bound {int(mon.generator_bound)}")
+
+    return "\n".join(out) + "\n"
+
+# ---------- daemon mode: /metrics endpoint ----------
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?", 1)[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+def serve(port: int) -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer(("", port), _Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    log.info(json.dumps({"event": "metrics_endpoint_started", "port": server.server_address[1], "path": "/metrics"}))
+    return server
+
+# ---------- one-shot pods: textfile / push ----------
+def write_textfile(path: str) -> None:
+    """Atomic write for node_exporter's textfile collector (path should end in .prom)."""
+    d = os.path.dirname(path) or "."
+    fd, tmp = tempfile.mkstemp(prefix=".metrics.", dir=d)
+    try:
+        with os.fdopen(fd, "w") as f:
+            f.write(render())
+        os.chmod(tmp, 0o644)  # mkstemp creates 0600; the collector runs as another user
+        os.replace(tmp, path)
+    except OSError:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+
+def push(url: str, job: str, instance: str) -> None:
+    """PUT to a Pushgateway-compatible endpoint, replacing this job/instance group."""
+    target = f"{url.rstrip('/')}/metrics/job/{job}/instance/{instance}"
+    r = httpx.put(target, content=render().encode(), headers={"Content-Type": CONTENT_TYPE}, timeout=10.0)
+    r.raise_for_status()
+
+# ---------- wiring used by run_task ----------
+_server: Optional[ThreadingHTTPServer] = None
+
+def start() -> None:
+    global _server
+    port = get_settings().metrics_port
+    if port is not None and _server is None:
+        _server = serve(port)
+
+def flush() -> None:
+    """End of run: write the textfile and/or push. Never raises."""
+    s = get_settings()
+    if s.metrics_textfile:
+        try:
+            write_textfile(s.metrics_textfile)
+            log.info(json.dumps({"event": "metrics_textfile_written", "path": s.metrics_textfile}))
+        except OSError as e:
+            log.warning(json.dumps({"event": "metrics_textfile_failed", "path": s.metrics_textfile, "error": str(e)}))
+    if s.metrics_push_url:
+        job = os.environ.get("TASK") or "api-traffic-generator"
+        instance = os.environ.get("HOSTNAME") or "local"
+        try:
+            push(s.metrics_push_url, job, instance)
+            log.info(json.dumps({"event": "metrics_pushed", "url": s.metrics_push_url, "job": job, "instance": instance}))
+        except Exception as e:
+            log.warning(json.dumps({"event": "metrics_push_failed", "url": s.metrics_push_url, "error": str(e)}))
@@ -1,21 +1,286 @@
+import atexit, json, logging, socket, threading, time, urllib.request
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional, Type
+import httpcore
 import httpx
 from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type
-from .config import get_settings
+from .config import Target, get_target
+from . import diagnostics, metrics, pacing, results, shadow
 
-_settings = get_settings()
+log = logging.getLogger("http_client")
 
-def _headers():
+def _headers(token: Optional[str]) -> Dict[str, str]:
     h = {"Content-Type": "application/json"}
-    if _settings.api_token:
-        h["Authorization"] = f"Bearer {_settings.api_token}"
+    if token:
+        h["Authorization"] = f"Bearer {token}"
     return h
 
-def client():
-    return httpx.Client(
-        base_url=_settings.base_url.rstrip("/"),
-        headers=_headers(),
-        timeout=httpx.Timeout(_settings.read_timeout, connect=_settings.connect_timeout),
+def route_of(request: httpx.Request) -> str:
+    return f"{request.method} {request.url.path}"
+
+# route of the last request that failed in this thread, for attributing retries
+_last_failure = threading.local()
+# attempt number set by the retry policy, consumed by the next send in this thread
+_attempt = threading.local()
+
+# ---------- per-phase timing ----------
+# DNS time of the connection being opened in this thread, set by _TimedBackend
+_dns = threading.local()
+
+class _TimedBackend(httpcore.SyncBackend):
+    """
+    httpcore resolves inside socket.create_connection, so DNS and TCP connect
+    arrive as one trace event. Resolving here first (timed) and connecting to
+    the resolved address splits them; TLS still verifies the original hostname.
+    """
+
+    def connect_tcp(self, host, port, timeout=None, local_address=None, socket_options=None):
+        t0 = time.perf_counter()
+        try:
+            infos = socket.getaddrinfo(host, port, type=socket.SOCK_STREAM)
+        except OSError as e:
+            raise httpcore.ConnectError(str(e)) from e
+        finally:
+            _dns.seconds = time.perf_counter() - t0
+        last: Optional[Exception] = None
+        for *_, addr in infos:
+            try:
+                return super().connect_tcp(addr[0], port, timeout, local_address, socket_options)
+            except httpcore.ConnectTimeout:
+                raise
+            except httpcore.ConnectError as e:
+                last = e
+        raise last or httpcore.ConnectError(f"no address for {host}")
+
+def _httpx_error(e: Exception) -> Type[httpx.TransportError]:
+    """The httpx exception for an httpcore one: same class name, most specific first."""
+    for cls in type(e).__mro__:
+        mapped = getattr(httpx, cls.__name__, None)
+        if isinstance(mapped, type) and issubclass(mapped, httpx.TransportError):
+            return mapped
+    return httpx.TransportError
+
+@contextmanager
+def _mapped(request: httpx.Request) -> Iterator[None]:
+    try:
+        yield
+    except Exception as e:
+        if type(e).__module__.split(".")[0] != "httpcore":
+            raise
+        raise _httpx_error(e)(str(e), request=request) from e
+
+class _ResponseStream(httpx.SyncByteStream):
+    def __init__(self, request: httpx.Request, stream):
+        self._request = request
+        self._stream = stream
+
+    def __iter__(self) -> Iterator[bytes]:
+        with _mapped(self._request):
+            for part in self._stream:
+                yield part
+
+    def close(self) -> None:
+        if hasattr(self._stream, "close"):
+            self._stream.close()
+
+class _TimedTransport(httpx.BaseTransport):
+    """
+    httpx.HTTPTransport has no public hook for the network backend, so this is
+    the same thin adapter over an httpcore.ConnectionPool built with
+    network_backend=_TimedBackend() (public httpcore API). Direct connections
+    only; see _build for proxies.
+    """
+
+    def __init__(self, limits: httpx.Limits):
+        self._pool = httpcore.ConnectionPool(
+            ssl_context=httpx.create_ssl_context(),
+            max_connections=limits.max_connections,
+            max_keepalive_connections=limits.max_keepalive_connections,
+            keepalive_expiry=limits.keepalive_expiry,
+            network_backend=_TimedBackend(),
+        )
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        req = httpcore.Request(
+            method=request.method,
+            url=httpcore.URL(scheme=request.url.raw_scheme, host=request.url.raw_host,
+                             port=request.url.port, target=request.url.raw_path),
+            headers=request.headers.raw,
+            content=request.stream,
+            extensions=request.extensions,
+        )
+        with _mapped(request):
+            resp = self._pool.handle_request(req)
+        return httpx.Response(status_code=resp.status, headers=resp.headers,
+                              stream=_ResponseStream(request, resp.stream), extensions=resp.extensions)
+
+    def close(self) -> None:
+        self._pool.close()
+
+def _env_proxy(url: str) -> Optional[str]:
+    """The proxy httpx would use for `url` from HTTP(S)_PROXY / ALL_PROXY / NO_PROXY, if any."""
+    u = httpx.URL(url)
+    proxies = urllib.request.getproxies_environment()
+    proxy = proxies.get(u.scheme) or proxies.get("all")
+    if not proxy or urllib.request.proxy_bypass_environment(u.host, proxies):
+        return None
+    return proxy
+
+class _PhaseTrace:
+    """
+    httpcore `trace` extension: timestamps of connect/TLS/request/response
+    events for one request, turned into phase durations by phases().
+    """
+    __slots__ = ("marks", "dns")
+
+    def __init__(self):
+        self.marks: Dict[str, float] = {}
+        self.dns: Optional[float] = None
+
+    def __call__(self, name: str, info) -> None:
+        # "connection.connect_tcp.started", "http11.receive_response_headers.complete", ...
+        self.marks[name.split(".", 1)[1]] = time.perf_counter()
+        if name == "connection.connect_tcp.started":
+            _dns.seconds = None
+        elif name == "connection.connect_tcp.complete":
+            self.dns = getattr(_dns, "seconds", None)
+
+    def _span(self, step: str) -> Optional[float]:
+        a, b = self.marks.get(step + ".started"), self.marks.get(step + ".complete")
+        return b - a if a is not None and b is not None else None
+
+    @property
+    def new_connection(self) -> bool:
+        return "connect_tcp.started" in self.marks
+
+    def phases(self) -> Dict[str, float]:
+        out: Dict[str, float] = {}
+        connect = self._span("connect_tcp")
+        if connect is not None:
+            if self.dns is not None:
+                out["dns"] = self.dns
+                connect = max(0.0, connect - self.dns)
+            out["connect"] = connect
+        tls = self._span("start_tls")
+        if tls is not None:
+            out["tls"] = tls
+        sent = self.marks.get("send_request_headers.started")
+        headers = self.marks.get("receive_response_headers.complete")
+        if sent is not None and headers is not None:
+            # request write + server time + first response bytes
+            out["ttfb"] = headers - sent
+        body = self._span("receive_response_body")
+        if body is not None:
+            out["body"] = body
+        return out
+
+class _InstrumentedClient(httpx.Client):
+    """
+    httpx.Client that records latency and status of every request into metrics,
+    and logs failed or sampled requests in full under the diagnostics policy.
+    """
+
+    # SHADOW_BASE_URL: every request it wants is also sent there (see shadow.py)
+    candidate: Optional[shadow.Shadow] = None
+
+    def send(self, request: httpx.Request, **kwargs) -> httpx.Response:
+        if pacing.aborted():
+            raise pacing.SloAbort(f"run aborted on an SLO breach; not sending {request.method} {request.url.path}")
+        route = route_of(request)
+        retries = getattr(_attempt, "number", 1) - 1
+        _attempt.number = 1
+        metrics.request_started(route)
+        trace = _PhaseTrace()
+        request.extensions = {**request.extensions, "trace": trace}
+        copy = self.candidate.submit(request) if self.candidate is not None and self.candidate.wants(request) else None
+        t0 = time.perf_counter()
+        try:
+            r = super().send(request, **kwargs)
+        except Exception as e:
+            dt = time.perf_counter() - t0
+            metrics.record_request(route, 0, dt)
+            _record_result(request, route, t0, dt, 0, 0, retries)
+            _last_failure.route = route
+            if copy is not None:
+                self.candidate.observe(route, copy, 0, dt, None)
+            diag = diagnostics.policy()
+            why = diag.reason(0)
+            if why is not None:
+                diag.capture(why, route, request, None, dt, e)
+            raise
+        dt = time.perf_counter() - t0
+        if copy is not None:
+            # a streamed body hasn't been read yet: compare status and latency only
+            self.candidate.observe(route, copy, r.status_code, dt, None if kwargs.get("stream") else r.content)
+        metrics.record_request(route, r.status_code, dt)
+        metrics.record_phases(route, trace.phases(), trace.new_connection)
+        _record_result(request, route, t0, dt, r.status_code, r.num_bytes_downloaded, retries)
+        diag = diagnostics.policy()
+        why = diag.reason(r.status_code)
+        if why is not None:
+            diag.capture(why, route, request, r, dt)
+        return r
+
+def _record_result(request: httpx.Request, route: str, t0: float, dt: float,
+                   status: int, bytes_in: int, retries: int) -> None:
+    w = results.writer()
+    if w is not None:
+        bytes_out = int(request.headers.get("Content-Length") or 0)
+        w.record(metrics.current_scenario(), route, t0, dt, status, bytes_in, bytes_out, retries)
+
+_shared: Dict[str, httpx.Client] = {}
+_shared_lock = threading.Lock()
+
+def _build(target: Target) -> httpx.Client:
+    limits = httpx.Limits(
+        max_connections=target.max_connections,
+        max_keepalive_connections=target.max_keepalive_connections,
     )
+    timeout = httpx.Timeout(target.read_timeout, connect=target.connect_timeout)
+    proxy = _env_proxy(target.base_url)
+    if proxy is None:
+        pool: Dict[str, object] = {"transport": _TimedTransport(limits)}
+    else:
+        # httpx's own transports honour the proxy env (trust_env); through a proxy
+        # the DNS/connect split would only time the hop to the proxy anyway
+        log.info(json.dumps({"event": "http_client_proxy", "target": target.name, "proxy": httpx.URL(proxy).host}))
+        pool = {"limits": limits}
+    c = _InstrumentedClient(
+        base_url=target.base_url.rstrip("/"),
+        headers=_headers(target.api_token),
+        timeout=timeout,
+        **pool,
+    )
+    c.candidate = shadow.get(target, _headers(target.api_token), timeout, limits)
+    return c
+
+def _shared_client(target: str) -> httpx.Client:
+    with _shared_lock:
+        c = _shared.get(target)
+        if c is None:
+            c = _shared[target] = _build(get_target(target))
+            atexit.register(c.close)
+        return c
+
+def base_url(target: str = "motel") -> str:
+    """Where `target` points (its own <NAME>_BASE_URL, or BASE_URL)."""
+    return get_target(target).base_url.rstrip("/")
+
+@contextmanager
+def client(target: str = "motel") -> Iterator[httpx.Client]:
+    """
+    Process-wide pooled client for a named target ("motel", "reservation", ...),
+    each with its own pool, timeouts and token. Kept open across `with client()`
+    blocks so scenarios (and every worker in mix mode) reuse the same connections.
+    """
+    yield _shared_client(target)
+
+def _set_attempt(retry_state) -> None:
+    _attempt.number = retry_state.attempt_number
+
+def _count_retry(retry_state) -> None:
+    route = getattr(_last_failure, "route", None) or retry_state.fn.__name__
+    metrics.record_retry(route)
 
 # Decorator usable for both GET/POST helpers
 def retry_policy():
@@ -24,4 +289,6 @@ def retry_policy():
         stop=stop_after_attempt(4),
         wait=wait_exponential(multiplier=0.25, max=4),
         retry=retry_if_exception_type((httpx.TimeoutException, httpx.TransportError)),
+        before=_set_attempt,
+        before_sleep=_count_retry,
     )
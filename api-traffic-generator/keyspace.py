@@ -0,0 +1,156 @@
+import os, bisect, hashlib, math, random, threading
+from typing import Any, Dict, List, Optional, Sequence, TypeVar
+from .config import get_settings
+
+T = TypeVar("T")
+
+# Kinds of key a scenario picks; KEY_DISTRIBUTION_<KIND> overrides KEY_DISTRIBUTION for one of them.
+KINDS = ("chains", "motels", "categories", "rooms", "bookings", "dates")
+
+# ---------- seeding ----------
+def derive_seed(stream: str) -> Optional[int]:
+    """
+    Seed for one named stream of randomness, from SEED. Streams are independent,
+    so adding a pick in one scenario doesn't shift the values another one sees.
+    None (= OS entropy) when SEED is unset.
+    """
+    seed = get_settings().seed
+    if seed is None:
+        return None
+    return int.from_bytes(hashlib.sha256(f"{seed}:{stream}".encode()).digest()[:8], "big")
+
+def rng(stream: str) -> random.Random:
+    return random.Random(derive_seed(stream))
+
+# ---------- selectors ----------
+# A selector turns a population size n into an index; index 0 is the hottest key.
+# Callers pass keys in a stable order (API order, rowid, sorted dates), so the
+# same keys stay hot for a whole run and, with SEED, across runs.
+class Uniform:
+    def index(self, n: int, r: random.Random) -> int:
+        return r.randrange(n)
+
+    def describe(self) -> Dict[str, Any]:
+        return {"distribution": "uniform"}
+
+class Zipf:
+    """
+    P(rank k) ~ 1 / k**s. Exact (cached CDF + bisect) for populations up to
+    _EXACT_MAX keys; above that the inverse CDF of the continuous
+    approximation, so a pick stays O(1) for a rowid range of millions.
+    """
+    _EXACT_MAX = 10_000
+
+    def __init__(self, s: float):
+        if s <= 0:
+            raise ValueError(f"zipf exponent must be > 0, got {s}")
+        self.s = s
+        self._cdf: Dict[int, List[float]] = {}
+
+    def _exact(self, n: int) -> List[float]:
+        cdf = self._cdf.get(n)
+        if cdf is None:
+            total, cdf = 0.0, []
+            for k in range(1, n + 1):
+                total += k ** -self.s
+                cdf.append(total)
+            if len(self._cdf) >= 64:
+                self._cdf.clear()
+            self._cdf[n] = cdf
+        return cdf
+
+    def index(self, n: int, r: random.Random) -> int:
+        u = r.random()
+        if n <= self._EXACT_MAX:
+            cdf = self._exact(n)
+            return min(n - 1, bisect.bisect_left(cdf, u * cdf[-1]))
+        if abs(self.s - 1.0) < 1e-9:
+            x = (n + 1) ** u
+        else:
+            a = 1.0 - self.s
+            x = (1.0 + u * ((n + 1) ** a - 1.0)) ** (1.0 / a)
+        return min(n - 1, max(0, int(x) - 1))
+
+    def describe(self) -> Dict[str, Any]:
+        return {"distribution": "zipf", "exponent": self.s}
+
+class HotSet:
+    """`share` of picks go to the first `fraction` of keys, the rest to the others, uniform within each."""
+
+    def __init__(self, fraction: float, share: float):
+        if not (0 < fraction <= 1 and 0 <= share <= 1):
+            raise ValueError(f"hot set needs 0 < fraction <= 1 and 0 <= share <= 1, got {fraction}, {share}")
+        self.fraction = fraction
+        self.share = share
+
+    def index(self, n: int, r: random.Random) -> int:
+        hot = max(1, math.ceil(n * self.fraction))
+        if hot >= n or r.random() < self.share:
+            return r.randrange(hot)
+        return hot + r.randrange(n - hot)
+
+    def describe(self) -> Dict[str, Any]:
+        return {"distribution": "hot", "fraction": self.fraction, "share": self.share}
+
+def parse(spec: str):
+    """
+    "uniform", "zipf[:exponent]" (default 1.0) or "hot[:fraction[:share]]"
+    (default 0.1 of the keys get 0.9 of the picks).
+    """
+    name, *args = [p.strip() for p in spec.strip().lower().split(":")]
+    if name in ("", "uniform"):
+        return Uniform()
+    if name == "zipf":
+        return Zipf(float(args[0]) if args else 1.0)
+    if name == "hot":
+        return HotSet(float(args[0]) if args else 0.1, float(args[1]) if len(args) > 1 else 0.9)
+    raise ValueError(f"unknown KEY_DISTRIBUTION: {spec!r} (uniform, zipf[:s], hot[:fraction[:share]])")
+
+# ---------- per-kind state ----------
+class _Kind:
+    __slots__ = ("selector", "rng", "picks", "top_decile")
+
+    def __init__(self, kind: str):
+        spec = os.getenv(f"KEY_DISTRIBUTION_{kind.upper()}") or get_settings().key_distribution
+        self.selector = parse(spec)
+        self.rng = rng(f"keys:{kind}")
+        self.picks = 0
+        # picks that landed in the first 10% of ranks: ~0.1 for uniform, more when skewed
+        self.top_decile = 0
+
+_kinds: Dict[str, _Kind] = {}
+_lock = threading.Lock()
+
+def _kind(kind: str) -> _Kind:
+    k = _kinds.get(kind)
+    if k is None:
+        with _lock:
+            k = _kinds.setdefault(kind, _Kind(kind))
+    return k
+
+def is_uniform(kind: str) -> bool:
+    return isinstance(_kind(kind).selector, Uniform)
+
+def pick_index(kind: str, n: int, r: Optional[random.Random] = None) -> int:
+    """Index into a population of n keys of `kind`; `r` overrides the kind's own stream (e.g. a VU's)."""
+    k = _kind(kind)
+    i = k.selector.index(n, r or k.rng)
+    with _lock:
+        k.picks += 1
+        if i < max(1, math.ceil(n / 10)):
+            k.top_decile += 1
+    return i
+
+def choice(kind: str, items: Sequence[T], r: Optional[random.Random] = None) -> T:
+    return items[pick_index(kind, len(items), r)]
+
+def describe() -> Dict[str, Any]:
+    """Seed and distribution per kind, for the run summary and baselines."""
+    s = get_settings()
+    with _lock:
+        kinds = {
+            name: {**k.selector.describe(), "picks": k.picks,
+                   "top_decile_share": round(k.top_decile / k.picks, 4) if k.picks else None}
+            for name, k in sorted(_kinds.items())
+        }
+    return {"seed": s.seed, "distribution": parse(s.key_distribution).describe(), "kinds": kinds}
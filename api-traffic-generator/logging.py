@@ -20,3 +20,7 @@ def setup_logging(level: str = "INFO"):
     root.setLevel(level.upper())
     root.handlers.clear()
     root.addHandler(h)
+    # httpx logs every request at INFO; request-level detail comes from diagnostics.py
+    # instead (LOG_LEVEL=DEBUG still shows httpx/httpcore)
+    for name in ("httpx", "httpcore"):
+        logging.getLogger(name).setLevel(logging.WARNING if root.level > logging.DEBUG else logging.DEBUG)
@@ -0,0 +1,543 @@
+import os, json, logging, math, statistics, threading, time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+log = logging.getLogger("metrics")
+
+# ---------- latency histogram ----------
+# Log-spaced buckets: 8 per power of two (~9% wide) from 10us to ~170s.
+# Fixed layout so histograms from different threads/processes merge by addition.
+_MIN_S = 10e-6
+_PER_OCTAVE = 8
+_BUCKETS = _PER_OCTAVE * 24 + 2
+
+def _bucket(seconds: float) -> int:
+    if seconds <= _MIN_S:
+        return 0
+    return min(_BUCKETS - 1, 1 + int(math.log2(seconds / _MIN_S) * _PER_OCTAVE))
+
+def bucket_upper(i: int) -> float:
+    """Upper bound (seconds) of bucket i."""
+    return _MIN_S * 2 ** (i / _PER_OCTAVE)
+
+class Histogram:
+    __slots__ = ("counts", "count", "total", "max")
+
+    def __init__(self):
+        self.counts = [0] * _BUCKETS
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, seconds: float) -> None:
+        self.counts[_bucket(seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def merge(self, other: "Histogram") -> None:
+        for i, c in enumerate(other.counts):
+            if c:
+                self.counts[i] += c
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+
+    def since(self, earlier: "Histogram") -> "Histogram":
+        """What was recorded after `earlier` (a snapshot of this histogram). max stays cumulative."""
+        h = Histogram()
+        h.counts = [a - b for a, b in zip(self.counts, earlier.counts)]
+        h.count = self.count - earlier.count
+        h.total = self.total - earlier.total
+        h.max = self.max
+        return h
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Compact form for the wire: only non-empty buckets, as [index, count] pairs."""
+        return {"buckets": [[i, c] for i, c in enumerate(self.counts) if c],
+                "count": self.count, "total": self.total, "max": self.max}
+
+    @classmethod
+    def from_dict(cls, d: Dict[str, Any]) -> "Histogram":
+        h = cls()
+        for i, c in d["buckets"]:
+            h.counts[i] = c
+        h.count, h.total, h.max = d["count"], d["total"], d["max"]
+        return h
+
+    def percentile(self, q: float) -> Optional[float]:
+        """q in [0, 100]; returns the bucket's upper bound, capped at the observed max."""
+        if not self.count:
+            return None
+        rank = max(1, math.ceil(self.count * q / 100.0))
+        seen = 0
+        for i, c in enumerate(self.counts):
+            seen += c
+            if seen >= rank:
+                return min(bucket_upper(i), self.max)
+        return self.max
+
+# ---------- per (scenario, route) series ----------
+# Phases of one HTTP request, from the client's connection/trace hooks (http_client.py).
+# dns/connect/tls only occur on requests that opened a new connection.
+PHASES = ("dns", "connect", "tls", "ttfb", "body")
+
+def status_class(status: int) -> str:
+    return "transport" if status == 0 else f"{status // 100}xx"
+
+class Series:
+    __slots__ = ("hist", "intended", "scheduled", "errors", "statuses", "first", "last", "inflight", "retries",
+                 "phases", "timed", "new_connections")
+
+    def __init__(self):
+        self.hist = Histogram()         # from actual send
+        self.intended = Histogram()     # from intended send, with closed-loop backfill (see scheduled())
+        self.scheduled = 0              # records that had an intended send time
+        self.errors = 0
+        self.statuses: Dict[str, int] = {}
+        self.first: Optional[float] = None
+        self.last: Optional[float] = None
+        self.inflight = 0
+        self.retries = 0
+        self.phases: Dict[str, Histogram] = {}
+        self.timed = 0              # requests with phase timings
+        self.new_connections = 0    # ... of which opened a connection instead of reusing one
+
+    def record_phases(self, timings: Dict[str, float], new_connection: bool) -> None:
+        for name, seconds in timings.items():
+            h = self.phases.get(name)
+            if h is None:
+                h = self.phases[name] = Histogram()
+            h.record(seconds)
+        self.timed += 1
+        if new_connection:
+            self.new_connections += 1
+
+    def record(self, status: int, seconds: float, now: float,
+               from_intended: Optional[List[float]] = None) -> None:
+        self.hist.record(seconds)
+        if from_intended is None:
+            self.intended.record(seconds)
+        else:
+            for v in from_intended:
+                self.intended.record(v)
+            self.scheduled += 1
+        cls = status_class(status)
+        self.statuses[cls] = self.statuses.get(cls, 0) + 1
+        if status == 0 or status >= 400:
+            self.errors += 1
+        if self.first is None:
+            self.first = now
+        self.last = now
+
+    def merge(self, other: "Series") -> None:
+        self.hist.merge(other.hist)
+        self.intended.merge(other.intended)
+        self.scheduled += other.scheduled
+        self.errors += other.errors
+        for cls, n in list(other.statuses.items()):
+            self.statuses[cls] = self.statuses.get(cls, 0) + n
+        if other.first is not None and (self.first is None or other.first < self.first):
+            self.first = other.first
+        if other.last is not None and (self.last is None or other.last > self.last):
+            self.last = other.last
+        self.inflight += other.inflight
+        self.retries += other.retries
+        for name, h in list(other.phases.items()):
+            mine = self.phases.get(name)
+            if mine is None:
+                mine = self.phases[name] = Histogram()
+            mine.merge(h)
+        self.timed += other.timed
+        self.new_connections += other.new_connections
+
+    def since(self, earlier: Optional["Series"]) -> "Series":
+        """Window between a snapshot returned by Registry.series() and this one."""
+        if earlier is None:
+            return self
+        s = Series()
+        s.hist = self.hist.since(earlier.hist)
+        s.intended = self.intended.since(earlier.intended)
+        s.scheduled = self.scheduled - earlier.scheduled
+        s.errors = self.errors - earlier.errors
+        s.statuses = {k: v - earlier.statuses.get(k, 0) for k, v in self.statuses.items()}
+        s.first, s.last = earlier.last, self.last
+        s.retries = self.retries - earlier.retries
+        s.inflight = self.inflight
+        s.phases = {k: h.since(earlier.phases[k]) if k in earlier.phases else h for k, h in self.phases.items()}
+        s.timed = self.timed - earlier.timed
+        s.new_connections = self.new_connections - earlier.new_connections
+        return s
+
+    def to_dict(self) -> Dict[str, Any]:
+        d: Dict[str, Any] = {"hist": self.hist.to_dict(), "errors": self.errors, "statuses": dict(self.statuses),
+                             "inflight": self.inflight, "retries": self.retries}
+        if self.scheduled:
+            d["intended"] = self.intended.to_dict()
+            d["scheduled"] = self.scheduled
+        if self.timed:
+            d["phases"] = {name: h.to_dict() for name, h in self.phases.items()}
+            d["timed"] = self.timed
+            d["new_connections"] = self.new_connections
+        if self.first is not None:
+            # time.monotonic() of the process that recorded them
+            d["first"], d["last"] = self.first, self.last
+        return d
+
+    @classmethod
+    def from_dict(cls, d: Dict[str, Any]) -> "Series":
+        s = cls()
+        s.hist = Histogram.from_dict(d["hist"])
+        s.intended = Histogram.from_dict(d["intended"]) if "intended" in d else Histogram.from_dict(d["hist"])
+        s.scheduled = d.get("scheduled", 0)
+        s.errors = d["errors"]
+        s.statuses = dict(d["statuses"])
+        s.inflight = d.get("inflight", 0)
+        s.retries = d.get("retries", 0)
+        s.phases = {name: Histogram.from_dict(h) for name, h in d.get("phases", {}).items()}
+        s.timed = d.get("timed", 0)
+        s.new_connections = d.get("new_connections", 0)
+        s.first, s.last = d.get("first"), d.get("last")
+        return s
+
+    def summary(self, elapsed: float) -> Dict[str, Any]:
+        h = self.hist
+        ms = lambda v: round(v * 1000, 3) if v is not None else None
+        out = {
+            "count": h.count,
+            "errors": self.errors,
+            "error_rate": round(self.errors / h.count, 5) if h.count else 0.0,
+            "rps": round(h.count / elapsed, 3) if elapsed > 0 else None,
+            "mean_ms": ms(h.total / h.count) if h.count else None,
+            "p50_ms": ms(h.percentile(50)),
+            "p90_ms": ms(h.percentile(90)),
+            "p99_ms": ms(h.percentile(99)),
+            "max_ms": ms(h.max) if h.count else None,
+            "status": dict(self.statuses),
+            "retries": self.retries,
+        }
+        if self.scheduled:
+            i = self.intended
+            # includes backfilled samples, so count can exceed the request count
+            out["from_intended"] = {
+                "count": i.count,
+                "p50_ms": ms(i.percentile(50)),
+                "p90_ms": ms(i.percentile(90)),
+                "p99_ms": ms(i.percentile(99)),
+                "max_ms": ms(i.max) if i.count else None,
+            }
+        if self.timed:
+            out["phases"] = {
+                name: {"count": p.count, "p50_ms": ms(p.percentile(50)), "p99_ms": ms(p.percentile(99))}
+                for name, p in ((n, self.phases.get(n)) for n in PHASES) if p is not None and p.count
+            }
+            out["connection_reuse_rate"] = round(1 - self.new_connections / self.timed, 5)
+        return out
+
+# "op" series time one whole scenario call (run_once); HTTP series use "METHOD /path"
+OP_ROUTE = "op"
+
+def is_http_route(route: str) -> bool:
+    return " /" in route
+
+class Registry:
+    """
+    Per-thread shards: each thread only ever writes its own dict of Series, so
+    the request hot path takes no lock (the lock is taken once per thread, to
+    register its shard). Readers merge all shards into fresh Series; a read
+    racing a write can be off by the one in-progress request.
+
+    Shards of threads that have exited (pool workers of a finished run, virtual
+    users that left) are folded into one retired shard whenever a new thread
+    registers, so the shard count follows the live threads, not every thread
+    the process ever started.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # (owning thread, shard); owner None = caller-owned (add_shard) or the retired shard
+        self._shards: List[Tuple[Optional[threading.Thread], Dict[Tuple[str, str], Series]]] = []
+        self._retired: Dict[Tuple[str, str], Series] = {}
+        self._shards.append((None, self._retired))
+        self._local = threading.local()
+        self.started = time.monotonic()
+
+    def _fold_exited(self) -> None:
+        """Call with _lock held. Builds a new retired shard rather than mutating it: readers may hold the old one."""
+        exited = [shard for owner, shard in self._shards if owner is not None and not owner.is_alive()]
+        if not exited:
+            return
+        retired: Dict[Tuple[str, str], Series] = {}
+        for shard in [self._retired, *exited]:
+            for key, s in shard.items():
+                m = retired.get(key)
+                if m is None:
+                    m = retired[key] = Series()
+                m.merge(s)
+        gone = {id(shard) for shard in exited} | {id(self._retired)}
+        self._shards = [(o, sh) for o, sh in self._shards if id(sh) not in gone] + [(None, retired)]
+        self._retired = retired
+
+    def _series(self, scenario: str, route: str) -> Series:
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = self._local.shard = {}
+            with self._lock:
+                self._fold_exited()
+                self._shards.append((threading.current_thread(), shard))
+        s = shard.get((scenario, route))
+        if s is None:
+            s = shard[(scenario, route)] = Series()
+        return s
+
+    def add_shard(self) -> Dict[Tuple[str, str], Series]:
+        """
+        A shard owned by the caller instead of a thread (distributed controller:
+        one per agent). Replace its Series by key assignment, never clear() it,
+        so a concurrent series() never sees it half-empty.
+        """
+        shard: Dict[Tuple[str, str], Series] = {}
+        with self._lock:
+            self._shards.append((None, shard))
+        return shard
+
+    def record(self, scenario: str, route: str, status: int, seconds: float,
+               from_intended: Optional[List[float]] = None) -> None:
+        self._series(scenario, route).record(status, seconds, time.monotonic(), from_intended)
+
+    def begin(self, scenario: str, route: str) -> None:
+        self._series(scenario, route).inflight += 1
+
+    def end(self, scenario: str, route: str, status: int, seconds: float,
+            from_intended: Optional[List[float]] = None) -> None:
+        s = self._series(scenario, route)
+        s.inflight -= 1
+        s.record(status, seconds, time.monotonic(), from_intended)
+
+    def phases(self, scenario: str, route: str, timings: Dict[str, float], new_connection: bool) -> None:
+        self._series(scenario, route).record_phases(timings, new_connection)
+
+    def retry(self, scenario: str, route: str) -> None:
+        self._series(scenario, route).retries += 1
+
+    def series(self) -> Dict[Tuple[str, str], Series]:
+        with self._lock:
+            shards = [shard for _, shard in self._shards]
+        merged: Dict[Tuple[str, str], Series] = {}
+        for shard in shards:
+            # dict() copies atomically under the GIL even while the owner inserts
+            for key, s in dict(shard).items():
+                m = merged.get(key)
+                if m is None:
+                    m = merged[key] = Series()
+                m.merge(s)
+        return merged
+
+    def summary(self, elapsed: Optional[float] = None) -> List[Dict[str, Any]]:
+        if elapsed is None:
+            elapsed = time.monotonic() - self.started
+        return [
+            {"scenario": sc, "route": rt, **s.summary(elapsed)}
+            for (sc, rt), s in sorted(self.series().items())
+        ]
+
+REGISTRY = Registry()
+
+# ---------- scenario attribution ----------
+_scenario: ContextVar[Optional[str]] = ContextVar("scenario", default=None)
+
+def current_scenario() -> str:
+    return _scenario.get() or os.environ.get("TASK") or "unknown"
+
+@contextmanager
+def scenario(name: str) -> Iterator[None]:
+    """Attribute requests made inside the block to scenario `name`."""
+    token = _scenario.set(name)
+    try:
+        yield
+    finally:
+        _scenario.reset(token)
+
+# ---------- coordinated omission ----------
+# A paced call that starts late (workers busy, or a closed loop whose previous
+# call overran) hides the wait from latency measured at the actual send. Inside
+# scheduled(), the call's first request and the op are also measured from the
+# intended send time; with `interval` (closed loops) every sample above it is
+# backfilled with the samples the skipped sends would have seen (v - k*interval).
+class _Schedule:
+    __slots__ = ("intended", "lag", "interval", "first_pending")
+
+    def __init__(self, intended: float, interval: Optional[float]):
+        now = time.perf_counter()
+        self.lag = max(0.0, time.monotonic() - intended)
+        self.intended = now - self.lag          # on the perf_counter clock
+        self.interval = interval
+        self.first_pending = True
+
+    def corrected(self, seconds: float) -> List[float]:
+        out = [seconds]
+        if self.interval:
+            v = seconds - self.interval
+            while v > 0:
+                out.append(v)
+                v -= self.interval
+        return out
+
+_schedule: ContextVar[Optional[_Schedule]] = ContextVar("schedule", default=None)
+
+@contextmanager
+def scheduled(intended: float, interval: Optional[float] = None) -> Iterator[None]:
+    """Run a paced call whose intended send time (time.monotonic) was `intended`."""
+    token = _schedule.set(_Schedule(intended, interval))
+    try:
+        yield
+    finally:
+        _schedule.reset(token)
+
+# ---------- warm-up ----------
+class WarmUp:
+    """
+    Until the warm-up ends, everything is recorded into its own registry
+    (reported as warmup_summary) and REGISTRY stays empty, so the summaries,
+    exporter and baseline only see post-warm-up traffic.
+
+    Warm-up lasts at least `seconds` and `requests` HTTP requests. With
+    `steady_state`, it then continues until the mean latency of the last
+    `windows` windows of `window_s` varies by less than `cv` (stdev/mean),
+    or `max_seconds` after the start at the latest.
+    """
+
+    MIN_WINDOW_COUNT = 3
+
+    def __init__(self, seconds: float, requests: int, steady_state: bool,
+                 window_s: float, windows: int, cv: float, max_seconds: float):
+        self.seconds = seconds
+        self.requests = requests
+        self.steady_state = steady_state
+        self.window_s = window_s
+        self.cv = cv
+        self.max_seconds = max_seconds
+        self.registry = Registry()
+        self.active = True
+        self.ended: Optional[float] = None
+        self._lock = threading.Lock()
+        self.requests_seen = 0
+        self._window_start = self.registry.started
+        self._window_n = 0
+        self._window_sum = 0.0
+        self._means: deque = deque(maxlen=windows)
+
+    def observe(self, seconds: float) -> None:
+        with self._lock:
+            if not self.active:
+                return
+            self.requests_seen += 1
+            now = time.monotonic()
+            if now - self._window_start >= self.window_s:
+                if self._window_n >= self.MIN_WINDOW_COUNT:
+                    self._means.append(self._window_sum / self._window_n)
+                else:
+                    self._means.clear()     # too sparse to judge: start over
+                self._window_start, self._window_n, self._window_sum = now, 0, 0.0
+            self._window_n += 1
+            self._window_sum += seconds
+            elapsed = now - self.registry.started
+            if elapsed < self.seconds or self.requests_seen < self.requests:
+                return
+            if not self.steady_state:
+                self._finish("threshold", elapsed, None)
+            elif len(self._means) == self._means.maxlen:
+                m = statistics.fmean(self._means)
+                cv = statistics.pstdev(self._means) / m if m > 0 else 0.0
+                if cv < self.cv:
+                    self._finish("steady_state", elapsed, cv)
+            if self.active and elapsed >= self.max_seconds:
+                self._finish("steady_state_timeout", elapsed, None)
+
+    def _finish(self, reason: str, elapsed: float, cv: Optional[float]) -> None:
+        self.active = False
+        self.ended = time.monotonic()
+        # rps in the summaries is over post-warm-up time
+        REGISTRY.started = time.monotonic()
+        log.info(json.dumps({
+            "event": "warmup_done",
+            "reason": reason,
+            "elapsed_s": round(elapsed, 3),
+            "requests": self.requests_seen,
+            "window_means_ms": [round(v * 1000, 3) for v in self._means] if self.steady_state else None,
+            "cv": round(cv, 4) if cv is not None else None,
+        }))
+
+_warmup: Optional[WarmUp] = None
+# registry a request was started in, so begin/end land in the same one across the warm-up boundary
+_request_registry = threading.local()
+
+def start_warmup(seconds: float = 0.0, requests: int = 0, steady_state: bool = False,
+                 window_s: float = 1.0, windows: int = 5, cv: float = 0.15, max_seconds: float = 30.0) -> None:
+    global _warmup
+    if seconds > 0 or requests > 0 or steady_state:
+        _warmup = WarmUp(seconds, requests, steady_state, window_s, windows, cv, max_seconds)
+        log.info(json.dumps({"event": "warmup_started", "seconds": seconds, "requests": requests,
+                             "steady_state": steady_state}))
+
+def _registry() -> Registry:
+    w = _warmup
+    return w.registry if w is not None and w.active else REGISTRY
+
+def request_started(route: str) -> None:
+    reg = _request_registry.reg = _registry()
+    reg.begin(current_scenario(), route)
+
+def record_request(route: str, status: int, seconds: float) -> None:
+    """Completes a request opened with request_started (same thread)."""
+    sch = _schedule.get()
+    from_intended = None
+    if sch is not None:
+        v = seconds
+        if sch.first_pending:
+            sch.first_pending = False
+            v = max(seconds, time.perf_counter() - sch.intended)
+        from_intended = sch.corrected(v)
+    reg = getattr(_request_registry, "reg", None) or REGISTRY
+    reg.end(current_scenario(), route, status, seconds, from_intended)
+    if reg is not REGISTRY:
+        _warmup.observe(seconds)
+
+def record_phases(route: str, timings: Dict[str, float], new_connection: bool) -> None:
+    reg = getattr(_request_registry, "reg", None) or REGISTRY
+    reg.phases(current_scenario(), route, timings, new_connection)
+
+def record_retry(route: str) -> None:
+    _registry().retry(current_scenario(), route)
+
+def record_op(name: str, ok: bool, seconds: float, route: str = OP_ROUTE) -> None:
+    # status 0 marks a failed op the same way a transport error marks a request
+    sch = _schedule.get()
+    from_intended = sch.corrected(seconds + sch.lag) if sch is not None else None
+    _registry().record(name, route, 200 if ok else 0, seconds, from_intended)
+
+def log_summary(**run_info: Any) -> None:
+    """Warm-up and per-route summaries, then one run_summary (with `run_info`, e.g. how keys were picked)."""
+    w = _warmup
+    if w is not None:
+        elapsed = (w.ended or time.monotonic()) - w.registry.started
+        for row in w.registry.summary(elapsed):
+            log.info(json.dumps({"event": "warmup_summary", **row}))
+        if w.active:
+            # the run ended first: every request counted as warm-up
+            log.warning(json.dumps({"event": "warmup_not_finished", "requests": w.requests_seen,
+                                    "elapsed_s": round(elapsed, 3)}))
+    rows = REGISTRY.summary()
+    for row in rows:
+        log.info(json.dumps({"event": "latency_summary", **row}))
+    log.info(json.dumps({
+        "event": "run_summary",
+        "elapsed_s": round(time.monotonic() - REGISTRY.started, 3),
+        "series": len(rows),
+        "requests": sum(r["count"] for r in rows if is_http_route(r["route"])),
+        "errors": sum(r["errors"] for r in rows if is_http_route(r["route"])),
+        **run_info,
+    }))
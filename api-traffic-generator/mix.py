@@ -0,0 +1,117 @@
+import os, json, logging, threading, time
+from typing import Callable, Dict, Iterable, List, Tuple
+from .config import get_settings
+from .pacing import run_open_loop
+from . import checkpoint, metrics, profiles
+
+log = logging.getLogger("mix")
+
+def parse_spec(spec: str, tasks: Dict[str, Callable[[], None]],
+               self_paced: Iterable[str] = ()) -> List[Tuple[str, int]]:
+    """
+    'get_motels:50, reservation_by_ids:30' -> [("get_motels", 50), ("reservation_by_ids", 30)]
+    Only leaf scenarios: a self-paced task (mix itself, controller, agent, ...)
+    would recurse or start its own run inside every arrival.
+    """
+    self_paced = set(self_paced)
+    out: List[Tuple[str, int]] = []
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        name, _, weight = part.partition(":")
+        name = name.strip()
+        if name not in tasks:
+            raise ValueError(f"unknown scenario in MIX_SPEC: {name!r}")
+        if name in self_paced:
+            raise ValueError(f"MIX_SPEC scenario {name!r} paces itself; only leaf scenarios can be mixed")
+        w = int(weight.strip() or "1")
+        if w > 0:
+            out.append((name, w))
+    if not out:
+        raise ValueError("MIX_SPEC has no scenarios with a positive weight")
+    return out
+
+class WeightedPicker:
+    """
+    Smooth weighted round-robin: over every window of sum(weights) picks each
+    scenario comes up exactly `weight` times, evenly interleaved, so the
+    configured ratio is reproduced exactly instead of only on average.
+    """
+
+    def __init__(self, weights: List[Tuple[str, int]]):
+        self._weights = weights
+        self._total = sum(w for _, w in weights)
+        self._current = {name: 0 for name, _ in weights}
+        self._lock = threading.Lock()
+
+    def next(self) -> str:
+        with self._lock:
+            best = None
+            for name, w in self._weights:
+                self._current[name] += w
+                if best is None or self._current[name] > self._current[best]:
+                    best = name
+            self._current[best] -= self._total
+            return best
+
+def run_mix(tasks: Dict[str, Callable[[], None]], self_paced: Iterable[str] = ()) -> None:
+    """
+    TASK=mix: one arrival process at MIX_RPS for DURATION_SECONDS, each arrival
+    running one scenario picked by MIX_SPEC weights. All scenarios share the
+    pooled HTTP client and the metrics registry.
+    """
+    weights = parse_spec(os.getenv("MIX_SPEC", ""), tasks, self_paced)
+    rate = float(os.getenv("MIX_RPS", "5"))
+    concurrency = int(os.getenv("MIX_CONCURRENCY", "16"))
+    poisson = os.getenv("MIX_ARRIVALS", "poisson").lower() == "poisson"
+    duration = get_settings().duration_seconds
+    # LOAD_PROFILE replaces the fixed MIX_RPS / DURATION_SECONDS
+    profile = profiles.from_env()
+    if profile is None and rate <= 0:
+        raise ValueError(f"MIX_RPS must be > 0, got {rate:g}")
+    picker = WeightedPicker(weights)
+    # Concurrent runs of the same crawl would fight over one checkpoint file
+    checkpoint.set_durable(False)
+
+    log.info(json.dumps({
+        "event": "mix_started",
+        "spec": {n: w for n, w in weights},
+        "target_rps": None if profile else rate,
+        "profile": profile.spec if profile else None,
+        "arrivals": "poisson" if poisson else "uniform",
+        "concurrency": concurrency,
+        "duration_s": profile.duration if profile else duration,
+    }))
+
+    def _one():
+        name = picker.next()
+        t0 = time.perf_counter()
+        ok = False
+        try:
+            with metrics.scenario(name):
+                tasks[name]()
+            ok = True
+        finally:
+            metrics.record_op(name, ok, time.perf_counter() - t0)
+
+    if profile:
+        profiles.run("mix", _one, profile, concurrency, poisson)
+    else:
+        run_open_loop(_one, rate, duration, concurrency, "mix", poisson=poisson)
+
+    ops = {sc: s for (sc, rt), s in metrics.REGISTRY.series().items() if rt == metrics.OP_ROUTE}
+    total = sum(s.hist.count for s in ops.values()) or 1
+    log.info(json.dumps({
+        "event": "mix_done",
+        "scenarios": {
+            name: {
+                "weight": w,
+                "target_share": round(w / sum(x for _, x in weights), 4),
+                "actual_share": round(ops[name].hist.count / total, 4) if name in ops else 0.0,
+                "ops": ops[name].hist.count if name in ops else 0,
+                "failed": ops[name].errors if name in ops else 0,
+            }
+            for name, w in weights
+        },
+    }))
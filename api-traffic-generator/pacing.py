@@ -0,0 +1,241 @@
+import json, logging, random, threading, time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterator, List, Optional, Union
+from .metrics import Histogram, scheduled
+from . import keyspace
+
+# offered rate: fixed rps, or rps as a function of seconds since the start
+Rate = Union[float, Callable[[float], float]]
+
+# integration step for time-varying rates
+_STEP_S = 0.01
+
+log = logging.getLogger("pacing")
+
+# paced calls submitted to a worker pool but not yet started, and ticks dropped
+# because the backlog was full, across all runs in the process
+_backlog = 0
+_dropped = 0
+_backlog_lock = threading.Lock()
+
+def _queued(n: int) -> None:
+    global _backlog
+    with _backlog_lock:
+        _backlog += n
+
+def _dropped_tick() -> None:
+    global _dropped
+    with _backlog_lock:
+        _dropped += 1
+
+def backlog() -> int:
+    return _backlog
+
+# ---------- run-wide abort ----------
+# Set once (by slo.py when an SLO is clearly breached); every pacer in the
+# process stops at its next tick or slot, so in-flight calls finish and the
+# run unwinds normally (summary, checkpoints, exporter). Self-paced loops
+# (seeding, pagination) are stopped by the HTTP layer raising SloAbort.
+_abort = threading.Event()
+
+class SloAbort(BaseException):
+    """
+    Raised by the HTTP client for requests issued after abort(). A
+    BaseException, like KeyboardInterrupt, so the scenarios' `except Exception`
+    handlers let it through instead of counting it as one more failure.
+    """
+
+def abort() -> None:
+    _abort.set()
+
+def aborted() -> bool:
+    return _abort.is_set()
+
+def dropped() -> int:
+    return _dropped
+
+def _next_tick(rate_at: Callable[[float], float], start: float, t: float, end: float, need: float) -> float:
+    """
+    Time at which the integral of rate_at from t reaches `need` arrivals
+    (1 for uniform spacing, Exp(1) for a non-homogeneous Poisson process).
+    Returns >= end when the run is over before that.
+    """
+    while t < end:
+        r = rate_at(t - start)
+        if r > 0 and need <= r * _STEP_S:
+            return t + need / r
+        need -= max(r, 0.0) * _STEP_S
+        t += _STEP_S
+    return end
+
+def ticks(rate: Rate, duration: float, poisson: bool = False,
+          rng: Optional[random.Random] = None) -> Iterator[float]:
+    """
+    Intended send times (time.monotonic) at `rate`/s for `duration` seconds.
+    Sleeps until each one; when we fall behind, yields immediately rather than
+    skipping, so the offered load stays what was asked for. `rate` may be a
+    function of elapsed seconds (load profiles).
+    """
+    if not callable(rate) and rate <= 0:
+        raise ValueError(f"open-loop rate must be > 0, got {rate:g}")
+    rng = rng or random.Random()
+    start = time.monotonic()
+    end = start + duration
+    if callable(rate):
+        rate_at = rate
+        t = _next_tick(rate_at, start, start, end, rng.expovariate(1.0) if poisson else 1.0)
+    else:
+        rate_at = None
+        t = start
+    while t < end:
+        now = time.monotonic()
+        if t > now:
+            _abort.wait(t - now)
+        if _abort.is_set():
+            return
+        yield t
+        if rate_at is not None:
+            t = _next_tick(rate_at, start, t, end, rng.expovariate(1.0) if poisson else 1.0)
+        else:
+            t += rng.expovariate(rate) if poisson else 1.0 / rate
+
+def every(interval: float, duration: float) -> Iterator[float]:
+    """
+    Closed-loop schedule: slot times start + k*interval for `duration` seconds.
+    The caller runs one call per slot; slots that passed while a call overran
+    are skipped (a closed loop never bursts to catch up). Run each call inside
+    metrics.scheduled(t, interval) so latency is backfilled for the skipped slots.
+    """
+    start = time.monotonic()
+    end = start + duration
+    t = start
+    while t < end:
+        now = time.monotonic()
+        if t > now:
+            _abort.wait(t - now)
+        if _abort.is_set():
+            return
+        yield t
+        now = time.monotonic()
+        t += interval
+        if t < now:
+            t += interval * ((now - t) // interval + 1)
+
+# ---------- per-second timeline ----------
+class Timeline:
+    """
+    Offered vs achieved load of one open-loop run, bucketed by intended send
+    time: ticks offered, submitted, dropped, finished ok/failed, and the call
+    latency of the calls started in that bucket.
+    """
+
+    def __init__(self, bucket_s: float = 1.0):
+        self.bucket_s = bucket_s
+        self.start = time.monotonic()
+        self._lock = threading.Lock()
+        self._buckets: Dict[int, Dict[str, Any]] = {}
+
+    @staticmethod
+    def _empty() -> Dict[str, Any]:
+        return {"offered": 0, "submitted": 0, "dropped": 0, "ok": 0, "failed": 0, "hist": Histogram()}
+
+    def _bucket(self, t: float) -> Dict[str, Any]:
+        i = max(0, int((t - self.start) / self.bucket_s))
+        b = self._buckets.get(i)
+        if b is None:
+            b = self._buckets[i] = self._empty()
+        return b
+
+    def tick(self, t: float, submitted: bool) -> None:
+        with self._lock:
+            b = self._bucket(t)
+            b["offered"] += 1
+            b["submitted" if submitted else "dropped"] += 1
+
+    def done(self, t: float, seconds: float, ok: bool) -> None:
+        with self._lock:
+            b = self._bucket(t)
+            b["ok" if ok else "failed"] += 1
+            b["hist"].record(seconds)
+
+    def rows(self) -> List[Dict[str, Any]]:
+        ms = lambda v: round(v * 1000, 3) if v is not None else None
+        with self._lock:
+            n = max(self._buckets) + 1 if self._buckets else 0
+            out = []
+            for i in range(n):
+                b = self._buckets.get(i) or self._empty()
+                out.append({
+                    "t_s": round(i * self.bucket_s, 3),
+                    "offered_rps": round(b["offered"] / self.bucket_s, 3),
+                    "submitted": b["submitted"],
+                    "dropped": b["dropped"],
+                    "ok": b["ok"],
+                    "failed": b["failed"],
+                    "p50_ms": ms(b["hist"].percentile(50)),
+                    "p99_ms": ms(b["hist"].percentile(99)),
+                })
+            return out
+
+def run_open_loop(fn: Callable[[], None], rate: Rate, duration: float, concurrency: int,
+                  name: str, poisson: bool = False,
+                  stop: Optional[threading.Event] = None,
+                  timeline: Optional[Timeline] = None) -> Dict[str, int]:
+    """
+    Call `fn` at `rate`/s for `duration` seconds on `concurrency` worker threads.
+    Sends never wait for earlier responses; a tick that finds every worker busy
+    and the backlog full is counted as dropped instead of queueing forever.
+    Setting `stop` ends the run at the next tick.
+    """
+    stats = {"submitted": 0, "ok": 0, "failed": 0, "dropped": 0}
+    lock = threading.Lock()
+    pending = threading.BoundedSemaphore(concurrency * 2)
+
+    def _call(intended: float):
+        _queued(-1)
+        t0 = time.perf_counter()
+        try:
+            with scheduled(intended):
+                fn()
+            ok = True
+        except SloAbort:
+            return  # the run is unwinding; not a failure of this call
+        except Exception as e:
+            ok = False
+            log.error(json.dumps({"event": "open_loop_call_failed", "name": name, "error": str(e)}))
+        finally:
+            pending.release()
+        with lock:
+            stats["ok" if ok else "failed"] += 1
+        if timeline is not None:
+            timeline.done(intended, time.perf_counter() - t0, ok)
+
+    started = time.monotonic()
+    if timeline is not None:
+        timeline.start = started
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix=name) as pool:
+        for t in ticks(rate, duration, poisson, keyspace.rng(f"arrivals:{name}")):
+            if stop is not None and stop.is_set():
+                break
+            if not pending.acquire(blocking=False):
+                _dropped_tick()
+                stats["dropped"] += 1
+                if timeline is not None:
+                    timeline.tick(t, False)
+                continue
+            stats["submitted"] += 1
+            if timeline is not None:
+                timeline.tick(t, True)
+            _queued(1)
+            pool.submit(_call, t)
+    elapsed = time.monotonic() - started
+
+    log.info(json.dumps({
+        "event": "open_loop_done",
+        "name": name,
+        "target_rps": None if callable(rate) else rate,
+        "achieved_rps": round(stats["submitted"] / elapsed, 3) if elapsed > 0 else None,
+        "elapsed_s": round(elapsed, 3),
+        **stats,
+    }))
+    return stats
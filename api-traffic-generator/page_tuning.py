@@ -0,0 +1,195 @@
+import os, json, logging, tempfile, threading, time
+from typing import Any, Dict, List, Optional
+from .config import get_settings
+from .http_client import base_url, client
+from .paginator import MOTEL, RESERVATION, Paginator
+from . import metrics
+
+log = logging.getLogger("page_tuning")
+
+# ---------- crawl endpoints ----------
+class Endpoint:
+    """A paged list endpoint on the target of its dialect; reservation ones take their param names from env like their scenarios do."""
+
+    def __init__(self, path: str, dialect: str, page_param_env: Optional[str] = None,
+                 size_param_env: Optional[str] = None):
+        self.path = path
+        self.dialect = dialect
+        self.page_param_env = page_param_env
+        self.size_param_env = size_param_env
+        # the paginator dialects are named after the services that speak them
+        self.target = dialect
+
+    def params(self, page: int, size: int) -> Dict[str, int]:
+        if self.dialect == MOTEL:
+            return {"page": page, "size": size}
+        page_param = os.getenv(self.page_param_env, "page")
+        size_param = os.getenv(self.size_param_env, "per_page")
+        return {page_param: page, size_param: size}
+
+ENDPOINTS: Dict[str, Endpoint] = {
+    "chains": Endpoint("/motelApi/v1/motelChains", MOTEL),
+    "motels": Endpoint("/motelApi/v1/motels", MOTEL),
+    "rooms": Endpoint("/motelApi/v1/motelRooms", MOTEL),
+    "reservation_motels": Endpoint("/reservationApi/v1/allMotels", RESERVATION,
+                                   "RESV_PAGE_PARAM", "RESV_PER_PAGE_PARAM"),
+    "bookings": Endpoint("/reservationApi/v1/allbookings", RESERVATION,
+                         "BOOKINGS_PAGE_PARAM", "BOOKINGS_PER_PAGE_PARAM"),
+}
+
+def _sizes() -> List[int]:
+    raw = os.getenv("PAGE_TUNE_SIZES", "10,25,50,100,200")
+    return sorted({int(s) for s in raw.split(",") if s.strip()})
+
+def _max_latency_ms() -> float:
+    return float(os.getenv("PAGE_TUNE_MAX_LATENCY_MS", "1000"))
+
+# ---------- sweep ----------
+def _percentile(values: List[float], q: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, int(-(-len(ordered) * q // 100)) - 1))]
+
+def measure(ep: Endpoint, size: int, pages: int, path: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Crawls up to `pages` pages at one page size, one request at a time (no
+    prefetch, so page latency is the server's). records/s is over the wall
+    time including JSON decoding, i.e. what a crawl at this size would see.
+    """
+    latencies: List[float] = []
+    nbytes = 0
+    url = path or ep.path
+
+    def fetch(page: int) -> Dict[str, Any]:
+        nonlocal nbytes
+        with client(ep.target) as c:
+            r = c.get(url, params=ep.params(page, size))
+            r.raise_for_status()
+            latencies.append(r.elapsed.total_seconds() * 1000)
+            nbytes += len(r.content)
+            return r.json()
+
+    records = 0
+    error = None
+    t0 = time.perf_counter()
+    pager = Paginator(fetch, ep.dialect, max_pages=pages, prefetch=False)
+    try:
+        for _, items in pager.pages():
+            records += len(items)
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+    wall = time.perf_counter() - t0
+    return {
+        "size": size,
+        "pages": pager.pages_visited,
+        "records": records,
+        "records_per_s": round(records / wall, 3) if wall > 0 else None,
+        "bytes_per_record": round(nbytes / records, 1) if records else None,
+        "p50_ms": round(_percentile(latencies, 50), 3) if latencies else None,
+        "p95_ms": round(_percentile(latencies, 95), 3) if latencies else None,
+        "error": error,
+    }
+
+def choose(rows: List[Dict[str, Any]], max_latency_ms: float) -> Optional[Dict[str, Any]]:
+    """Highest records/s among sizes that returned records without error and kept p95 page latency under the cap."""
+    ok = [r for r in rows if not r["error"] and r["records"] and r["p95_ms"] is not None
+          and r["p95_ms"] <= max_latency_ms]
+    return max(ok, key=lambda r: r["records_per_s"], default=None)
+
+def tune(name: str, path: Optional[str] = None) -> Dict[str, Any]:
+    ep = ENDPOINTS[name]
+    pages = int(os.getenv("PAGE_TUNE_PAGES", "5"))
+    cap = _max_latency_ms()
+    sizes = _sizes()
+    # keep the sweep out of the crawl scenario's own latency series
+    with metrics.scenario("page_tune"):
+        # one unmeasured page first so connection setup isn't charged to the smallest size
+        measure(ep, sizes[0], 1, path)
+        rows = [measure(ep, size, pages, path) for size in sizes]
+    best = choose(rows, cap)
+    result = {
+        "endpoint": name,
+        "path": path or ep.path,
+        "size": best["size"] if best else None,
+        "max_latency_ms": cap,
+        "tuned_at": time.time(),
+        "sweep": rows,
+    }
+    for row in rows:
+        log.info(json.dumps({"event": "page_tune_size", "endpoint": name, **row}))
+    log.info(json.dumps({"event": "page_tune_result", **{k: v for k, v in result.items() if k != "sweep"},
+                         "records_per_s": best["records_per_s"] if best else None}))
+    return result
+
+# ---------- cache ----------
+# PAGE_SIZE_CACHE: JSON file keyed by "<target base url> <path>", so a choice
+# made against one environment is not reused against another.
+_memo: Dict[str, int] = {}
+_lock = threading.Lock()
+
+def _cache_key(ep: Endpoint, path: str) -> str:
+    return f"{base_url(ep.target)} {path}"
+
+def _load_cache(file: str) -> Dict[str, Any]:
+    try:
+        with open(file) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def _save_cache(file: str, key: str, entry: Dict[str, Any]) -> None:
+    doc = _load_cache(file)
+    doc[key] = entry
+    d = os.path.dirname(file) or "."
+    os.makedirs(d, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(prefix=".page_sizes.", dir=d)
+    with os.fdopen(fd, "w") as f:
+        json.dump(doc, f, indent=2, sort_keys=True)
+    os.chmod(tmp, 0o644)
+    os.replace(tmp, file)
+
+def tuned_size(name: str, default: int, path: Optional[str] = None, force: bool = False) -> int:
+    """The cached choice for an endpoint if fresh, otherwise a new sweep (stored in PAGE_SIZE_CACHE)."""
+    ep = ENDPOINTS[name]
+    path = path or ep.path
+    key = _cache_key(ep, path)
+    with _lock:
+        if not force and key in _memo:
+            return _memo[key]
+        file = get_settings().page_size_cache
+        max_age = float(os.getenv("PAGE_TUNE_MAX_AGE_SECONDS", "86400"))
+        if file and not force:
+            entry = _load_cache(file).get(key)
+            if entry and entry.get("size") and time.time() - entry.get("tuned_at", 0) < max_age:
+                log.info(json.dumps({"event": "page_size_cached", "endpoint": name, "size": entry["size"],
+                                     "tuned_at": entry["tuned_at"]}))
+                _memo[key] = int(entry["size"])
+                return _memo[key]
+        result = tune(name, path)
+        if result["size"] is None:
+            log.warning(json.dumps({"event": "page_tune_no_size", "endpoint": name, "fallback": default,
+                                    "max_latency_ms": result["max_latency_ms"]}))
+            _memo[key] = default
+            return default
+        if file:
+            _save_cache(file, key, result)
+        _memo[key] = result["size"]
+        return result["size"]
+
+def page_size(name: str, env: str = "PAGE_SIZE", default: int = 50, path: Optional[str] = None) -> int:
+    """Page size for a crawl: `env` as a number, or "auto" to use the tuned size for endpoint `name`."""
+    raw = os.getenv(env, str(default)).strip()
+    if raw.lower() != "auto":
+        return int(raw)
+    return tuned_size(name, default, path)
+
+# ---------- TASK=tune_page_size ----------
+def run_tuning() -> None:
+    """Sweeps every endpoint in PAGE_TUNE_ENDPOINTS and refreshes the cache."""
+    names = [n.strip() for n in os.getenv("PAGE_TUNE_ENDPOINTS", "chains,motels,rooms").split(",") if n.strip()]
+    unknown = [n for n in names if n not in ENDPOINTS]
+    if unknown:
+        raise ValueError(f"unknown PAGE_TUNE_ENDPOINTS: {unknown} (known: {sorted(ENDPOINTS)})")
+    for name in names:
+        tuned_size(name, default=0, force=True)
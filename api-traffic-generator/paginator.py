@@ -0,0 +1,151 @@
+import os, contextvars, threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+# ---------- dialects ----------
+# motel API:       0-based ?page=&size=, response.data.content, pagination {page, last|is_last, total_pages}
+# reservation API: 1-based, configurable param names, response.data.data,
+#                  pagination {current_page, has_next, total_pages}
+MOTEL = "motel"
+RESERVATION = "reservation"
+
+def _truthy(x) -> bool:
+    if isinstance(x, bool): return x
+    if isinstance(x, str): return x.lower() in ("1","true","yes")
+    return bool(x)
+
+def motel_items(body: Dict[str, Any]) -> List[Dict[str, Any]]:
+    try:
+        items = body["response"]["data"]["content"]
+        return items if isinstance(items, list) else []
+    except Exception:
+        return []
+
+def reservation_items(body: Dict[str, Any]) -> List[Dict[str, Any]]:
+    try:
+        data = body["response"]["data"]
+        if isinstance(data, dict):
+            inner = data.get("data")
+            if isinstance(inner, list):
+                return inner
+        return data if isinstance(data, list) else []
+    except Exception:
+        return []
+
+def _pagination(body: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    try:
+        data = body["response"]["data"]
+        return (data.get("pagination") or None) if isinstance(data, dict) else None
+    except Exception:
+        return None
+
+def _motel_next(body: Dict[str, Any], page: int) -> Optional[int]:
+    pg = _pagination(body)
+    if not pg:
+        return None
+    current = int(pg.get("page", page))
+    if pg.get("last") or pg.get("is_last"):
+        return None
+    total_pages = pg.get("total_pages")
+    if total_pages is not None and current >= int(total_pages) - 1:
+        return None
+    return current + 1
+
+def _reservation_next(body: Dict[str, Any], page: int) -> Optional[int]:
+    pg = _pagination(body)
+    if not pg:
+        return None
+    current = int(pg.get("current_page", page))
+    if not _truthy(pg.get("has_next")):
+        return None
+    total_pages = pg.get("total_pages")
+    if total_pages is not None and current >= int(total_pages):
+        return None
+    nxt = current + 1
+    # avoid infinite loops if the API echoes the same page
+    return None if nxt == page else nxt
+
+_DIALECTS: Dict[str, Tuple[Callable, Callable, int]] = {
+    MOTEL: (motel_items, _motel_next, 0),
+    RESERVATION: (reservation_items, _reservation_next, 1),
+}
+
+def _prefetch_default() -> bool:
+    return os.getenv("PAGINATION_PREFETCH", "true").lower() in ("1", "true", "yes")
+
+# One pool for every crawl in the process: a pool per crawl started (and
+# registered a metrics shard for) a new thread on every run_once.
+_pool: Optional[ThreadPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+def _prefetch_pool() -> ThreadPoolExecutor:
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ThreadPoolExecutor(max_workers=int(os.getenv("PAGINATION_PREFETCH_WORKERS", "32")),
+                                           thread_name_prefix="prefetch")
+    return _pool
+
+class Paginator:
+    """
+    Walks a paged endpoint for either dialect. `fetch(page)` returns the decoded
+    body. With prefetch on, page N+1 is requested in the background as soon as
+    page N's pagination block is known, so network time overlaps with the
+    caller's processing of page N.
+
+    `on_page_done(next_page)` runs once the caller has consumed every record of
+    a page (used for checkpoint cursors).
+    """
+
+    def __init__(self, fetch: Callable[[int], Dict[str, Any]], dialect: str,
+                 start_page: Optional[int] = None, max_pages: Optional[int] = None,
+                 prefetch: Optional[bool] = None,
+                 on_page_done: Optional[Callable[[int], None]] = None):
+        self._items, self._next, first = _DIALECTS[dialect]
+        self.fetch = fetch
+        self.start_page = first if start_page is None else start_page
+        self.max_pages = max_pages
+        self.prefetch = _prefetch_default() if prefetch is None else prefetch
+        self.on_page_done = on_page_done
+        self.page = self.start_page     # last page fetched
+        self.next_page: Optional[int] = self.start_page
+        self.pages_visited = 0
+
+    def _submit(self, pool: ThreadPoolExecutor, page: int) -> Future:
+        # carry contextvars (scenario attribution) into the prefetch thread
+        return pool.submit(contextvars.copy_context().run, self.fetch, page)
+
+    def pages(self) -> Iterator[Tuple[int, List[Dict[str, Any]]]]:
+        pool = _prefetch_pool() if self.prefetch else None
+        pending: Optional[Future] = None
+        page = self.start_page
+        try:
+            while True:
+                if pending is None or pending.cancel():
+                    # no prefetch, or it is still queued behind other crawls': don't wait for a worker
+                    body = self.fetch(page)
+                else:
+                    body = pending.result()
+                pending = None
+                self.page = page
+                self.pages_visited += 1
+                nxt = self._next(body, page)
+                if self.max_pages is not None and self.pages_visited >= self.max_pages:
+                    nxt = None
+                self.next_page = nxt
+                if nxt is not None and pool is not None:
+                    pending = self._submit(pool, nxt)
+                yield page, self._items(body)
+                if nxt is None:
+                    break
+                if self.on_page_done:
+                    self.on_page_done(nxt)
+                page = nxt
+        finally:
+            if pending is not None:
+                pending.cancel()
+
+    def records(self) -> Iterator[Dict[str, Any]]:
+        for _, items in self.pages():
+            yield from items
@@ -0,0 +1,138 @@
+import os, json, logging, time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from . import checkpoint, results
+from .pacing import Timeline, run_open_loop
+
+log = logging.getLogger("profiles")
+
+# ---------- shapes ----------
+# Each segment is (seconds, rate_fn(seconds since segment start), label).
+Segment = Tuple[float, Callable[[float], float], str]
+
+def _ramp(a: float, b: float, secs: float) -> Segment:
+    return secs, (lambda t: a + (b - a) * t / secs), f"ramp {a:g}->{b:g}"
+
+def _soak(rps: float, secs: float) -> Segment:
+    return secs, (lambda t: rps), f"soak {rps:g}"
+
+def _rps(v: str, part: str) -> float:
+    r = float(v)
+    if r < 0:
+        raise ValueError(f"negative rate in LOAD_PROFILE segment {part!r}")
+    return r
+
+def _parse_segment(part: str) -> List[Segment]:
+    kind, *args = [p.strip() for p in part.split(":")]
+    kind = kind.lower()
+    if kind == "ramp":                      # ramp:<from_rps>:<to_rps>:<seconds>
+        a, b, secs = _rps(args[0], part), _rps(args[1], part), float(args[2])
+        return [_ramp(a, b, secs)]
+    if kind in ("soak", "const"):           # soak:<rps>:<seconds>
+        return [_soak(_rps(args[0], part), float(args[1]))]
+    if kind == "step":                      # step:<rps>,<rps>,...:<hold_seconds>
+        hold = float(args[1])
+        rates = [_rps(r, part) for r in args[0].split(",") if r.strip()]
+        return [(hold, (lambda t, r=r: r), f"step {r:g}") for r in rates]
+    if kind == "spike":                     # spike:<base>:<peak>:<seconds>[:<at_s>[:<spike_s>]]
+        base, peak, secs = _rps(args[0], part), _rps(args[1], part), float(args[2])
+        at = float(args[3]) if len(args) > 3 else secs / 2
+        length = float(args[4]) if len(args) > 4 else max(1.0, secs / 10)
+        return [
+            (at, (lambda t: base), f"spike base {base:g}"),
+            (length, (lambda t: peak), f"spike peak {peak:g}"),
+            (max(0.0, secs - at - length), (lambda t: base), f"spike base {base:g}"),
+        ]
+    raise ValueError(f"unknown LOAD_PROFILE shape: {part!r}")
+
+class Profile:
+    """
+    Offered load over time, from LOAD_PROFILE. Shapes chain with "+":
+
+        ramp:1:50:300                 linear 1 -> 50 rps over 5 minutes
+        step:5,10,20,40:60            each rate held 60 s
+        spike:10:100:600:300:30       10 rps, 100 rps for 30 s at t=300 s, 600 s total
+        soak:20:14400                 20 rps for 4 hours
+        ramp:1:20:120+soak:20:3600    warm up, then soak
+    """
+
+    def __init__(self, spec: str):
+        self.spec = spec
+        self.segments: List[Segment] = []
+        for part in spec.split("+"):
+            if part.strip():
+                self.segments.extend(s for s in _parse_segment(part) if s[0] > 0)
+        if not self.segments:
+            raise ValueError("LOAD_PROFILE is empty")
+        # segment rates are constant or linear, so checking the ends is enough
+        if not any(fn(0) > 0 or fn(secs) > 0 for secs, fn, _ in self.segments):
+            raise ValueError(f"LOAD_PROFILE never offers any load: {spec!r}")
+        self.duration = sum(s[0] for s in self.segments)
+
+    def _locate(self, t: float) -> Tuple[Segment, float]:
+        for seg in self.segments:
+            if t < seg[0]:
+                return seg, t
+            t -= seg[0]
+        last = self.segments[-1]
+        return last, last[0]
+
+    def rate_at(self, t: float) -> float:
+        seg, local = self._locate(t)
+        return max(0.0, seg[1](local))
+
+    def phase_at(self, t: float) -> str:
+        return self._locate(t)[0][2]
+
+    def describe(self) -> List[Dict[str, Any]]:
+        out, t = [], 0.0
+        for secs, fn, label in self.segments:
+            out.append({"phase": label, "start_s": round(t, 3), "seconds": secs,
+                        "from_rps": round(fn(0.0), 3), "to_rps": round(fn(secs), 3)})
+            t += secs
+        return out
+
+def from_env() -> Optional[Profile]:
+    spec = os.getenv("LOAD_PROFILE", "").strip()
+    return Profile(spec) if spec else None
+
+# ---------- run any callable under a profile ----------
+def run(name: str, fn: Callable[[], None], profile: Profile,
+        concurrency: Optional[int] = None, poisson: Optional[bool] = None) -> List[Dict[str, Any]]:
+    """
+    Calls `fn` open-loop at the profile's rate and logs the per-second timeline
+    (target vs offered vs completed, call latency). Returns the timeline rows.
+    """
+    if concurrency is None:
+        concurrency = int(os.getenv("LOAD_CONCURRENCY", "32"))
+    if poisson is None:
+        poisson = os.getenv("LOAD_ARRIVALS", "poisson").lower() == "poisson"
+    # Concurrent runs of the same crawl would fight over one checkpoint file
+    checkpoint.set_durable(False)
+    log.info(json.dumps({
+        "event": "load_profile_started",
+        "name": name,
+        "spec": profile.spec,
+        "duration_s": profile.duration,
+        "phases": profile.describe(),
+        "concurrency": concurrency,
+        "arrivals": "poisson" if poisson else "uniform",
+    }))
+    timeline = Timeline()
+    started_ns = time.time_ns()
+    stats = run_open_loop(fn, profile.rate_at, profile.duration, concurrency, name,
+                          poisson=poisson, timeline=timeline)
+
+    rows = []
+    for row in timeline.rows():
+        t = row["t_s"]
+        mid = t + timeline.bucket_s / 2
+        row = {"t_s": t, "phase": profile.phase_at(mid), "target_rps": round(profile.rate_at(mid), 3), **row}
+        rows.append(row)
+        log.info(json.dumps({"event": "load_timeline", "name": name, **row}))
+    log.info(json.dumps({"event": "load_profile_done", "name": name, "spec": profile.spec, **stats}))
+
+    w = results.writer()
+    if w is not None:
+        w.write_sidecar(results.PROFILE_SUFFIX, {"spec": profile.spec, "started_unix_ns": started_ns,
+                                                 "bucket_s": timeline.bucket_s, "timeline": rows})
+    return rows
@@ -0,0 +1,225 @@
+"""
+Reads RESULTS_FILE output (see results.py) with numpy.memmap.
+
+    python -m api-traffic-generator.report summary  run.bin [more.bin ...]
+    python -m api-traffic-generator.report timeline run.bin [--route "GET /motelApi/v1/motels"] [--bucket 1]
+    python -m api-traffic-generator.report diff     before.bin after.bin
+
+Several files (e.g. one per pod) are merged into one run, aligned on the wall
+clock start in each header; for `diff`, pass comma-separated lists. Output is
+one JSON object per line.
+"""
+import os, sys, json, argparse
+from typing import Any, Dict, List, Optional, Tuple
+from .results import HEADER, MAGIC, RECORD, VERSION, DTYPE_FIELDS, PROFILE_SUFFIX, routes_path
+
+QUANTILES = (50, 90, 99)
+
+class Run:
+    """Columns of one or more results files; route ids are unified across files."""
+
+    def __init__(self, paths: List[str]):
+        import numpy as np
+        dtype = np.dtype(DTYPE_FIELDS)
+        assert dtype.itemsize == RECORD.size
+        self.paths = paths
+        self.routes: List[Tuple[str, str]] = []
+        route_ids: Dict[Tuple[str, str], int] = {}
+        parts = []
+        for path in paths:
+            with open(path, "rb") as f:
+                magic, version, rec_size, start_ns = HEADER.unpack(f.read(HEADER.size))
+            if magic != MAGIC or version != VERSION or rec_size != RECORD.size:
+                raise ValueError(f"{path}: not a v{VERSION} results file")
+            # a killed run can leave a partial trailing record
+            n = (os.path.getsize(path) - HEADER.size) // RECORD.size
+            mm = np.memmap(path, dtype=dtype, mode="r", offset=HEADER.size, shape=(n,)) if n else np.zeros(0, dtype)
+            with open(routes_path(path)) as f:
+                table = json.load(f)
+            local = np.zeros(max([int(k) for k in table] + [-1]) + 1, dtype=np.uint16)
+            for k, v in table.items():
+                key = (v["scenario"], v["route"])
+                if key not in route_ids:
+                    route_ids[key] = len(self.routes)
+                    self.routes.append(key)
+                local[int(k)] = route_ids[key]
+            parts.append((start_ns, mm, local))
+
+        t0_ns = min((p[0] for p in parts), default=0)
+        self.t0_ns = t0_ns
+        # LOAD_PROFILE runs: offered-load timeline written next to the first file
+        self.profile: Optional[Dict[str, Any]] = None
+        if os.path.exists(paths[0] + PROFILE_SUFFIX):
+            with open(paths[0] + PROFILE_SUFFIX) as f:
+                self.profile = json.load(f)
+        single = len(parts) == 1
+        cat = (lambda xs: xs[0]) if single else np.concatenate
+        # with one file, start/latency/status stay views on the mapping
+        self.start_us = cat([mm["start_us"].astype(np.int64) + (s - t0_ns) // 1000 for s, mm, _ in parts])
+        self.latency_us = cat([mm["latency_us"] for _, mm, _ in parts])
+        self.status = cat([mm["status"] for _, mm, _ in parts])
+        self.route = cat([local[mm["route"]] if len(mm) else np.zeros(0, np.uint16) for _, mm, local in parts])
+        self.bytes_in = cat([mm["bytes_in"] for _, mm, _ in parts])
+        self.bytes_out = cat([mm["bytes_out"] for _, mm, _ in parts])
+        self.retries = cat([mm["retries"] for _, mm, _ in parts])
+
+    def __len__(self) -> int:
+        return len(self.start_us)
+
+    def duration_s(self) -> float:
+        if not len(self):
+            return 0.0
+        return float((self.start_us + self.latency_us).max() - self.start_us.min()) / 1e6
+
+    def errors(self):
+        return (self.status == 0) | (self.status >= 400)
+
+# ---------- vectorized group statistics ----------
+def group_percentiles(groups, values, n_groups: int, qs=QUANTILES):
+    """
+    Per-group percentiles without a Python loop over groups: one lexsort by
+    (group, value), then each group's rank index is start + ceil(n*q) - 1.
+    Empty groups give NaN.
+    """
+    import numpy as np
+    counts = np.bincount(groups, minlength=n_groups)
+    out = {q: np.full(n_groups, np.nan) for q in qs}
+    if not len(values):
+        return counts, out
+    ordered = values[np.lexsort((values, groups))]
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    has = counts > 0
+    for q in qs:
+        rank = np.maximum(np.ceil(counts * q / 100.0).astype(np.int64) - 1, 0)
+        idx = np.minimum(starts + rank, len(ordered) - 1)
+        out[q] = np.where(has, ordered[idx], np.nan)
+    return counts, out
+
+def _ms(us) -> Optional[float]:
+    us = float(us)
+    return None if us != us else round(us / 1000.0, 3)
+
+# ---------- reports ----------
+def summary(run: Run) -> List[Dict[str, Any]]:
+    import numpy as np
+    n = len(run.routes)
+    groups = run.route.astype(np.int64)
+    counts, pct = group_percentiles(groups, run.latency_us, n)
+    errors = np.bincount(groups, weights=run.errors(), minlength=n)
+    lat_sum = np.bincount(groups, weights=run.latency_us, minlength=n)
+    retries = np.bincount(groups, weights=run.retries, minlength=n)
+    b_in = np.bincount(groups, weights=run.bytes_in, minlength=n)
+    b_out = np.bincount(groups, weights=run.bytes_out, minlength=n)
+    duration = run.duration_s()
+    rows = []
+    for i, (sc, rt) in enumerate(run.routes):
+        c = int(counts[i])
+        if not c:
+            continue
+        rows.append({
+            "scenario": sc,
+            "route": rt,
+            "count": c,
+            "errors": int(errors[i]),
+            "error_rate": round(errors[i] / c, 5),
+            "rps": round(c / duration, 3) if duration > 0 else None,
+            "mean_ms": _ms(lat_sum[i] / c),
+            **{f"p{q}_ms": _ms(pct[q][i]) for q in QUANTILES},
+            "retries": int(retries[i]),
+            "bytes_in": int(b_in[i]),
+            "bytes_out": int(b_out[i]),
+        })
+    return rows
+
+def timeline(run: Run, route: Optional[str] = None, bucket_s: float = 1.0) -> List[Dict[str, Any]]:
+    """Throughput, errors and latency percentiles per time bucket (all routes, or routes named `route`)."""
+    import numpy as np
+    mask = None
+    if route:
+        wanted = [i for i, (_, rt) in enumerate(run.routes) if rt == route]
+        mask = np.isin(run.route, wanted)
+    start = run.start_us if mask is None else run.start_us[mask]
+    latency = run.latency_us if mask is None else run.latency_us[mask]
+    errs = run.errors() if mask is None else run.errors()[mask]
+    if not len(start):
+        return []
+    # with a load profile, t_s is profile time so buckets line up with its phases
+    if run.profile:
+        origin_us = (run.profile["started_unix_ns"] - run.t0_ns) // 1000
+    else:
+        origin_us = int(start.min())
+    buckets = np.maximum((start - origin_us) // int(bucket_s * 1e6), 0).astype(np.int64)
+    n = int(buckets.max()) + 1
+    counts, pct = group_percentiles(buckets, latency, n)
+    errors = np.bincount(buckets, weights=errs, minlength=n)
+    rows = [
+        {
+            "t_s": round(i * bucket_s, 3),
+            "count": int(counts[i]),
+            "rps": round(counts[i] / bucket_s, 3),
+            "errors": int(errors[i]),
+            **{f"p{q}_ms": _ms(pct[q][i]) for q in QUANTILES},
+        }
+        for i in range(n)
+    ]
+    if run.profile:
+        # latency against offered load: look up the profile second each bucket falls in
+        prof = run.profile["timeline"]
+        for row in rows:
+            j = int(row["t_s"] / run.profile["bucket_s"])
+            if 0 <= j < len(prof):
+                row.update(phase=prof[j]["phase"], target_rps=prof[j]["target_rps"],
+                           offered_rps=prof[j]["offered_rps"])
+    return rows
+
+DIFF_FIELDS = ("rps", "error_rate", "p50_ms", "p90_ms", "p99_ms")
+
+def diff(before: Run, after: Run) -> List[Dict[str, Any]]:
+    a = {(r["scenario"], r["route"]): r for r in summary(before)}
+    b = {(r["scenario"], r["route"]): r for r in summary(after)}
+    rows = []
+    for key in sorted(set(a) | set(b)):
+        ra, rb = a.get(key, {}), b.get(key, {})
+        row: Dict[str, Any] = {"scenario": key[0], "route": key[1],
+                               "count_before": ra.get("count", 0), "count_after": rb.get("count", 0)}
+        for f in DIFF_FIELDS:
+            va, vb = ra.get(f), rb.get(f)
+            row[f] = {"before": va, "after": vb}
+            if va is not None and vb is not None:
+                row[f]["delta"] = round(vb - va, 5)
+                row[f]["change_pct"] = round((vb - va) / va * 100, 2) if va else None
+        rows.append(row)
+    return rows
+
+# ---------- CLI ----------
+def _emit(event: str, rows: List[Dict[str, Any]]) -> None:
+    for r in rows:
+        print(json.dumps({"event": event, **r}))
+
+def main(argv: Optional[List[str]] = None) -> int:
+    p = argparse.ArgumentParser(prog="python -m api-traffic-generator.report")
+    sub = p.add_subparsers(dest="cmd", required=True)
+    s = sub.add_parser("summary", help="per-route totals and percentiles")
+    s.add_argument("files", nargs="+")
+    t = sub.add_parser("timeline", help="per-second throughput and percentiles")
+    t.add_argument("files", nargs="+")
+    t.add_argument("--route", help='only this route, e.g. "GET /motelApi/v1/motels"')
+    t.add_argument("--bucket", type=float, default=1.0, help="bucket width in seconds")
+    d = sub.add_parser("diff", help="compare two runs per route")
+    d.add_argument("before", help="results file(s), comma-separated")
+    d.add_argument("after", help="results file(s), comma-separated")
+    args = p.parse_args(argv)
+
+    if args.cmd == "summary":
+        run = Run(args.files)
+        _emit("results_route", summary(run))
+        print(json.dumps({"event": "results_run", "files": run.paths, "requests": len(run),
+                          "duration_s": round(run.duration_s(), 3)}))
+    elif args.cmd == "timeline":
+        _emit("results_timeline", timeline(Run(args.files), args.route, args.bucket))
+    else:
+        _emit("results_diff", diff(Run(args.before.split(",")), Run(args.after.split(","))))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
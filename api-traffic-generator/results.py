@@ -0,0 +1,160 @@
+import os, json, logging, struct, tempfile, threading, time
+from typing import Any, Dict, List, Optional, Tuple
+from .config import get_settings
+
+log = logging.getLogger("results")
+
+# ---------- file layout ----------
+# <path>         16-byte header, then fixed 28-byte little-endian records
+# <path>.routes  JSON sidecar: route id -> {"scenario", "route"}
+# <path>.profile JSON sidecar: load profile timeline (LOAD_PROFILE runs only)
+MAGIC = b"ATGR"
+VERSION = 1
+HEADER = struct.Struct("<4sHHQ")        # magic, version, record size, run start (unix ns)
+RECORD = struct.Struct("<QIHHIIB3x")     # start offset us, latency us, status, route id,
+                                          # bytes in, bytes out, retries
+# The same layout for numpy.memmap (used by report.py)
+DTYPE_FIELDS = [
+    ("start_us", "<u8"), ("latency_us", "<u4"), ("status", "<u2"), ("route", "<u2"),
+    ("bytes_in", "<u4"), ("bytes_out", "<u4"), ("retries", "u1"), ("_pad", "V3"),
+]
+
+_U32 = 0xFFFFFFFF
+
+ROUTES_SUFFIX = ".routes"
+PROFILE_SUFFIX = ".profile"
+
+def routes_path(path: str) -> str:
+    return path + ROUTES_SUFFIX
+
+class _Buffer:
+    """One thread's pending records. The lock is only contended by close()."""
+    __slots__ = ("data", "lock")
+
+    def __init__(self):
+        self.data = bytearray()
+        self.lock = threading.Lock()
+
+class ResultsWriter:
+    """
+    Appends one record per HTTP request. Each thread packs into its own buffer
+    under that buffer's lock (uncontended on the request path); a full buffer
+    is written under the file lock. close() stops appends, then drains every
+    buffer under its lock, so no record is torn or lost between write and clear.
+    """
+
+    def __init__(self, path: str, buffer_records: int = 2048):
+        self.path = path
+        self._flush_at = buffer_records * RECORD.size
+        self._file = open(path, "wb")
+        self._file_lock = threading.Lock()
+        self._local = threading.local()
+        self._buffers: List[_Buffer] = []
+        self._closed = False
+        self._routes: Dict[Tuple[str, str], int] = {}
+        self._routes_lock = threading.Lock()
+        self._t0 = time.perf_counter()
+        self._file.write(HEADER.pack(MAGIC, VERSION, RECORD.size, time.time_ns()))
+        self.records = 0
+        self.late = 0   # records from stragglers finishing after close()
+
+    def _route_id(self, scenario: str, route: str) -> int:
+        key = (scenario, route)
+        rid = self._routes.get(key)
+        if rid is None:
+            with self._routes_lock:
+                rid = self._routes.get(key)
+                if rid is None:
+                    rid = self._routes[key] = len(self._routes)
+                    self._write_routes()
+        return rid
+
+    def _write_routes(self) -> None:
+        table = {str(i): {"scenario": sc, "route": rt} for (sc, rt), i in self._routes.items()}
+        self.write_sidecar(ROUTES_SUFFIX, table)
+
+    def write_sidecar(self, suffix: str, doc: Any) -> None:
+        d = os.path.dirname(self.path) or "."
+        fd, tmp = tempfile.mkstemp(prefix=".sidecar.", dir=d)
+        with os.fdopen(fd, "w") as f:
+            json.dump(doc, f)
+        os.chmod(tmp, 0o644)
+        os.replace(tmp, self.path + suffix)
+
+    def _buffer(self) -> _Buffer:
+        buf = getattr(self._local, "buf", None)
+        if buf is None:
+            buf = self._local.buf = _Buffer()
+            with self._file_lock:
+                self._buffers.append(buf)
+        return buf
+
+    def _drain(self, buf: _Buffer) -> None:
+        """Write out and clear `buf`; call with buf.lock held."""
+        with self._file_lock:
+            self._file.write(buf.data)
+            self.records += len(buf.data) // RECORD.size
+        buf.data.clear()
+
+    def record(self, scenario: str, route: str, started: float, seconds: float, status: int,
+               bytes_in: int, bytes_out: int, retries: int) -> None:
+        buf = self._buffer()
+        rec = RECORD.pack(
+            max(0, int((started - self._t0) * 1e6)),
+            min(_U32, int(seconds * 1e6)),
+            status,
+            self._route_id(scenario, route),
+            min(_U32, bytes_in),
+            min(_U32, bytes_out),
+            min(255, retries),
+        )
+        with buf.lock:
+            if self._closed:
+                self.late += 1
+                return
+            buf.data += rec
+            if len(buf.data) >= self._flush_at:
+                self._drain(buf)
+
+    def close(self) -> None:
+        with self._file_lock:
+            if self._closed:
+                return
+            # appends check this under their buffer's lock: none start after it is set
+            self._closed = True
+            buffers = list(self._buffers)
+        for buf in buffers:
+            with buf.lock:   # waits for an append in progress on that thread
+                self._drain(buf)
+        with self._file_lock:
+            self._file.close()
+        log.info(json.dumps({
+            "event": "results_file_closed",
+            "path": self.path,
+            "records": self.records,
+            "routes": len(self._routes),
+            "late_records": self.late,
+        }))
+
+# ---------- process-wide writer ----------
+_writer: Optional[ResultsWriter] = None
+_writer_lock = threading.Lock()
+_disabled = False
+
+def writer() -> Optional[ResultsWriter]:
+    """The writer for RESULTS_FILE, or None when the setting is unset."""
+    global _writer, _disabled
+    if _writer is not None or _disabled:
+        return _writer
+    with _writer_lock:
+        if _writer is None and not _disabled:
+            path = get_settings().results_file
+            if not path:
+                _disabled = True
+                return None
+            _writer = ResultsWriter(path)
+    return _writer
+
+def close() -> None:
+    if _writer is not None:
+        _writer.close()
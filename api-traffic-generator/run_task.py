@@ -1,9 +1,19 @@
-import os, sys, logging
+import os, sys, signal, logging, time
 from .logging import setup_logging
 from .config import get_settings
+from .checkpoint import save_open
+from .metrics import log_summary, record_op, start_warmup
+from . import baseline, diagnostics, exporter, keyspace, profiles, results, saturation, shadow, slo
+from .mix import run_mix
+from .sessions import run_sessions
+from .capacity import run_capacity_search
+from .page_tuning import run_tuning
+from .distributed import run_agent, run_controller
+from .data_generators import unique_names
+from .seeding import run_seed
 from .scenarios.post_motel_chain import run_once as post_chain_once
 
-from .scenarios.ping import run_once as ping_once
+from .scenarios.ping import run_once as ping_once, run_loop_every_second as ping_loop
 from .scenarios.get_motel_chains import run_once as get_motel_chains_once
 from .scenarios.get_motels import run_once as get_motels_once
 from .scenarios.seed_room_categories import run_once as seed_room_categories_once
@@ -11,7 +21,7 @@ from .scenarios.get_room_categories import run_once as get_room_categories_once
 from .scenarios.seed_motel_rooms import run_once as seed_motel_rooms_once 
 from .scenarios.get_motel_rooms import run_once as get_motel_rooms_once
 from .scenarios.get_motels_count import run_once as get_motels_count_once
-from .scenarios.reservation_ping import run_once as reservation_ping_once
+from .scenarios.reservation_ping import run_once as reservation_ping_once, run_loop_every_second as reservation_ping_loop
 from .scenarios.reservation_all_motels import run_once as reservation_all_motels_once
 from .scenarios.reservation_from_availability import run_once as reservation_from_availability_once
 from .scenarios.reservation_all_bookings import run_once as reservation_all_bookings_once
@@ -25,6 +35,7 @@ from .scenarios.post_motel_from_chain import run_once as post_motel_from_chain_o
 TASKS = {
     "post_motel_chain": post_chain_once,
     "ping_once": ping_once,
+    "ping_loop": ping_loop,
     "get_motel_chains": get_motel_chains_once,
     "get_motels": get_motels_once,
     "seed_room_categories": seed_room_categories_once,
@@ -33,6 +44,7 @@ TASKS = {
     "get_motel_rooms": get_motel_rooms_once,
     "get_motels_count": get_motels_count_once,
     "reservation_ping_once": reservation_ping_once,
+    "reservation_ping_loop": reservation_ping_loop,
     "reservation_all_motels": reservation_all_motels_once,
     "reservation_from_availability": reservation_from_availability_once,
     "reservation_all_bookings": reservation_all_bookings_once,
@@ -40,13 +52,99 @@ TASKS = {
     "post_motel_from_chain": post_motel_from_chain_once,
 }
 
+def mix_once():
+    run_mix(TASKS, SELF_PACED)
+
+TASKS["mix"] = mix_once
+TASKS["vu_sessions"] = run_sessions
+
+def capacity_search_once():
+    run_capacity_search(TASKS)
+
+TASKS["capacity_search"] = capacity_search_once
+TASKS["tune_page_size"] = run_tuning
+TASKS["seed_scale"] = run_seed
+
+# Tasks that pace themselves; LOAD_PROFILE is read by mix and ignored by the others
+SELF_PACED = {"mix", "vu_sessions", "capacity_search", "tune_page_size", "seed_scale", "ping_loop", "reservation_ping_loop",
+              "controller", "agent"}
+
+# Tasks that judge SLOs themselves (capacity_search breaches them on purpose) or
+# only coordinate; the live SLO watcher stays off for them
+NO_LIVE_SLO = {"capacity_search", "controller", "agent"}
+
+def _run(task: str) -> None:
+    profile = profiles.from_env()
+    if profile is None or task in SELF_PACED:
+        TASKS[task]()
+        return
+    fn = TASKS[task]
+
+    def _one():
+        t0 = time.perf_counter()
+        ok = False
+        try:
+            fn()
+            ok = True
+        finally:
+            record_op(task, ok, time.perf_counter() - t0)
+
+    profiles.run(task, _one, profile)
+
+def _terminate(signum, frame):
+    # Pod eviction / scale-down sends SIGTERM: unwind so checkpoints get saved
+    raise SystemExit(128 + signum)
+
+def controller_once():
+    run_controller(TASKS, SELF_PACED)
+
+def agent_once():
+    run_agent(_run)
+
+TASKS["controller"] = controller_once
+TASKS["agent"] = agent_once
+
 def main():
-    setup_logging(get_settings().log_level)
+    settings = get_settings()
+    setup_logging(settings.log_level)
     task = os.environ.get("TASK")
     if task not in TASKS:
         print(f"Unknown or missing TASK. Valid: {list(TASKS)}", file=sys.stderr)
         sys.exit(2)
-    TASKS[task]()
+    signal.signal(signal.SIGTERM, _terminate)
+    exporter.start()
+    saturation.start()
+    if task not in NO_LIVE_SLO:
+        slo.start()
+    start_warmup(
+        seconds=settings.warmup_seconds,
+        requests=settings.warmup_requests,
+        steady_state=settings.steady_state,
+        window_s=settings.steady_state_window_seconds,
+        windows=settings.steady_state_windows,
+        cv=settings.steady_state_cv,
+        max_seconds=settings.steady_state_max_seconds,
+    )
+    try:
+        _run(task)
+    except BaseException as e:
+        save_open(type(e).__name__)
+        # an SLO abort unwinds the task through whatever it was doing (SloAbort
+        # from the HTTP layer, or failures it caused): exit with EXIT_SLO below
+        if not slo.aborted():
+            raise
+    finally:
+        saturation.stop()
+        log_summary(key_selection=keyspace.describe(), unique_names=unique_names.describe(),
+                    diagnostics=diagnostics.describe(), slo=slo.stop())
+        shadow.log_summary()
+        exporter.flush()
+        results.close()
+    gate_ok = baseline.gate()
+    if slo.aborted():
+        sys.exit(slo.EXIT_SLO)
+    if not gate_ok:
+        sys.exit(baseline.EXIT_REGRESSION)
 
 if __name__ == "__main__":
     main()
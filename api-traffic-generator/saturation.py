@@ -0,0 +1,182 @@
+import os, json, logging, threading, time
+from typing import Any, Dict, List, Optional, Tuple
+from . import pacing
+from .metrics import Histogram
+
+log = logging.getLogger("saturation")
+
+# ---------- cgroup CPU limit / throttling (v2, then v1) ----------
+_CG2 = "/sys/fs/cgroup"
+_CG1 = "/sys/fs/cgroup/cpu"
+
+def _read(path: str) -> Optional[str]:
+    try:
+        with open(path) as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+def cpu_limit() -> Optional[float]:
+    """Cores this container may use (pod `limits.cpu`), or None when unlimited."""
+    v2 = _read(f"{_CG2}/cpu.max")
+    if v2:
+        quota, _, period = v2.partition(" ")
+        return None if quota == "max" else int(quota) / int(period or 100000)
+    quota, period = _read(f"{_CG1}/cpu.cfs_quota_us"), _read(f"{_CG1}/cpu.cfs_period_us")
+    if quota and period and int(quota) > 0:
+        return int(quota) / int(period)
+    return None
+
+def throttled() -> Optional[Tuple[int, float]]:
+    """(periods throttled, seconds throttled) since the cgroup started."""
+    for path, scale, key in ((f"{_CG2}/cpu.stat", 1e-6, "throttled_usec"),
+                             (f"{_CG1}/cpu.stat", 1e-9, "throttled_time")):
+        text = _read(path)
+        if not text:
+            continue
+        stat = dict(line.split() for line in text.splitlines() if len(line.split()) == 2)
+        if "nr_throttled" in stat:
+            return int(stat["nr_throttled"]), int(stat.get(key, 0)) * scale
+    return None
+
+# ---------- monitor ----------
+class Monitor:
+    """
+    Samples the generator itself once per `interval`:
+      cpu      process CPU time / wall time / cores available (cgroup limit or host)
+      lag      how late a sleeping thread wakes up: time waiting for the GIL and a CPU
+      backlog  paced calls submitted but not yet started by a worker
+      dropped  ticks the pacer dropped because that backlog was full
+      throttled cgroup CFS periods throttled in the interval
+    A sample is saturated when any threshold is crossed; `sustain` saturated
+    samples in a row make the run generator-bound and log a warning.
+    """
+
+    def __init__(self):
+        self.interval = float(os.getenv("SATURATION_INTERVAL_SECONDS", "1"))
+        self.cpu_threshold = float(os.getenv("SATURATION_CPU", "0.85"))
+        self.lag_threshold_ms = float(os.getenv("SATURATION_LAG_MS", "50"))
+        self.backlog_threshold = int(os.getenv("SATURATION_BACKLOG", "10"))
+        self.sustain = int(os.getenv("SATURATION_SUSTAIN", "3"))
+        limit = cpu_limit()
+        self.cores = limit or float(os.cpu_count() or 1)
+        self.cpu_limited = limit is not None
+        self.generator_bound = False
+        self.saturated_seconds = 0.0
+        # running aggregates (a soak run samples for hours)
+        self.samples = 0
+        self.cpu_sum = 0.0
+        self.cpu_max = 0.0
+        self.lag = Histogram()
+        self.backlog_max = 0
+        self.throttled_periods = 0
+        self.dropped_ticks = 0
+        self.last: Dict[str, Any] = {}
+        self._streak = 0
+        self._in_episode = False
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _reasons(self, s: Dict[str, Any]) -> List[str]:
+        r = []
+        if s["cpu"] >= self.cpu_threshold:
+            r.append("cpu")
+        if s["lag_ms"] >= self.lag_threshold_ms:
+            r.append("scheduler_lag")
+        if s["backlog"] >= self.backlog_threshold:
+            r.append("backlog")
+        if s["dropped_ticks"]:
+            r.append("dropped_ticks")
+        if s["throttled_periods"]:
+            r.append("cpu_throttled")
+        return r
+
+    def _loop(self) -> None:
+        cpu0, wall0 = time.process_time(), time.monotonic()
+        thr0 = throttled()
+        dropped0 = pacing.dropped()
+        while True:
+            target = time.monotonic() + self.interval
+            if self._stop.wait(self.interval):
+                return
+            now = time.monotonic()
+            cpu1 = time.process_time()
+            thr1 = throttled()
+            dropped1 = pacing.dropped()
+            s = {
+                "cpu": round((cpu1 - cpu0) / max(now - wall0, 1e-9) / self.cores, 4),
+                "lag_ms": round(max(0.0, now - target) * 1000, 3),
+                "backlog": pacing.backlog(),
+                "dropped_ticks": dropped1 - dropped0,
+                "throttled_periods": (thr1[0] - thr0[0]) if thr0 and thr1 else 0,
+            }
+            cpu0, wall0, thr0, dropped0 = cpu1, now, thr1, dropped1
+            reasons = self._reasons(s)
+            s["reasons"] = reasons
+            self.last = s
+            self.samples += 1
+            self.cpu_sum += s["cpu"]
+            self.cpu_max = max(self.cpu_max, s["cpu"])
+            self.lag.record(s["lag_ms"] / 1000)
+            self.backlog_max = max(self.backlog_max, s["backlog"])
+            self.throttled_periods += s["throttled_periods"]
+            self.dropped_ticks += s["dropped_ticks"]
+            if reasons:
+                self._streak += 1
+                self.saturated_seconds += self.interval
+            else:
+                self._streak = 0
+            if self._streak >= self.sustain and not self._in_episode:
+                self._in_episode = True
+                self.generator_bound = True
+                log.warning(json.dumps({"event": "generator_saturated", **s,
+                                        "cores": self.cores, "cpu_limited": self.cpu_limited,
+                                        "note": "latency now includes client-side queueing"}))
+            elif not reasons and self._in_episode:
+                self._in_episode = False
+                log.info(json.dumps({"event": "generator_recovered", **s}))
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._loop, name="saturation", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> Dict[str, Any]:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        lag_p99 = self.lag.percentile(99)
+        report = {
+            "event": "generator_health",
+            "generator_bound": self.generator_bound,
+            "saturated_seconds": round(self.saturated_seconds, 3),
+            "samples": self.samples,
+            "cores": self.cores,
+            "cpu_limited": self.cpu_limited,
+            "cpu_mean": round(self.cpu_sum / self.samples, 4) if self.samples else None,
+            "cpu_max": self.cpu_max if self.samples else None,
+            "lag_p99_ms": round(lag_p99 * 1000, 3) if lag_p99 is not None else None,
+            "backlog_max": self.backlog_max,
+            "throttled_periods": self.throttled_periods,
+            "dropped_ticks": self.dropped_ticks,
+        }
+        (log.warning if self.generator_bound else log.info)(json.dumps(report))
+        return report
+
+# ---------- wiring used by run_task ----------
+_monitor: Optional[Monitor] = None
+
+def start() -> None:
+    global _monitor
+    if os.getenv("SATURATION_MONITOR", "true").lower() in ("1", "true", "yes") and _monitor is None:
+        _monitor = Monitor()
+        _monitor.start()
+
+def stop() -> None:
+    if _monitor is not None:
+        _monitor.stop()
+
+def monitor() -> Optional[Monitor]:
+    return _monitor
+
+def generator_bound() -> bool:
+    return _monitor is not None and _monitor.generator_bound
@@ -1,38 +1,30 @@
-import os, json, logging
-from typing import Any, Dict, List, Optional
+import os, json, logging, time
+from typing import Any, Dict
 from ..http_client import client, retry_policy
+from .. import entity_index
+from ..checkpoint import open_checkpoint
+from ..paginator import MOTEL, Paginator
+from ..page_tuning import page_size
 
 log = logging.getLogger("get_motel_chains")
 
-def _content(body: Dict[str, Any]) -> List[Dict[str, Any]]:
-    # Expected path: response -> data -> content (list)
-    try:
-        return body["response"]["data"]["content"] or []
-    except Exception:
-        return []
-
-def _pagination(body: Dict[str, Any]) -> Optional[Dict[str, Any]]:
-    try:
-        return body["response"]["data"]["pagination"] or None
-    except Exception:
-        return None
-
 @retry_policy()
 def _fetch_page(page: int, size: int) -> Dict[str, Any]:
-    with client() as c:
+    with client("motel") as c:
         r = c.get("/motelApi/v1/motelChains", params={"page": page, "size": size})
         r.raise_for_status()
         return r.json()
 
 def run_once():
-    page = 0
-    size = int(os.getenv("PAGE_SIZE", "50"))
+    size = page_size("chains")
+    ck = open_checkpoint("get_motel_chains", {"size": size})
+    start_page = ck.cursor
+    pager = Paginator(lambda p: _fetch_page(p, size), MOTEL, start_page=start_page, on_page_done=ck.advance)
     total_logged = 0
+    started = time.time()
 
-    while True:
-        body = _fetch_page(page, size)
-
-        items = _content(body)
+    for page, items in pager.pages():
+        entity_index.record("chains", items)
         for item in items:
             name = item.get("motelChainName") or item.get("displayName")
             log.info(json.dumps({
@@ -42,22 +34,14 @@ def run_once():
                 "motelChainName": name
             }))
             total_logged += 1
-
-        pg = _pagination(body)
-        # Fall back to total_pages if 'last' not available
-        if pg:
-            is_last = bool(pg.get("last") or pg.get("is_last"))
-            current = int(pg.get("page", page))
-            total_pages = pg.get("total_pages")
-            if is_last or (total_pages is not None and current >= int(total_pages) - 1):
-                break
-            page = current + 1
-        else:
-            # No pagination section => single page
-            break
+    ck.complete()
+    # only a crawl from the first page has seen every chain; a resumed one
+    # started from wherever the checkpoint was
+    if start_page == 0 and not ck.resumed:
+        entity_index.refreshed("chains", started)
 
     log.info(json.dumps({
         "event": "motel_chain_paging_done",
-        "pages_traversed_up_to": page,
+        "pages_traversed_up_to": pager.page,
         "total_names_logged": total_logged
     }))
@@ -1,51 +1,32 @@
-import os, json, logging
-from typing import Any, Dict, List, Optional
+import os, json, logging, time
+from typing import Any, Dict
 from ..http_client import client, retry_policy
+from .. import entity_index
+from ..checkpoint import open_checkpoint
+from ..paginator import MOTEL, Paginator
+from ..page_tuning import page_size
 
 log = logging.getLogger("get_motel_rooms")
 
-# ---------- helpers to read common shape ----------
-def _content(body: Dict[str, Any]) -> List[Dict[str, Any]]:
-    # Expected path: response -> data -> content (list)
-    try:
-        return body["response"]["data"]["content"] or []
-    except Exception:
-        return []
-
-def _pagination(body: Dict[str, Any]) -> Optional[Dict[str, Any]]:
-    try:
-        return body["response"]["data"]["pagination"] or None
-    except Exception:
-        return None
-
-def _is_last(pg: Optional[Dict[str, Any]], current_page: int) -> bool:
-    if not pg:
-        return True
-    if pg.get("last") or pg.get("is_last"):
-        return True
-    total_pages = pg.get("total_pages")
-    if total_pages is not None and int(current_page) >= int(total_pages) - 1:
-        return True
-    return False
-
 # ---------- API fetch ----------
 @retry_policy()
 def _fetch_rooms_page(page: int, size: int) -> Dict[str, Any]:
-    with client() as c:
+    with client("motel") as c:
         r = c.get("/motelApi/v1/motelRooms", params={"page": page, "size": size})
         r.raise_for_status()
         return r.json()
 
 # ---------- main entry ----------
 def run_once():
-    page = 0
-    size = int(os.getenv("PAGE_SIZE", "50"))
+    size = page_size("rooms")
+    ck = open_checkpoint("get_motel_rooms", {"size": size})
+    start_page = ck.cursor
+    pager = Paginator(lambda p: _fetch_rooms_page(p, size), MOTEL, start_page=start_page, on_page_done=ck.advance)
     total_logged = 0
-    last_page_seen = 0
+    started = time.time()
 
-    while True:
-        body = _fetch_rooms_page(page, size)
-        items = _content(body)
+    for page, items in pager.pages():
+        entity_index.record("rooms", items)
 
         for it in items:
             created = it.get("created_at") or it.get("createdAt")
@@ -62,15 +43,14 @@ def run_once():
                 "status": it.get("status"),
             }))
             total_logged += 1
-
-        pg = _pagination(body)
-        last_page_seen = page
-        if _is_last(pg, page):
-            break
-        page = int(pg.get("page", page)) + 1
+    ck.complete()
+    # only a crawl from the first page has seen every room; a resumed one
+    # started from wherever the checkpoint was
+    if start_page == 0 and not ck.resumed:
+        entity_index.refreshed("rooms", started)
 
     log.info(json.dumps({
         "event": "motel_rooms_paging_done",
-        "pages_traversed_up_to": last_page_seen,
+        "pages_traversed_up_to": pager.page,
         "total_records_logged": total_logged
     }))
@@ -1,6 +1,7 @@
-import json, logging
+import json, logging, time
 from typing import Any, Dict, List
 from ..http_client import client, retry_policy
+from .. import entity_index
 
 log = logging.getLogger("get_room_categories")
 
@@ -14,12 +15,15 @@ def _items(body: Dict[str, Any]) -> List[Dict[str, Any]]:
 
 @retry_policy()
 def run_once():
-    with client() as c:
+    started = time.time()
+    with client("motel") as c:
         r = c.get("/motelApi/v1/motelRoomCategories")
         r.raise_for_status()
         body = r.json()
 
     items = _items(body)
+    entity_index.record("categories", items)
+    entity_index.refreshed("categories", started)
     total = 0
 
     for it in items:
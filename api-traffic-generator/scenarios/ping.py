@@ -1,6 +1,8 @@
-import json, logging, time
+import json, logging
 from ..http_client import client, retry_policy
 from ..config import get_settings
+from ..pacing import every
+from .. import metrics
 
 log = logging.getLogger("ping")
 _settings = get_settings()
@@ -18,7 +20,7 @@ def _body_matches(body: dict) -> bool:
 
 @retry_policy()
 def run_once():
-    with client() as c:
+    with client("motel") as c:
         r = c.get("/motelApi/v1/ping")
         r.raise_for_status()
         body = None
@@ -43,10 +45,11 @@ def run_once():
 
 def run_loop_every_second():
     """Run for DURATION_SECONDS (default 60), hitting ping once per second."""
-    end = time.time() + _settings.duration_seconds
-    while time.time() < end:
-        try:
-            run_once()
-        except Exception as e:
-            log.error(json.dumps({"event": "ping_error", "error": str(e)}))
-        time.sleep(1)
+    for intended in every(1.0, _settings.duration_seconds):
+        # a ping that overruns its second skips the next slot; the skipped
+        # slots are backfilled into the from_intended latency
+        with metrics.scheduled(intended, interval=1.0):
+            try:
+                run_once()
+            except Exception as e:
+                log.error(json.dumps({"event": "ping_error", "error": str(e)}))
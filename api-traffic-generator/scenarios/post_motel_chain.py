@@ -1,23 +1,20 @@
-import json, logging
+import os, json, logging
 import httpx
 from ..http_client import client, retry_policy
+from .. import entity_index
 from ..data_generators.motel_chain import motel_chain_payload
 
 log = logging.getLogger("post_motel_chain")
 
-# Maximum number of motel chains allowed
-MAX_MOTEL_CHAINS = 10
+# Maximum number of motel chains allowed (TASK=seed_scale for large data sets)
+MAX_MOTEL_CHAINS = int(os.getenv("MAX_MOTEL_CHAINS", "10"))
 
 @retry_policy()
 def get_motels_count():
     """Fetch the current count of motel chains from the API"""
-    with client() as c:
-        url = "/motelApi/v1/allMotels/count"
-        full_url = f"{c.base_url}{url}"
-        log.info(json.dumps({"event":"get_motels_count_check","url":full_url,"method":"GET"}))
-        
+    with client("motel") as c:
         try:
-            r = c.get(url)
+            r = c.get("/motelApi/v1/allMotels/count")
             r.raise_for_status()
             body = r.json()
             
@@ -66,17 +63,18 @@ def run_once():
     }))
     
     payload = motel_chain_payload()
-    log.info(json.dumps({"event":"post_motel_chain_payload","payload":payload}))
-    
+
     try:
-        with client() as c:
+        with client("motel") as c:
             url = "/motelApi/v1/motelChains"
             full_url = f"{c.base_url}{url}"
-            log.info(json.dumps({"event":"post_motel_chain_request","url":full_url,"method":"POST"}))
-            
             r = c.post(url, json=payload)
             r.raise_for_status()
-            log.info(json.dumps({"event":"post_motel_chain_success","status_code":r.status_code,"id":r.json().get("id") if r.headers.get("content-type","").startswith("application/json") else None}))
+            body = r.json() if r.headers.get("content-type","").startswith("application/json") else None
+            created = body.get("response", {}).get("data") if isinstance(body, dict) else None
+            if isinstance(created, dict):
+                entity_index.record("chains", [{**payload, **created}])
+            log.info(json.dumps({"event":"post_motel_chain_success","status_code":r.status_code,"id":body.get("id") if isinstance(body, dict) else None}))
             
     except httpx.ConnectError as e:
         log.error(json.dumps({"event":"post_motel_chain_connect_error","error":str(e),"url":full_url}))
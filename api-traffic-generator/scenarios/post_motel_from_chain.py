@@ -1,23 +1,23 @@
-import os, json, logging
-from typing import Any, Dict, List, Optional, Set
+import os, json, logging, time
+from typing import Any, Dict, Iterator, List, Optional, Set
 import httpx
 from ..http_client import client, retry_policy
+from .. import entity_index
+from ..checkpoint import Checkpoint, open_checkpoint
+from ..paginator import MOTEL, Paginator
+from ..page_tuning import page_size
 
 log = logging.getLogger("post_motel_from_chain_all")
 
-# Maximum number of motels allowed
-MAX_MOTEL = 50
+# Maximum number of motels allowed (TASK=seed_scale for large data sets)
+MAX_MOTEL = int(os.getenv("MAX_MOTELS", "50"))
 
 @retry_policy()
 def get_motels_count():
     """Fetch the current count of motels from the API"""
-    with client() as c:
-        url = "/motelApi/v1/allMotels/count"
-        full_url = f"{c.base_url}{url}"
-        log.info(json.dumps({"event":"get_motels_count_check","url":full_url,"method":"GET"}))
-        
+    with client("motel") as c:
         try:
-            r = c.get(url)
+            r = c.get("/motelApi/v1/allMotels/count")
             r.raise_for_status()
             body = r.json()
             
@@ -43,44 +43,17 @@ def get_motels_count():
             # If we can't get the count, allow the creation to proceed
             return 0
 
-# ---------- helpers for chain list shape ----------
-def _chains(body: Dict[str, Any]) -> List[Dict[str, Any]]:
-    # Expect: { response: { data: { content: [ ... ] } } }
-    try:
-        data = body["response"]["data"]
-        if isinstance(data, dict) and isinstance(data.get("content"), list):
-            return data["content"]
-        return []
-    except Exception:
-        return []
-
-def _pagination(body: Dict[str, Any]) -> Optional[Dict[str, Any]]:
-    try:
-        return body["response"]["data"]["pagination"]
-    except Exception:
-        return None
-
-def _is_last(pg: Optional[Dict[str, Any]], page: int) -> bool:
-    if not pg:
-        return True
-    if pg.get("last") or pg.get("is_last"):
-        return True
-    total_pages = pg.get("total_pages")
-    if total_pages is not None and int(page) >= int(total_pages) - 1:
-        return True
-    return False
-
 # ---------- API calls ----------
 @retry_policy()
 def _fetch_chains_page(page: int, size: int, path: str) -> Dict[str, Any]:
-    with client() as c:
+    with client("motel") as c:
         r = c.get(path, params={"page": page, "size": size})
         r.raise_for_status()
         return r.json()
 
 @retry_policy()
 def _post_motel(payload: Dict[str, Any]) -> Dict[str, Any]:
-    with client() as c:
+    with client("motel") as c:
         r = c.post("/motelApi/v1/motels", json=payload)
         r.raise_for_status()
         try:
@@ -88,6 +61,40 @@ def _post_motel(payload: Dict[str, Any]) -> Dict[str, Any]:
         except Exception:
             return {"status_code": r.status_code}
 
+# ---------- chain source: entity index when fresh, otherwise a paged crawl ----------
+def _crawl_chains(size: int, path: str, stats: Dict[str, Any], ck: Checkpoint) -> Iterator[Dict[str, Any]]:
+    started = time.time()
+    start_page = ck.cursor
+    # on_page_done only fires once every chain of the previous page was handled
+    pager = Paginator(lambda p: _fetch_chains_page(p, size, path), MOTEL,
+                      start_page=start_page, on_page_done=ck.advance)
+    stats["source"] = "crawl"
+    for page, items in pager.pages():
+        entity_index.record("chains", items)
+        stats["pages_traversed"] = page
+        yield from items
+    # only a crawl from the first page has seen every chain; a resumed one
+    # started from wherever the checkpoint was
+    if start_page == 0 and not ck.resumed:
+        entity_index.refreshed("chains", started)
+
+def _iter_chains(size: int, path: str, stats: Dict[str, Any], ck: Checkpoint) -> Iterator[Dict[str, Any]]:
+    idx = entity_index.get_index()
+    if idx and idx.is_fresh("chains"):
+        log.info(json.dumps({"event": "chains_from_index", "count": idx.count("chains")}))
+        # no pages fetched: the summary reports null rather than page 0
+        stats["source"], stats["pages_traversed"] = "index", None
+        for row in idx.rows("chains"):
+            yield {
+                "motelChainId": row["id"],
+                "motelChainName": row["name"],
+                "status": row["status"],
+                "state": row["state"],
+                "pincode": row["pincode"],
+            }
+        return
+    yield from _crawl_chains(size, path, stats, ck)
+
 # ---------- filtering & payload ----------
 def _parse_allowed_statuses() -> Set[str]:
     """
@@ -164,69 +171,73 @@ def run_once():
         "max_allowed": MAX_MOTEL
     }))
     
-    page = 0
-    size = int(os.getenv("PAGE_SIZE", "50"))
     path = os.getenv("CHAIN_GET_PATH", "/motelApi/v1/motelChains")
+    size = page_size("chains", path=path)
     allowed_statuses = _parse_allowed_statuses()  # empty set == include all
 
+    ck = open_checkpoint("post_motel_from_chain", {
+        "size": size, "path": path, "statuses": sorted(allowed_statuses),
+        "name": os.getenv("MOTEL_NAME_TEMPLATE", "{chain} - " + os.getenv("MOTEL_NAME_SUFFIX", "Motel1")),
+    })
     chains_seen = 0
     posted = 0
     failed = 0
-    pages_traversed = 0
-
-    while True:
-        body = _fetch_chains_page(page, size, path)
-        items = _chains(body)
-
-        for ch in items:
-            chains_seen += 1
-            if not _include_chain(ch, allowed_statuses):
-                continue
-
-            payload = _compose_payload(ch)
-
-            try:
-                resp = _post_motel(payload)
-                out = _extract_created_fields(resp)
-                posted += 1
-                log.info(json.dumps({
-                    "event": "motel_created",
-                    "motelChainId": payload["motelChainId"],
-                    "motelName": payload["motelName"],
-                    "state": payload["state"],
-                    "pincode": payload["pincode"],
-                    "motelId": out.get("motelId"),
-                    "createdAt": out.get("createdAt"),
-                    "updatedAt": out.get("updatedAt"),
-                }))
-            except httpx.HTTPStatusError as e:
-                failed += 1
-                code = e.response.status_code if e.response is not None else None
-                log.error(json.dumps({
-                    "event": "motel_create_failed",
-                    "http_status": code,
-                    "error": str(e),
-                    "payload": payload
-                }))
-            except Exception as e:
-                failed += 1
-                log.error(json.dumps({
-                    "event": "motel_create_failed",
-                    "error": str(e),
-                    "payload": payload
-                }))
-
-        pg = _pagination(body)
-        pages_traversed = page
-        if _is_last(pg, page):
-            break
-        page = int(pg.get("page", page)) + 1
+    skipped_done = 0
+    stats: Dict[str, Any] = {"pages_traversed": 0, "source": None}
+
+    for ch in _iter_chains(size, path, stats, ck):
+        chains_seen += 1
+        if not _include_chain(ch, allowed_statuses):
+            continue
+
+        payload = _compose_payload(ch)
+        if ck.is_done(str(payload["motelChainId"])):
+            skipped_done += 1
+            continue
+
+        try:
+            resp = _post_motel(payload)
+            out = _extract_created_fields(resp)
+            posted += 1
+            ck.mark_done(str(payload["motelChainId"]))
+            if out.get("motelId") not in (None, "", "None"):
+                entity_index.record("motels", [{**payload, "motelId": out["motelId"]}])
+            log.info(json.dumps({
+                "event": "motel_created",
+                "motelChainId": payload["motelChainId"],
+                "motelName": payload["motelName"],
+                "state": payload["state"],
+                "pincode": payload["pincode"],
+                "motelId": out.get("motelId"),
+                "createdAt": out.get("createdAt"),
+                "updatedAt": out.get("updatedAt"),
+            }))
+        except httpx.HTTPStatusError as e:
+            failed += 1
+            code = e.response.status_code if e.response is not None else None
+            log.error(json.dumps({
+                "event": "motel_create_failed",
+                "http_status": code,
+                "error": str(e),
+                "payload": payload
+            }))
+        except Exception as e:
+            failed += 1
+            log.error(json.dumps({
+                "event": "motel_create_failed",
+                "error": str(e),
+                "payload": payload
+            }))
+
+    ck.complete()
 
     log.info(json.dumps({
         "event": "post_motel_from_chain_all_done",
-        "pages_traversed_up_to": pages_traversed,
+        "pages_traversed_up_to": stats["pages_traversed"],
+        "chain_source": stats["source"],
         "chains_seen": chains_seen,
         "motels_posted": posted,
         "motels_failed": failed,
+        "skipped_from_checkpoint": skipped_done,
         "status_filter": list(allowed_statuses) if allowed_statuses else "ALL"
     }))
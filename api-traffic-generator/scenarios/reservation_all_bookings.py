@@ -1,40 +1,18 @@
-import os, json, logging
-from typing import Any, Dict, List, Optional
+import os, json, logging, time
+from typing import Any, Dict
 from ..http_client import client, retry_policy
+from ..checkpoint import open_checkpoint
+from ..paginator import RESERVATION, Paginator
+from ..page_tuning import page_size
+from .. import entity_index
 
 log = logging.getLogger("reservation_all_bookings")
 
-# ----- helpers for the given shape -----
-def _items(body: Dict[str, Any]) -> List[Dict[str, Any]]:
-    # Expected:
-    # { "response": { "http_code":"200", "data": { "data": [ ... ], "pagination": {...} } } }
-    try:
-        data = body["response"]["data"]
-        if isinstance(data, dict):
-            inner = data.get("data")
-            if isinstance(inner, list):
-                return inner
-        return data if isinstance(data, list) else []
-    except Exception:
-        return []
-
-def _pagination(body: Dict[str, Any]) -> Optional[Dict[str, Any]]:
-    try:
-        data = body["response"]["data"]
-        return data.get("pagination") if isinstance(data, dict) else None
-    except Exception:
-        return None
-
-def _bool(x) -> bool:
-    if isinstance(x, bool): return x
-    if isinstance(x, str): return x.lower() in ("1","true","yes")
-    return bool(x)
-
 # ----- API call -----
 @retry_policy()
 def _fetch(page: int, per_page: int, page_param: str, per_page_param: str) -> Dict[str, Any]:
     params = {page_param: page, per_page_param: per_page}
-    with client() as c:
+    with client("reservation") as c:
         r = c.get("/reservationApi/v1/allbookings", params=params)
         r.raise_for_status()
         return r.json()
@@ -42,17 +20,21 @@ def _fetch(page: int, per_page: int, page_param: str, per_page_param: str) -> Di
 # ----- main entry -----
 def run_once():
     start_page = int(os.getenv("START_PAGE", "1"))          # sample shows 1-based pages
-    per_page = int(os.getenv("BOOKINGS_PER_PAGE", "50"))
+    per_page = page_size("bookings", "BOOKINGS_PER_PAGE")
     page_param = os.getenv("BOOKINGS_PAGE_PARAM", "page")   # customize if API expects "current_page"
     per_page_param = os.getenv("BOOKINGS_PER_PAGE_PARAM", "per_page")
 
-    page = start_page
+    ck = open_checkpoint("reservation_all_bookings", {
+        "start_page": start_page, "per_page": per_page,
+        "page_param": page_param, "per_page_param": per_page_param,
+    }, start_cursor=start_page)
+    pager = Paginator(lambda p: _fetch(p, per_page, page_param, per_page_param), RESERVATION,
+                      start_page=ck.cursor, on_page_done=ck.advance)
     total_logged = 0
-    pages_visited = 0
+    started = time.time()
 
-    while True:
-        body = _fetch(page, per_page, page_param, per_page_param)
-        items = _items(body)
+    for _, items in pager.pages():
+        entity_index.record("bookings", items)
 
         for it in items:
             log.info(json.dumps({
@@ -67,27 +49,15 @@ def run_once():
             }))
             total_logged += 1
 
-        pages_visited += 1
-        pg = _pagination(body)
-        if not pg:
-            break
-
-        current_page = int(pg.get("current_page", page))
-        has_next = _bool(pg.get("has_next"))
-        total_pages = pg.get("total_pages")
-
-        if not has_next:
-            break
-        if total_pages is not None and current_page >= int(total_pages):
-            break
+    ck.complete()
 
-        next_page = current_page + 1
-        if next_page == page:   # safety
-            break
-        page = next_page
+    # only a crawl from the first page has seen every booking; a resumed one
+    # started from wherever the checkpoint was
+    if start_page <= 1 and not ck.resumed:
+        entity_index.refreshed("bookings", started)
 
     log.info(json.dumps({
         "event": "reservation_all_bookings_done",
-        "pages_visited": pages_visited,
+        "pages_visited": pager.pages_visited,
         "total_records_logged": total_logged
     }))
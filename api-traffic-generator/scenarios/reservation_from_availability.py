@@ -1,46 +1,28 @@
-import os, json, logging
-from typing import Any, Dict, List, Optional
+import os, json, logging, random, threading
+from collections import deque
+from typing import Any, Deque, Dict, Iterator, List, Optional, Tuple
 from datetime import datetime, timedelta
 from ..http_client import client, retry_policy
+from ..config import get_settings
+from ..pacing import run_open_loop
+from ..paginator import RESERVATION, Paginator
+from ..page_tuning import page_size
+from .. import entity_index, keyspace
 
 log = logging.getLogger("reservation_from_availability")
 
-# ---------- helpers for allMotels shape ----------
-def _items(body: Dict[str, Any]) -> List[Dict[str, Any]]:
-    try:
-        data = body["response"]["data"]
-        if isinstance(data, dict):
-            inner = data.get("data")
-            if isinstance(inner, list):
-                return inner
-        return data if isinstance(data, list) else []
-    except Exception:
-        return []
-
-def _pagination(body: Dict[str, Any]) -> Optional[Dict[str, Any]]:
-    try:
-        data = body["response"]["data"]
-        return data.get("pagination") if isinstance(data, dict) else None
-    except Exception:
-        return None
-
-def _bool(x) -> bool:
-    if isinstance(x, bool): return x
-    if isinstance(x, str): return x.lower() in ("1","true","yes")
-    return bool(x)
-
 # ---------- API calls ----------
 @retry_policy()
 def _fetch_availability(page: int, per_page: int, page_param: str, per_page_param: str) -> Dict[str, Any]:
     params = {page_param: page, per_page_param: per_page}
-    with client() as c:
+    with client("reservation") as c:
         r = c.get("/reservationApi/v1/allMotels", params=params)
         r.raise_for_status()
         return r.json()
 
 @retry_policy()
 def _post_reservation(payload: Dict[str, Any]) -> Dict[str, Any]:
-    with client() as c:
+    with client("reservation") as c:
         r = c.post("/reservationApi/v1/reservation", json=payload)
         r.raise_for_status()
         try:
@@ -49,6 +31,39 @@ def _post_reservation(payload: Dict[str, Any]) -> Dict[str, Any]:
             return {"status_code": r.status_code}
 
 # ---------- extraction ----------
+def _is_candidate(it: Dict[str, Any], desired_room_type: Optional[str], desired_date: Optional[str]) -> bool:
+    status_ok = (it.get("status") or "").strip().lower() == "active"
+    type_ok = True if not desired_room_type else (it.get("room_type") == desired_room_type)
+    date_ok = True if not desired_date else (it.get("date") == desired_date)
+    return status_ok and _available(it) > 0 and type_ok and date_ok
+
+def _available(it: Dict[str, Any]) -> int:
+    # available_room_number may be string -> cast to int safely
+    try:
+        return int(str(it.get("available_room_number", "0")))
+    except Exception:
+        return 0
+
+def _iter_availability(
+    page_start: int,
+    per_page: int,
+    page_param: str,
+    per_page_param: str,
+    stats: Dict[str, int],
+    prefetch: Optional[bool] = None,
+) -> Iterator[Dict[str, Any]]:
+    pager = Paginator(lambda p: _fetch_availability(p, per_page, page_param, per_page_param),
+                      RESERVATION, start_page=page_start, prefetch=prefetch)
+    for _, items in pager.pages():
+        stats["pages_scanned"] = pager.pages_visited
+        yield from items
+
+def choose_candidate(cands: List[Dict[str, Any]], r: Optional[random.Random] = None) -> Dict[str, Any]:
+    """A date from the KEY_DISTRIBUTION for dates (earliest = hottest), then a motel offering it."""
+    dates = sorted({str(c.get("date") or "") for c in cands})
+    day = keyspace.choice("dates", dates, r)
+    return keyspace.choice("motels", [c for c in cands if str(c.get("date") or "") == day], r)
+
 def _extract_one_candidate(
     page_start: int,
     per_page: int,
@@ -57,45 +72,85 @@ def _extract_one_candidate(
     desired_room_type: Optional[str],
     desired_date: Optional[str],
 ) -> Optional[Dict[str, Any]]:
-    page = page_start
-    seen_pages = 0
-    while True:
-        body = _fetch_availability(page, per_page, page_param, per_page_param)
-        items = _items(body)
-        for it in items:
-            status_ok = (it.get("status") or "").strip().lower() == "active"
-            # available_room_number may be string -> cast to int safely
-            try:
-                avail = int(str(it.get("available_room_number", "0")))
-            except Exception:
-                avail = 0
-            type_ok = True if not desired_room_type else (it.get("room_type") == desired_room_type)
-            date_ok = True if not desired_date else (it.get("date") == desired_date)
-
-            if status_ok and avail > 0 and type_ok and date_ok:
-                return it
-
-        seen_pages += 1
-        pg = _pagination(body)
-        if not pg:
-            break
-        current_page = int(pg.get("current_page", page))
-        has_next = _bool(pg.get("has_next"))
-        total_pages = pg.get("total_pages")
-
-        if not has_next:
-            break
-        if total_pages is not None and current_page >= int(total_pages):
-            break
-
-        next_page = current_page + 1
-        if next_page == page:
-            break
-        page = next_page
-
-    log.warning(json.dumps({"event": "no_candidate_found", "pages_scanned": seen_pages}))
+    stats = {"pages_scanned": 0}
+    # chooses within the first page that has candidates, so don't spend a request on the next one
+    pager = Paginator(lambda p: _fetch_availability(p, per_page, page_param, per_page_param),
+                      RESERVATION, start_page=page_start, prefetch=False)
+    for _, items in pager.pages():
+        stats["pages_scanned"] = pager.pages_visited
+        cands = [it for it in items if _is_candidate(it, desired_room_type, desired_date)]
+        if cands:
+            return choose_candidate(cands)
+
+    log.warning(json.dumps({"event": "no_candidate_found", "pages_scanned": stats["pages_scanned"]}))
     return None
 
+# ---------- burst mode: in-memory candidate pool ----------
+class CandidatePool:
+    """
+    Availability snapshot indexed by (room_type, date). With uniform keys,
+    picks rotate over the keys and, within a key, over motels, so consecutive
+    bookings spread evenly across dates, room types and motels; a skewed
+    KEY_DISTRIBUTION for dates/motels concentrates them instead (keys in
+    snapshot order, earliest = hottest). A pick reserves one room; `release`
+    gives it back when the POST fails.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._by_key: Dict[Tuple[Any, Any], Deque[Dict[str, Any]]] = {}
+        self._keys: Deque[Tuple[Any, Any]] = deque()
+        self.rooms_left = 0
+        self._rotate = keyspace.is_uniform("dates") and keyspace.is_uniform("motels")
+
+    def add(self, it: Dict[str, Any]) -> None:
+        n = _available(it)
+        if n <= 0:
+            return
+        self._append({"item": it, "remaining": n})
+        self.rooms_left += n
+
+    @property
+    def key_count(self) -> int:
+        return len(self._keys)
+
+    def pick(self) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            if not self._keys:
+                return None
+            if self._rotate:
+                key = self._keys[0]
+                self._keys.rotate(-1)
+                cands = self._by_key[key]
+                cand = cands[0]
+                cands.rotate(-1)
+            else:
+                key = self._keys[keyspace.pick_index("dates", len(self._keys))]
+                cands = self._by_key[key]
+                cand = cands[keyspace.pick_index("motels", len(cands))]
+            cand["remaining"] -= 1
+            self.rooms_left -= 1
+            if cand["remaining"] <= 0:
+                cands.remove(cand)
+                if not cands:
+                    del self._by_key[key]
+                    self._keys.remove(key)
+            return cand
+
+    def release(self, cand: Dict[str, Any]) -> None:
+        with self._lock:
+            cand["remaining"] += 1
+            self.rooms_left += 1
+            if cand["remaining"] == 1:  # it had been taken out of the pool
+                self._append(cand)
+
+    def _append(self, cand: Dict[str, Any]) -> None:
+        key = (cand["item"].get("room_type"), cand["item"].get("date"))
+        if key not in self._by_key:
+            self._by_key[key] = deque()
+            self._keys.append(key)
+        self._by_key[key].append(cand)
+
 def _extract_created_fields(resp: Dict[str, Any]) -> Dict[str, Optional[str]]:
     """
     Response example:
@@ -117,26 +172,8 @@ def _extract_created_fields(resp: Dict[str, Any]) -> Dict[str, Optional[str]]:
             "updated_at": str(flat.get("updated_at") or flat.get("updatedAt") or ""),
         }
 
-# ---------- main entry ----------
-def run_once():
-    # ENV knobs
-    start_page = int(os.getenv("START_PAGE", "1"))                 # sample shows 1-based
-    per_page = int(os.getenv("RESV_PER_PAGE", "50"))
-    page_param = os.getenv("RESV_PAGE_PARAM", "page")              # if API expects 'page'/'current_page'
-    per_page_param = os.getenv("RESV_PER_PAGE_PARAM", "per_page")
-    # Optional filters
-    desired_room_type = os.getenv("RESV_ROOM_TYPE")                # e.g., "Deluxe Suite"
-    desired_date = os.getenv("RESV_DATE")                          # e.g., "2025-08-16"
-    # Poster identity/status
-    name = os.getenv("RESERVATION_NAME", "John Doe")
-    email = os.getenv("RESERVATION_EMAIL", "john.doe@example.com")
-    status = os.getenv("RESERVATION_STATUS", "Confirmed")
-
-    cand = _extract_one_candidate(start_page, per_page, page_param, per_page_param, desired_room_type, desired_date)
-    if not cand:
-        log.error(json.dumps({"event": "reservation_candidate_none"}))
-        return
-
+# ---------- booking ----------
+def _compose_payload(cand: Dict[str, Any], name: str, email: str, status: str) -> Dict[str, Any]:
     # Build one-night stay payload from availability item
     # 'date' is the check-in; check-out is +1 day
     check_in_date = cand.get("date")
@@ -148,7 +185,7 @@ def run_once():
         check_in_date = dt_in.date().isoformat()
     check_out_date = (dt_in + timedelta(days=1)).date().isoformat()
 
-    payload = {
+    return {
         "motel_id": cand.get("motel_id"),
         "motel_chain_id": cand.get("motel_chain_id"),
         "motel_room_category_id": cand.get("motel_room_category_id"),
@@ -161,10 +198,12 @@ def run_once():
         "check_out": check_out_date,
     }
 
-    # Single POST (exactly one)
+def _book(payload: Dict[str, Any]) -> bool:
     try:
         resp = _post_reservation(payload)
         created = _extract_created_fields(resp)
+        if created.get("motel_reservation_id") not in (None, "", "None"):
+            entity_index.record("bookings", [{**payload, "motel_reservation_id": created["motel_reservation_id"]}])
         log.info(json.dumps({
             "event": "reservation_created",
             "motel_reservation_id": created.get("motel_reservation_id"),
@@ -179,9 +218,94 @@ def run_once():
             "check_in": payload["check_in"],
             "check_out": payload["check_out"],
         }))
+        return True
     except Exception as e:
         log.error(json.dumps({
             "event": "reservation_create_failed",
             "error": str(e),
             "payload": payload
         }))
+        return False
+
+def _run_burst(start_page: int, per_page: int, page_param: str, per_page_param: str,
+               desired_room_type: Optional[str], desired_date: Optional[str],
+               name: str, email: str, status: str) -> None:
+    """
+    Load the availability snapshot once, then book from the in-memory pool at
+    RESV_BURST_RPS for DURATION_SECONDS (or until every room is taken).
+    """
+    rate = float(os.getenv("RESV_BURST_RPS", "1"))
+    if rate <= 0:
+        raise ValueError(f"RESV_BURST_RPS must be > 0, got {rate:g}")
+    concurrency = int(os.getenv("RESV_BURST_CONCURRENCY", "4"))
+    duration = get_settings().duration_seconds
+
+    pool = CandidatePool()
+    stats = {"pages_scanned": 0}
+    for it in _iter_availability(start_page, per_page, page_param, per_page_param, stats):
+        if _is_candidate(it, desired_room_type, desired_date):
+            pool.add(it)
+    log.info(json.dumps({
+        "event": "burst_snapshot_loaded",
+        "pages_scanned": stats["pages_scanned"],
+        "room_type_date_keys": pool.key_count,
+        "rooms_available": pool.rooms_left,
+    }))
+    if not pool.key_count:
+        log.error(json.dumps({"event": "reservation_candidate_none"}))
+        return
+
+    exhausted = threading.Event()
+    counts = {"booked": 0, "failed": 0}
+    counts_lock = threading.Lock()
+
+    def _book_one():
+        cand = pool.pick()
+        if cand is None:
+            exhausted.set()
+            return
+        ok = _book(_compose_payload(cand["item"], name, email, status))
+        if not ok:
+            pool.release(cand)
+        with counts_lock:
+            counts["booked" if ok else "failed"] += 1
+
+    run_open_loop(_book_one, rate, duration, concurrency, "reservation_burst", stop=exhausted)
+    log.info(json.dumps({
+        "event": "burst_booking_done",
+        "booked": counts["booked"],
+        "failed": counts["failed"],
+        "rooms_left": pool.rooms_left,
+        "pool_exhausted": exhausted.is_set(),
+    }))
+
+# ---------- main entry ----------
+def run_once():
+    # ENV knobs
+    start_page = int(os.getenv("START_PAGE", "1"))                 # sample shows 1-based
+    per_page = page_size("reservation_motels", "RESV_PER_PAGE")
+    page_param = os.getenv("RESV_PAGE_PARAM", "page")              # if API expects 'page'/'current_page'
+    per_page_param = os.getenv("RESV_PER_PAGE_PARAM", "per_page")
+    # Optional filters
+    desired_room_type = os.getenv("RESV_ROOM_TYPE")                # e.g., "Deluxe Suite"
+    desired_date = os.getenv("RESV_DATE")                          # e.g., "2025-08-16"
+    # Poster identity/status
+    name = os.getenv("RESERVATION_NAME", "John Doe")
+    email = os.getenv("RESERVATION_EMAIL", "john.doe@example.com")
+    status = os.getenv("RESERVATION_STATUS", "Confirmed")
+    # "once" = one candidate from the first page that has any (date and motel picked
+    # through the keyspace distribution), exactly one POST; "burst" = snapshot + paced bookings
+    mode = os.getenv("RESV_MODE", "once").lower()
+
+    if mode == "burst":
+        _run_burst(start_page, per_page, page_param, per_page_param,
+                   desired_room_type, desired_date, name, email, status)
+        return
+
+    cand = _extract_one_candidate(start_page, per_page, page_param, per_page_param, desired_room_type, desired_date)
+    if not cand:
+        log.error(json.dumps({"event": "reservation_candidate_none"}))
+        return
+
+    # Single POST (exactly one)
+    _book(_compose_payload(cand, name, email, status))
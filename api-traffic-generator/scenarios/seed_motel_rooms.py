@@ -1,7 +1,10 @@
-import os, json, logging
-from typing import Any, Dict, List, Optional
+import os, json, logging, time
+from typing import Any, Dict, Iterator, List, Optional
 import httpx
 from ..http_client import client, retry_policy
+from .. import entity_index
+from ..checkpoint import open_checkpoint
+from ..templates import Template
 
 log = logging.getLogger("seed_motel_rooms")
 
@@ -15,11 +18,36 @@ def _items(body: Dict[str, Any]) -> List[Dict[str, Any]]:
 
 @retry_policy()
 def _fetch_room_categories() -> List[Dict[str, Any]]:
-    with client() as c:
+    with client("motel") as c:
         r = c.get("/motelApi/v1/motelRoomCategories")
         r.raise_for_status()
         return _items(r.json())
 
+def _room_categories() -> Iterator[Dict[str, Any]]:
+    """
+    Categories from the entity index while it is fresh (streamed in batches,
+    so memory doesn't grow with the category count), otherwise one fetch that
+    refreshes it.
+    """
+    idx = entity_index.get_index()
+    if idx and idx.is_fresh("categories"):
+        log.info(json.dumps({"event": "room_categories_from_index", "count": idx.count("categories")}))
+        for row in idx.rows("categories"):
+            yield {
+                "motelRoomCategoryId": row["id"],
+                "motelId": row["motel_id"],
+                "motelChainId": row["chain_id"],
+                "roomCategoryName": row["name"],
+                "displayName": row["display_name"],
+                "status": row["status"],
+            }
+        return
+    started = time.time()
+    cats = _fetch_room_categories()
+    entity_index.record("categories", cats)
+    entity_index.refreshed("categories", started)
+    yield from cats
+
 # ---------- POST /motelApi/v1/motelRooms ----------
 def _extract_room_id_and_updated_at(resp_body: Any) -> Dict[str, Optional[str]]:
     """
@@ -54,11 +82,22 @@ def _extract_room_id_and_updated_at(resp_body: Any) -> Dict[str, Optional[str]]:
                         updated_at = str(vv)
     return {"roomId": room_id, "updated_at": updated_at}
 
+# Everything but the room number and floor is fixed per category
+ROOM_VARY = ("roomNumber", "floor")
+
+def room_template(cat: Dict[str, Any], status: str) -> Template:
+    return Template({
+        "motelChainId": cat.get("motelChainId"),
+        "motelId": cat.get("motelId"),
+        "motelRoomCategoryId": cat.get("motelRoomCategoryId"),
+        "status": status,
+    }, vary=ROOM_VARY)
+
 @retry_policy()
-def _post_room(payload: Dict[str, Any]) -> Dict[str, Any]:
+def _post_room(body: bytes) -> Dict[str, Any]:
     path = os.getenv("ROOM_POST_PATH", "/motelApi/v1/motelRooms")
-    with client() as c:
-        r = c.post(path, json=payload)
+    with client("motel") as c:
+        r = c.post(path, content=body)
         r.raise_for_status()
         try:
             return r.json()
@@ -82,8 +121,13 @@ def run_once():
     room_status = os.getenv("ROOM_STATUS", "Active")
     only_active_cats = os.getenv("ONLY_ACTIVE_CATEGORIES", "true").lower() in ("1", "true", "yes")
 
-    categories = _fetch_room_categories()
+    categories = _room_categories()
+    ck = open_checkpoint("seed_motel_rooms", {
+        "floors": [floor_start, floor_end], "rooms_per_floor": rooms_per_floor,
+        "status": room_status, "only_active": only_active_cats,
+    })
     total_posts = 0
+    skipped_done = 0
     categories_seen = 0
 
     for cat in categories:
@@ -105,30 +149,30 @@ def run_once():
             continue
 
         categories_seen += 1
+        tpl = room_template(cat, room_status)
 
         for floor in range(floor_start, floor_end + 1):
             for i in range(1, rooms_per_floor + 1):
-                payload = {
-                    "motelChainId": motel_chain_id,
-                    "motelId": motel_id,
-                    "motelRoomCategoryId": category_id,
-                    "roomNumber": _make_room_number(floor, i),
-                    "floor": str(floor),
-                    "status": room_status,
-                }
+                done_key = f"{category_id}:{_make_room_number(floor, i)}"
+                if ck.is_done(done_key):
+                    skipped_done += 1
+                    continue
+                room = {"roomNumber": _make_room_number(floor, i), "floor": str(floor)}
 
                 try:
-                    resp = _post_room(payload)
+                    resp = _post_room(tpl.render(**room))
                     parsed = _extract_room_id_and_updated_at(resp)
                     total_posts += 1
+                    ck.mark_done(done_key)
+                    entity_index.record("rooms", [{**tpl.payload(**room), "roomId": parsed.get("roomId")}])
                     log.info(json.dumps({
                         "event": "motel_room_created",
                         "motelChainId": motel_chain_id,
                         "motelId": motel_id,
                         "motelRoomCategoryId": category_id,
                         "categoryDisplayName": display_name,
-                        "roomNumber": payload["roomNumber"],
-                        "floor": payload["floor"],
+                        "roomNumber": room["roomNumber"],
+                        "floor": room["floor"],
                         "roomId": parsed.get("roomId"),
                         "updated_at": parsed.get("updated_at"),
                     }))
@@ -138,19 +182,22 @@ def run_once():
                         "event": "motel_room_create_failed",
                         "http_status": code,
                         "error": str(e),
-                        "payload": payload
+                        "payload": tpl.payload(**room)
                     }))
                 except Exception as e:
                     log.error(json.dumps({
                         "event": "motel_room_create_failed",
                         "error": str(e),
-                        "payload": payload
+                        "payload": tpl.payload(**room)
                     }))
 
+    ck.complete()
+
     log.info(json.dumps({
         "event": "seed_motel_rooms_done",
         "categories_processed": categories_seen,
         "total_rooms_posted": total_posts,
+        "skipped_from_checkpoint": skipped_done,
         "floors": f"{floor_start}-{floor_end}",
         "rooms_per_floor": rooms_per_floor
     }))
@@ -2,6 +2,11 @@ import os, json, logging
 from uuid import uuid4
 from typing import Any, Dict, List, Optional
 from ..http_client import client, retry_policy
+from .. import entity_index
+from ..checkpoint import open_checkpoint
+from ..paginator import MOTEL, Paginator
+from ..page_tuning import page_size
+from ..templates import Template
 
 log = logging.getLogger("seed_room_categories")
 
@@ -50,120 +55,57 @@ def _categories() -> List[Dict[str, str]]:
     except Exception:
         return DEFAULT_CATEGORIES
 
-# ---------- helpers for common response shape ----------
-def _content(body: Dict[str, Any]) -> List[Dict[str, Any]]:
-    try:
-        return body["response"]["data"]["content"] or []
-    except Exception:
-        return []
+# Everything but the motel's IDs is fixed per category definition
+CATEGORY_VARY = ("motelChainId", "motelId")
 
-def _pagination(body: Dict[str, Any]) -> Optional[Dict[str, Any]]:
-    try:
-        return body["response"]["data"]["pagination"] or None
-    except Exception:
-        return None
-
-def _is_last(pg: Optional[Dict[str, Any]], current_page: int) -> bool:
-    if not pg:
-        return True
-    if pg.get("last") or pg.get("is_last"):
-        return True
-    total_pages = pg.get("total_pages")
-    if total_pages is not None and int(current_page) >= int(total_pages) - 1:
-        return True
-    return False
+def category_template(cdef: Dict[str, str], status: str) -> Template:
+    return Template({
+        "displayName": cdef.get("displayName"),
+        "roomCategoryName": cdef.get("roomCategoryName"),
+        "description": cdef.get("description") or cdef.get("desicription") or "",
+        "status": status,
+    }, vary=CATEGORY_VARY)
 
 # ---------- API calls ----------
 @retry_policy()
 def _fetch_motels_page(page: int, size: int) -> Dict[str, Any]:
-    with client() as c:
+    with client("motel") as c:
         r = c.get("/motelApi/v1/motels", params={"page": page, "size": size})
         r.raise_for_status()
         return r.json()
 
 @retry_policy()
-def _post_room_category(path: str, payload: Dict[str, Any]) -> Dict[str, Any]:
-    with client() as c:
-        full_url = f"{c.base_url}{path}"
-        # Log the request payload and headers
-        log.info(json.dumps({
-            "event": "room_category_request",
-            "url": full_url,
-            "method": "POST",
-            "headers": dict(c.headers),
-            "payload": payload,
-            "payload_raw_json": json.dumps(payload, separators=(',', ':'))
-        }))
-        
+def _post_room_category(path: str, body: bytes) -> Dict[str, Any]:
+    # failed requests are logged with status, bodies (and headers with DIAG_HEADERS) by the HTTP layer
+    with client("motel") as c:
+        r = c.post(path, content=body)
+        r.raise_for_status()
         try:
-            r = c.post(path, json=payload)
-            
-            # Log response details for successful requests too
-            log.info(json.dumps({
-                "event": "room_category_response",
-                "url": full_url,
-                "status_code": r.status_code,
-                "response_headers": dict(r.headers),
-                "response_size": len(r.content) if r.content else 0
-            }))
-            
-            r.raise_for_status()
-            try:
-                return r.json()
-            except Exception:
-                return {"status_code": r.status_code}
-        except Exception as e:
-            # Log detailed failure response
-            error_data = {
-                "event": "room_category_request_failed",
-                "url": full_url,
-                "error": str(e),
-                "error_type": type(e).__name__,
-                "payload": payload,
-                "payload_raw_json": json.dumps(payload, separators=(',', ':')),
-                "request_headers": dict(c.headers)
-            }
-            
-            # Add response details if available
-            if hasattr(e, 'response') and e.response is not None:
-                error_data.update({
-                    "status_code": e.response.status_code,
-                    "response_headers": dict(e.response.headers),
-                })
-                try:
-                    error_data["response_body"] = e.response.json()
-                except:
-                    try:
-                        error_data["response_text"] = e.response.text
-                    except:
-                        error_data["response_text"] = "Could not read response body"
-                        
-                # Log raw response content for debugging
-                try:
-                    error_data["response_content_length"] = len(e.response.content) if e.response.content else 0
-                    error_data["response_encoding"] = e.response.encoding
-                except:
-                    pass
-            
-            log.error(json.dumps(error_data))
-            raise
+            return r.json()
+        except Exception:
+            return {"status_code": r.status_code}
 
 # ---------- main entry ----------
 def run_once():
-    page = 0
-    size = int(os.getenv("PAGE_SIZE", "50"))
+    size = page_size("motels")
     only_active = os.getenv("ONLY_ACTIVE", "true").lower() in ("1", "true", "yes")
     category_status = os.getenv("ROOM_CATEGORY_STATUS", "Active")
     # Default endpoint; override via ROOM_CATEGORY_PATH if your API differs
     path = os.getenv("ROOM_CATEGORY_PATH", "/motelApi/v1/motelRoomCategories")
 
     cats = _categories()
+    ck = open_checkpoint("seed_room_categories", {
+        "size": size, "only_active": only_active, "status": category_status, "path": path,
+        "categories": [c.get("roomCategoryName") for c in cats],
+    })
+    templates = [category_template(cdef, category_status) for cdef in cats]
+    pager = Paginator(lambda p: _fetch_motels_page(p, size), MOTEL, start_page=ck.cursor, on_page_done=ck.advance)
     total_posts = 0
+    skipped_done = 0
     motels_seen = 0
 
-    while True:
-        body = _fetch_motels_page(page, size)
-        items = _content(body)
+    for page, items in pager.pages():
+        entity_index.record("motels", items)
 
         for m in items:
             motel_id = m.get("motelId")
@@ -184,26 +126,27 @@ def run_once():
             motels_seen += 1
 
             # Create each category for this motel
-            for cdef in cats:
-                payload = {
-                    "motelChainId": chain_id,
-                    "motelId": motel_id,
-                    "displayName": cdef.get("displayName"),
-                    "roomCategoryName": cdef.get("roomCategoryName"),
-                    "description": cdef.get("description") or cdef.get("desicription") or "",
-                    "status": category_status,
-                }
+            for tpl in templates:
+                done_key = f"{motel_id}:{tpl.constant['roomCategoryName']}"
+                if ck.is_done(done_key):
+                    skipped_done += 1
+                    continue
+                ids = {"motelChainId": chain_id, "motelId": motel_id}
+                payload = tpl.payload(**ids)
 
                 try:
-                    resp = _post_room_category(path, payload)
+                    resp = _post_room_category(path, tpl.render(**ids))
                     total_posts += 1
+                    ck.mark_done(done_key)
+                    created = resp.get("response", {}).get("data") if isinstance(resp, dict) else None
+                    if isinstance(created, dict):
+                        entity_index.record("categories", [{**payload, **created}])
                     log.info(json.dumps({
                         "event": "room_category_created",
                         "motelId": motel_id,
                         "motelChainId": chain_id,
                         "roomCategoryName": payload["roomCategoryName"],
-                        "api_path": path,
-                        "resp": resp if isinstance(resp, dict) else None
+                        "motelRoomCategoryId": created.get("motelRoomCategoryId") if isinstance(created, dict) else None,
                     }))
                 except Exception as e:
                     log.error(json.dumps({
@@ -212,20 +155,16 @@ def run_once():
                         "motelChainId": chain_id,
                         "roomCategoryName": payload["roomCategoryName"],
                         "payload": payload,
-                        "payload_raw_json": json.dumps(payload, separators=(',', ':')),
                         "api_path": path,
                         "error": str(e),
                         "error_type": type(e).__name__
                     }))
-
-        pg = _pagination(body)
-        if _is_last(pg, page):
-            break
-        page = int(pg.get("page", page)) + 1
+    ck.complete()
 
     log.info(json.dumps({
         "event": "seed_room_categories_done",
         "motels_processed": motels_seen,
         "total_categories_posted": total_posts,
-        "pages_traversed_up_to": page
+        "skipped_from_checkpoint": skipped_done,
+        "pages_traversed_up_to": pager.page
     }))
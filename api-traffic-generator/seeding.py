@@ -0,0 +1,412 @@
+import os, json, logging, threading, time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from typing import Any, Dict, List, Optional, Set, Tuple
+from .http_client import client, retry_policy
+from .checkpoint import open_checkpoint
+from .data_generators.motel_chain import motel_chain_payload
+from .scenarios import post_motel_from_chain as motels, reservation_from_availability as resv
+from .scenarios.seed_room_categories import _categories, category_template
+from .scenarios.seed_motel_rooms import _extract_room_id_and_updated_at, _make_room_number, _post_room, room_template
+from .templates import Template
+from . import entity_index, pacing
+from .data_generators import unique_names
+
+log = logging.getLogger("seeding")
+
+KINDS = ("chains", "motels", "categories", "rooms", "reservations")
+
+# ---------- plan ----------
+# Targets are totals. Each level is spread evenly over its parents, and the
+# first child index of parent p is closed-form, so the whole plan is computed
+# on the fly: nothing about already-created entities is kept except the
+# parents of the motel subtrees in flight.
+def _share(total: int, parts: int, i: int) -> int:
+    """How many of `total` children parent i of `parts` gets (the first total % parts get one more)."""
+    if parts <= 0:
+        return 0
+    return total // parts + (1 if i < total % parts else 0)
+
+def _first(total: int, parts: int, i: int) -> int:
+    """Global index of parent i's first child."""
+    if parts <= 0:
+        return 0
+    return i * (total // parts) + min(i, total % parts)
+
+class Plan:
+    def __init__(self):
+        self.targets = {
+            "chains": int(os.getenv("SEED_CHAINS", "10")),
+            "motels": int(os.getenv("SEED_MOTELS", "100")),
+            "categories": int(os.getenv("SEED_CATEGORIES", "400")),
+            "rooms": int(os.getenv("SEED_ROOMS", "4000")),
+            "reservations": int(os.getenv("SEED_RESERVATIONS", "0")),
+        }
+
+    def motels(self, chain: int) -> range:
+        t = self.targets
+        start = _first(t["motels"], t["chains"], chain)
+        return range(start, start + _share(t["motels"], t["chains"], chain))
+
+    def categories(self, motel: int) -> range:
+        t = self.targets
+        start = _first(t["categories"], t["motels"], motel)
+        return range(start, start + _share(t["categories"], t["motels"], motel))
+
+    def rooms(self, category: int) -> int:
+        return _share(self.targets["rooms"], self.targets["categories"], category)
+
+    def reservations(self, motel: int) -> int:
+        return _share(self.targets["reservations"], self.targets["motels"], motel)
+
+    def subtree(self, motel: int) -> Dict[str, int]:
+        cats = self.categories(motel)
+        return {"motels": 1, "categories": len(cats), "rooms": sum(self.rooms(c) for c in cats),
+                "reservations": self.reservations(motel)}
+
+# ---------- API ----------
+@retry_policy()
+def _post(path: str, **body: Any) -> Dict[str, Any]:
+    """`json=` or pre-encoded `content=`."""
+    with client("motel") as c:
+        r = c.post(path, **body)
+        r.raise_for_status()
+        try:
+            return r.json()
+        except ValueError:
+            return {}
+
+def _data(resp: Dict[str, Any]) -> Dict[str, Any]:
+    data = resp.get("response", {}).get("data") if isinstance(resp, dict) else None
+    return data if isinstance(data, dict) else {}
+
+# ---------- progress ----------
+class Progress:
+    """Created/failed/skipped per kind; skipped = under a parent that failed, or done before a resume."""
+
+    def __init__(self, targets: Dict[str, int], every: float):
+        self.targets = targets
+        self.every = every
+        self.created = {k: 0 for k in KINDS}
+        self.failed = {k: 0 for k in KINDS}
+        self.skipped = {k: 0 for k in KINDS}
+        self.started = time.monotonic()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def add(self, which: Dict[str, int], kind: str, n: int = 1) -> None:
+        with self._lock:
+            which[kind] += n
+
+    def skip(self, counts: Dict[str, int]) -> None:
+        with self._lock:
+            for k, n in counts.items():
+                self.skipped[k] += n
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            created, failed, skipped = dict(self.created), dict(self.failed), dict(self.skipped)
+        elapsed = time.monotonic() - self.started
+        total = sum(self.targets.values())
+        done = sum(created.values()) + sum(failed.values()) + sum(skipped.values())
+        rate = done / elapsed if elapsed > 0 else 0.0
+        return {
+            "created": created,
+            "failed": failed,
+            "skipped": skipped,
+            "targets": self.targets,
+            "done_pct": round(done / total * 100, 2) if total else 100.0,
+            "entities_per_s": round(rate, 2),
+            "elapsed_s": round(elapsed, 1),
+            "eta_s": round((total - done) / rate, 1) if rate > 0 else None,
+        }
+
+    def _loop(self) -> None:
+        while not self._stop.wait(self.every):
+            log.info(json.dumps({"event": "seed_progress", **self.snapshot()}))
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._loop, name="seed-progress", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+# ---------- seeding ----------
+class Seeder:
+    """
+    Depth-first, streamed: chains are created in order by the calling thread;
+    each motel with its categories, rooms and reservations is one unit of work
+    on a pool of SEED_CONCURRENCY workers, at most 2x that many queued. Memory
+    is bounded by the units in flight whatever the targets are.
+
+    The checkpoint cursor is per motel unit: the next chain to create, the
+    lowest unfinished motel, the motels above it that already finished, and
+    the ids of the chains those open motels belong to. A resume re-runs only
+    the unfinished units, under the chains created before.
+    """
+
+    def __init__(self):
+        self.plan = Plan()
+        self.concurrency = int(os.getenv("SEED_CONCURRENCY", "16"))
+        self.rooms_per_floor = int(os.getenv("SEED_ROOMS_PER_FLOOR", "20"))
+        self.status = os.getenv("SEED_STATUS", "Active")  # categories and rooms; motels use MOTEL_STATUS
+        self.price = os.getenv("SEED_PRICE", "99.00")
+        self.first_date = date.fromisoformat(os.getenv("SEED_RESERVATION_START") or date.today().isoformat())
+        self.days = int(os.getenv("SEED_RESERVATION_DAYS", "365"))
+        self.identity = {
+            "name": os.getenv("RESERVATION_NAME", "John Doe"),
+            "email": os.getenv("RESERVATION_EMAIL", "john.doe@example.com"),
+            "status": os.getenv("RESERVATION_STATUS", "Confirmed"),
+        }
+        self.category_defs = _categories()
+        self._category_tpls: Dict[int, Template] = {}
+        self.progress = Progress(self.plan.targets, float(os.getenv("SEED_PROGRESS_SECONDS", "10")))
+        self.slots = threading.BoundedSemaphore(self.concurrency * 2)
+        # cursor state, under _lock: motels submitted but not finished, motels finished
+        # above the lowest open one, and the chains that open motels still need
+        self._next_chain = 0
+        self._frontier = 0  # every motel below it has been submitted or skipped
+        self._inflight: Set[int] = set()
+        self._finished: Set[int] = set()
+        self._chains: Dict[int, Dict[str, Any]] = {}
+        self.failed_units: List[int] = []  # motels whose unit died on an unexpected error
+        self._lock = threading.Lock()
+        self.ck = open_checkpoint("seed_scale", {**self.plan.targets, "rooms_per_floor": self.rooms_per_floor},
+                                  start_cursor={"chain": 0, "motel": 0, "finished": [], "chains": {}})
+
+    # ----- one entity each -----
+    def _chain(self, i: int) -> Optional[Tuple[str, Dict[str, Any]]]:
+        payload = motel_chain_payload()
+        try:
+            created = _data(_post("/motelApi/v1/motelChains", json=payload))
+        except Exception as e:
+            self._failed("chains", e, {"chain": i})
+            return None
+        chain_id = created.get("motelChainId") or created.get("id")
+        if not chain_id:
+            self._failed("chains", "no motelChainId in response", {"chain": i})
+            return None
+        entity_index.record("chains", [{**payload, **created}])
+        self.progress.add(self.progress.created, "chains")
+        return str(chain_id), payload
+
+    def _motel(self, m: int, k: int, chain_id: str, chain: Dict[str, Any]) -> Optional[str]:
+        payload = motels._compose_payload({**chain, "motelChainId": chain_id})
+        payload["motelName"] = f"{chain.get('motelChainName') or 'Motel Chain'} - Motel {k + 1}"
+        try:
+            motel_id = motels._extract_created_fields(motels._post_motel(payload)).get("motelId")
+        except Exception as e:
+            self._failed("motels", e, {"motel": m})
+            return None
+        if motel_id in (None, "", "None"):
+            self._failed("motels", "no motelId in response", {"motel": m})
+            return None
+        entity_index.record("motels", [{**payload, "motelId": motel_id}])
+        self.progress.add(self.progress.created, "motels")
+        return str(motel_id)
+
+    def _category_template(self, j: int) -> Template:
+        tpl = self._category_tpls.get(j)
+        if tpl is None:
+            d = self.category_defs[j % len(self.category_defs)]
+            # more categories than definitions: "Regular", ..., "Regular 2", ...
+            n = j // len(self.category_defs)
+            tag = f" {n + 1}" if n else ""
+            tpl = category_template({**d, "displayName": d.get("displayName") + tag,
+                                     "roomCategoryName": d.get("roomCategoryName") + tag}, self.status)
+            self._category_tpls[j] = tpl  # racing workers build equal templates; either is fine
+        return tpl
+
+    def _category(self, c: int, j: int, motel_id: str, chain_id: str) -> Optional[Dict[str, Any]]:
+        tpl = self._category_template(j)
+        ids = {"motelChainId": chain_id, "motelId": motel_id}
+        try:
+            created = _data(_post(os.getenv("ROOM_CATEGORY_PATH", "/motelApi/v1/motelRoomCategories"),
+                                  content=tpl.render(**ids)))
+        except Exception as e:
+            self._failed("categories", e, {"category": c})
+            return None
+        if not created.get("motelRoomCategoryId"):
+            self._failed("categories", "no motelRoomCategoryId in response", {"category": c})
+            return None
+        cat = {**tpl.payload(**ids), **created}
+        entity_index.record("categories", [cat])
+        self.progress.add(self.progress.created, "categories")
+        return cat
+
+    def _room(self, r: int, cat: Dict[str, Any], tpl: Template) -> None:
+        floor, slot = divmod(r, self.rooms_per_floor)
+        room = {"roomNumber": _make_room_number(floor, slot + 1), "floor": str(floor)}
+        try:
+            resp = _post_room(tpl.render(**room))
+        except Exception as e:
+            self._failed("rooms", e, {"motelId": cat["motelId"], "roomNumber": room["roomNumber"]})
+            return
+        entity_index.record("rooms", [{**tpl.payload(**room), "roomId": _extract_room_id_and_updated_at(resp).get("roomId")}])
+        self.progress.add(self.progress.created, "rooms")
+
+    def _reservation(self, x: int, cat: Dict[str, Any]) -> None:
+        day = self.first_date + timedelta(days=x % self.days)
+        payload = resv._compose_payload({
+            "motel_id": cat["motelId"],
+            "motel_chain_id": cat["motelChainId"],
+            "motel_room_category_id": cat["motelRoomCategoryId"],
+            "room_type": cat["roomCategoryName"],
+            "date": day.isoformat(),
+            "price": self.price,
+        }, **self.identity)
+        try:
+            created = resv._extract_created_fields(resv._post_reservation(payload))
+        except Exception as e:
+            self._failed("reservations", e, {"motel_id": cat["motelId"], "check_in": payload["check_in"]})
+            return
+        if created.get("motel_reservation_id") in (None, "", "None"):
+            self._failed("reservations", "no motelReservationId in response",
+                         {"motel_id": cat["motelId"], "check_in": payload["check_in"]})
+            return
+        entity_index.record("bookings", [{**payload, "motel_reservation_id": created["motel_reservation_id"]}])
+        self.progress.add(self.progress.created, "reservations")
+
+    def _failed(self, kind: str, error: Any, where: Dict[str, Any]) -> None:
+        self.progress.add(self.progress.failed, kind)
+        log.error(json.dumps({"event": "seed_entity_failed", "kind": kind, **where, "error": str(error)}))
+
+    # ----- one motel subtree (a unit of work) -----
+    def _unit(self, m: int, k: int, chain_id: str, chain: Dict[str, Any]) -> None:
+        try:
+            self._subtree(m, k, chain_id, chain)
+        except pacing.SloAbort:
+            return  # unfinished: stays open, so the checkpoint doesn't move past it
+        except Exception as e:
+            # Entity failures are handled inside _subtree; this is a bug or an
+            # unexpected response. The unit counts as finished so the cursor keeps
+            # moving (a resume won't retry it); the run ends with an error naming it.
+            log.error(json.dumps({"event": "seed_unit_failed", "motel": m, "chain_id": chain_id,
+                                  "error_type": type(e).__name__, "error": str(e)}))
+            with self._lock:
+                self.failed_units.append(m)
+        finally:
+            self.slots.release()
+        with self._lock:
+            self._inflight.discard(m)
+            self._finished.add(m)
+            self.ck.advance(self._cursor())
+
+    def _subtree(self, m: int, k: int, chain_id: str, chain: Dict[str, Any]) -> None:
+        motel_id = self._motel(m, k, chain_id, chain)
+        if motel_id is None:
+            self.progress.skip({kind: n for kind, n in self.plan.subtree(m).items() if kind != "motels"})
+            return
+        cats: List[Dict[str, Any]] = []
+        room_no = 0
+        for j, c in enumerate(self.plan.categories(m)):
+            cat = self._category(c, j, motel_id, chain_id)
+            if cat is None:
+                self.progress.skip({"rooms": self.plan.rooms(c)})
+                continue
+            cats.append(cat)
+            tpl = room_template(cat, self.status)
+            for _ in range(self.plan.rooms(c)):
+                self._room(room_no, cat, tpl)
+                room_no += 1
+        n = self.plan.reservations(m)
+        if n and not cats:
+            self.progress.skip({"reservations": n})
+        elif n:
+            for x in range(n):
+                self._reservation(x, cats[x % len(cats)])
+
+    # ----- checkpoint cursor -----
+    def _cursor(self) -> Dict[str, Any]:
+        """Call with _lock held."""
+        low = min(self._inflight) if self._inflight else self._frontier
+        self._finished = {m for m in self._finished if m > low}
+        self._chains = {i: c for i, c in self._chains.items() if self.plan.motels(i).stop > low}
+        return {"chain": self._next_chain, "motel": low, "finished": sorted(self._finished),
+                "chains": {str(i): c for i, c in self._chains.items()}}
+
+    def _restore(self) -> List[Tuple[int, int, str, Dict[str, Any]]]:
+        """Loads the cursor; counts what is done as skipped and returns the open units to re-run."""
+        cur = self.ck.cursor
+        if isinstance(cur, int):
+            # checkpoint written before progress was kept per motel: a chain index
+            cur = {"chain": cur, "motel": self.plan.motels(cur).start, "finished": [], "chains": {}}
+        self._next_chain = cur["chain"]
+        self._frontier = cur["motel"]
+        self._finished = set(cur["finished"])
+        self._chains = {int(i): c for i, c in cur["chains"].items()}
+        self.progress.skip({"chains": self._next_chain})
+        units = []
+        for i in range(self._next_chain):
+            chain = self._chains.get(i)
+            motels = self.plan.motels(i)
+            for k, m in enumerate(motels):
+                if m < self._frontier or m in self._finished or chain is None:
+                    # done, or under a chain that failed before the resume
+                    self.progress.skip(self.plan.subtree(m))
+                else:
+                    units.append((m, k, chain["motelChainId"], chain))
+        self._frontier = max([self._frontier, *(m + 1 for m, _, _, _ in units)])
+        return units
+
+    def _submit(self, pool: ThreadPoolExecutor, m: int, k: int, chain_id: str, chain: Dict[str, Any]) -> None:
+        self.slots.acquire()
+        with self._lock:
+            self._inflight.add(m)
+            self._frontier = max(self._frontier, m + 1)
+        pool.submit(self._unit, m, k, chain_id, chain)
+
+    def run(self) -> Dict[str, Any]:
+        t = self.plan.targets
+        units = self._restore() if self.ck.resumed else []
+        if self.ck.resumed:
+            log.info(json.dumps({"event": "seed_resumed", "from_chain": self._next_chain,
+                                 "reopened_motels": [m for m, _, _, _ in units]}))
+        log.info(json.dumps({"event": "seed_started", "targets": t, "concurrency": self.concurrency}))
+        self.progress.start()
+        try:
+            with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="seed") as pool:
+                for m, k, chain_id, chain in units:
+                    self._submit(pool, m, k, chain_id, chain)
+                for i in range(self._next_chain, t["chains"]):
+                    motels = self.plan.motels(i)
+                    made = self._chain(i)
+                    chain = None
+                    if made is not None:
+                        chain_id, payload = made
+                        chain = {"motelChainId": chain_id,
+                                 **{f: payload.get(f) for f in ("motelChainName", "state", "pincode")}}
+                    # saved before its motels are submitted, so a resume never creates the chain again
+                    with self._lock:
+                        self._next_chain = i + 1
+                        if chain is not None:
+                            self._chains[i] = chain
+                        else:
+                            self._frontier = max(self._frontier, motels.stop)
+                        self.ck.advance(self._cursor())
+                    if chain is None:
+                        for m in motels:
+                            self.progress.skip(self.plan.subtree(m))
+                        continue
+                    for k, m in enumerate(motels):
+                        self._submit(pool, m, k, chain["motelChainId"], chain)
+        finally:
+            self.progress.stop()
+        if pacing.aborted():
+            # units cut short by the abort are still open: keep the checkpoint for a resume
+            raise pacing.SloAbort("seeding stopped by an SLO abort")
+        self.ck.complete()
+        return {"event": "seed_done", **self.progress.snapshot(), "failed_units": sorted(self.failed_units),
+                "unique_names": unique_names.describe()}
+
+def run_seed() -> None:
+    """TASK=seed_scale: create SEED_CHAINS / SEED_MOTELS / SEED_CATEGORIES / SEED_ROOMS / SEED_RESERVATIONS."""
+    result = Seeder().run()
+    log.info(json.dumps(result))
+    if sum(result["failed"].values()) or result["failed_units"]:
+        raise RuntimeError(f"seeding finished with failures: {result['failed']}, "
+                           f"failed motel units: {result['failed_units']}")
@@ -0,0 +1,236 @@
+import os, itertools, json, logging, math, random, threading, time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from .config import get_settings
+from . import keyspace, metrics, pacing
+from .paginator import MOTEL, RESERVATION, Paginator, motel_items
+from .scenarios import get_motel_chains, get_motels, reservation_by_ids, reservation_from_availability as resv
+
+log = logging.getLogger("sessions")
+
+SCENARIO = "vu_session"
+STEPS = ("browse_chains", "list_motels", "check_availability", "book", "view_booking")
+
+# ---------- think time ----------
+def parse_think(spec: str) -> Callable[[random.Random], float]:
+    """
+    VU_THINK: "exp:<mean_s>", "lognormal:<median_s>:<sigma>", "const:<s>" or "none".
+    """
+    kind, *args = [p.strip() for p in spec.split(":")]
+    kind = kind.lower()
+    if kind in ("", "none"):
+        return lambda rng: 0.0
+    if kind == "const":
+        v = float(args[0])
+        return lambda rng: v
+    if kind == "exp":
+        mean = float(args[0])
+        return lambda rng: rng.expovariate(1.0 / mean) if mean > 0 else 0.0
+    if kind == "lognormal":
+        mu = math.log(float(args[0]))
+        sigma = float(args[1]) if len(args) > 1 else 0.5
+        return lambda rng: rng.lognormvariate(mu, sigma)
+    raise ValueError(f"unknown VU_THINK distribution: {spec!r}")
+
+# ---------- ramp ----------
+def parse_ramp(spec: str) -> List[Tuple[float, int]]:
+    """VU_RAMP: "0:1,30:5,120:10" -> (seconds, users) points, linearly interpolated."""
+    points = []
+    for part in spec.split(","):
+        if part.strip():
+            t, _, n = part.partition(":")
+            points.append((float(t), int(n)))
+    points.sort()
+    if not points or points[0][0] > 0:
+        points.insert(0, (0.0, points[0][1] if points else 1))
+    return points
+
+def users_at(points: List[Tuple[float, int]], t: float) -> int:
+    for (t0, n0), (t1, n1) in zip(points, points[1:]):
+        if t0 <= t < t1:
+            return round(n0 + (n1 - n0) * (t - t0) / (t1 - t0))
+    return points[-1][1]
+
+# ---------- one session ----------
+class SessionAborted(Exception):
+    """A step found nothing to continue with (no chains, no availability, ...)."""
+
+class Session:
+    def __init__(self, rng: random.Random, page_size: int, max_pages: int, identity: Dict[str, str]):
+        self.rng = rng
+        self.page_size = page_size
+        self.max_pages = max_pages
+        self.identity = identity
+        # IDs discovered by earlier steps, reused by later ones
+        self.chain_id: Optional[str] = None
+        self.motel_id: Optional[str] = None
+        self.candidate: Optional[Dict[str, Any]] = None
+        self.booking: Optional[Dict[str, Any]] = None
+
+    def browse_chains(self) -> None:
+        chains = [c for c in motel_items(get_motel_chains._fetch_page(0, self.page_size))
+                  if c.get("motelChainId")]
+        if not chains:
+            raise SessionAborted("no_chains")
+        self.chain_id = keyspace.choice("chains", chains, self.rng)["motelChainId"]
+
+    def list_motels(self) -> None:
+        fallback: List[Dict[str, Any]] = []
+        # a user stops reading as soon as a page has what they want: no prefetch
+        pager = Paginator(lambda p: get_motels._fetch_motels_page(p, self.page_size), MOTEL,
+                          max_pages=self.max_pages, prefetch=False)
+        for _, items in pager.pages():
+            motels = [m for m in items if m.get("motelId")]
+            fallback = fallback or motels
+            mine = [m for m in motels if m.get("motelChainId") == self.chain_id]
+            if mine:
+                self.motel_id = keyspace.choice("motels", mine, self.rng)["motelId"]
+                return
+        if not fallback:
+            raise SessionAborted("no_motels")
+        # chain has no motel on the pages we looked at: continue with one that exists
+        m = keyspace.choice("motels", fallback, self.rng)
+        self.motel_id, self.chain_id = m["motelId"], m.get("motelChainId")
+
+    def check_availability(self) -> None:
+        any_cands: List[Dict[str, Any]] = []
+        page_param = os.getenv("RESV_PAGE_PARAM", "page")
+        per_page_param = os.getenv("RESV_PER_PAGE_PARAM", "per_page")
+        pager = Paginator(lambda p: resv._fetch_availability(p, self.page_size, page_param, per_page_param),
+                          RESERVATION, max_pages=self.max_pages, prefetch=False)
+        for _, items in pager.pages():
+            cands = [it for it in items if resv._is_candidate(it, None, None)]
+            any_cands = any_cands or cands
+            mine = [it for it in cands if it.get("motel_id") == self.motel_id]
+            if mine:
+                self.candidate = resv.choose_candidate(mine, self.rng)
+                return
+        if not any_cands:
+            raise SessionAborted("no_availability")
+        self.candidate = resv.choose_candidate(any_cands, self.rng)
+
+    def book(self) -> None:
+        payload = resv._compose_payload(self.candidate, **self.identity)
+        created = resv._extract_created_fields(resv._post_reservation(payload))
+        self.booking = {**payload, **created}
+
+    def view_booking(self) -> None:
+        body = reservation_by_ids._fetch_reservations_by_ids(
+            self.booking["motel_id"], self.booking["motel_chain_id"])
+        ids = {it.get("motel_reservation_id") for it in reservation_by_ids._reservations_items(body)}
+        if self.booking.get("motel_reservation_id") not in ids:
+            log.warning(json.dumps({
+                "event": "vu_booking_not_visible",
+                "motel_reservation_id": self.booking.get("motel_reservation_id"),
+                "motel_id": self.booking["motel_id"],
+            }))
+
+# ---------- virtual users ----------
+class VirtualUsers:
+    def __init__(self):
+        self.page_size = int(os.getenv("VU_PAGE_SIZE", "25"))
+        self.max_pages = int(os.getenv("VU_MAX_PAGES", "3"))
+        self.think = parse_think(os.getenv("VU_THINK", "exp:2"))
+        self.ramp = parse_ramp(os.getenv("VU_RAMP", "0:1"))
+        self.duration = get_settings().duration_seconds
+        self.identity = {
+            "name": os.getenv("RESERVATION_NAME", "John Doe"),
+            "email": os.getenv("RESERVATION_EMAIL", "john.doe@example.com"),
+            "status": os.getenv("RESERVATION_STATUS", "Confirmed"),
+        }
+        self.counts = {"started": 0, "completed": 0, "aborted": 0, "failed": 0}
+        self.aborts: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._end = 0.0
+
+    def _count(self, key: str, reason: Optional[str] = None) -> None:
+        with self._lock:
+            self.counts[key] += 1
+            if reason:
+                self.aborts[reason] = self.aborts.get(reason, 0) + 1
+
+    def _sleep(self, seconds: float, stop: threading.Event) -> bool:
+        """Think; returns False when the user should stop."""
+        return not stop.wait(min(seconds, max(0.0, self._end - time.monotonic())))
+
+    def _user(self, uid: int, stop: threading.Event) -> None:
+        # with SEED, user N makes the same choices and thinks for the same times every run
+        rng = keyspace.rng(f"vu:{uid}")
+        with metrics.scenario(SCENARIO):
+            while not stop.is_set() and time.monotonic() < self._end and not pacing.aborted():
+                self._count("started")
+                s = Session(rng, self.page_size, self.max_pages, self.identity)
+                t_session = time.perf_counter()
+                outcome, reason = "completed", None
+                for i, step in enumerate(STEPS):
+                    if i and not self._sleep(self.think(rng), stop):
+                        outcome, reason = "aborted", "stopped"
+                        break
+                    t0 = time.perf_counter()
+                    try:
+                        getattr(s, step)()
+                        metrics.record_op(SCENARIO, True, time.perf_counter() - t0, route=f"step:{step}")
+                    except SessionAborted as e:
+                        # the step didn't do its job (nothing to browse/book); its reason is in abort_reasons
+                        metrics.record_op(SCENARIO, False, time.perf_counter() - t0, route=f"step:{step}")
+                        outcome, reason = "aborted", str(e)
+                        break
+                    except pacing.SloAbort:
+                        outcome, reason = "aborted", "slo"
+                        break
+                    except Exception as e:
+                        metrics.record_op(SCENARIO, False, time.perf_counter() - t0, route=f"step:{step}")
+                        log.error(json.dumps({"event": "vu_step_failed", "user": uid, "step": step, "error": str(e)}))
+                        outcome, reason = "failed", step
+                        break
+                metrics.record_op(SCENARIO, outcome == "completed", time.perf_counter() - t_session)
+                self._count(outcome, reason)
+                # think after every session: an aborted or failed one must not turn the
+                # user into a zero-delay loop against an empty or failing backend
+                if not self._sleep(self.think(rng), stop):
+                    break
+
+    def run(self) -> None:
+        log.info(json.dumps({
+            "event": "vu_started",
+            "ramp": self.ramp,
+            "think": os.getenv("VU_THINK", "exp:2"),
+            "duration_s": self.duration,
+        }))
+        start = time.monotonic()
+        self._end = start + self.duration
+        users: List[Tuple[threading.Thread, threading.Event]] = []
+        # never reused: a user started after others left gets a new RNG stream, not a finished user's
+        uids = itertools.count()
+        last_target = -1
+        while time.monotonic() < self._end and not pacing.aborted():
+            target = users_at(self.ramp, time.monotonic() - start)
+            users = [(t, e) for t, e in users if t.is_alive()]
+            active = [(t, e) for t, e in users if not e.is_set()]
+            for _ in range(target - len(active)):
+                stop = threading.Event()
+                t = threading.Thread(target=self._user, args=(next(uids), stop), daemon=True)
+                users.append((t, stop))
+                t.start()
+            for _, e in active[target:]:
+                e.set()  # finishes its current step, then leaves
+            if target != last_target:
+                log.info(json.dumps({"event": "vu_ramp", "elapsed_s": round(time.monotonic() - start, 1), "users": target}))
+                last_target = target
+            time.sleep(0.5)
+        for t, e in users:
+            e.set()
+        for t, _ in users:
+            t.join(timeout=get_settings().read_timeout + 1)
+
+        c = self.counts
+        finished = c["completed"] + c["aborted"] + c["failed"]
+        log.info(json.dumps({
+            "event": "vu_sessions_done",
+            **c,
+            "completion_rate": round(c["completed"] / finished, 4) if finished else None,
+            "abort_reasons": self.aborts,
+        }))
+
+def run_sessions() -> None:
+    """TASK=vu_sessions: closed-loop virtual users running browse -> book -> view sessions."""
+    VirtualUsers().run()
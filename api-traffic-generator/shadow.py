@@ -0,0 +1,203 @@
+import os, json, logging, threading, time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, Optional, Tuple
+import httpx
+from .config import Target, get_settings
+from . import metrics
+
+log = logging.getLogger("shadow")
+
+# Requests that are safe to send twice; anything else is mirrored only with SHADOW_MIRROR_WRITES.
+READ_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+# ---------- body comparison ----------
+def _strip(doc: Any, ignore: frozenset) -> Any:
+    if isinstance(doc, dict):
+        return {k: _strip(v, ignore) for k, v in doc.items() if k not in ignore}
+    if isinstance(doc, list):
+        return [_strip(v, ignore) for v in doc]
+    return doc
+
+def same_body(a: bytes, b: bytes, ignore: frozenset) -> bool:
+    """JSON bodies compare as documents (key order and SHADOW_IGNORE_FIELDS don't count), others byte for byte."""
+    if a == b:
+        return True
+    try:
+        return _strip(json.loads(a), ignore) == _strip(json.loads(b), ignore)
+    except ValueError:
+        return False
+
+# ---------- per route ----------
+class _Pairs:
+    """Latency of the same requests on both targets; only requests both answered are paired."""
+    __slots__ = ("primary", "candidate", "delta_total", "slower", "body_mismatches",
+                 "status_mismatches", "candidate_errors", "primary_errors", "logged")
+
+    def __init__(self):
+        self.primary = metrics.Histogram()
+        self.candidate = metrics.Histogram()
+        self.delta_total = 0.0
+        self.slower = 0
+        self.body_mismatches = 0
+        self.status_mismatches = 0
+        self.candidate_errors = 0
+        self.primary_errors = 0
+        self.logged = 0
+
+    def summary(self) -> Dict[str, Any]:
+        n = self.primary.count
+        row: Dict[str, Any] = {"pairs": n}
+        for q in (50, 95, 99):
+            p, c = self.primary.percentile(q), self.candidate.percentile(q)
+            row[f"primary_p{q}_ms"] = round(p * 1000, 3) if p is not None else None
+            row[f"candidate_p{q}_ms"] = round(c * 1000, 3) if c is not None else None
+            # candidate minus primary: positive means the candidate is slower
+            row[f"delta_p{q}_ms"] = round((c - p) * 1000, 3) if p is not None and c is not None else None
+        row["delta_mean_ms"] = round(self.delta_total / n * 1000, 3) if n else None
+        row["candidate_slower_rate"] = round(self.slower / n, 5) if n else None
+        row.update(body_mismatches=self.body_mismatches, status_mismatches=self.status_mismatches,
+                   candidate_errors=self.candidate_errors, primary_errors=self.primary_errors)
+        return row
+
+# ---------- shadow target ----------
+class Shadow:
+    """
+    Sends a copy of each primary request to SHADOW_BASE_URL from a small pool of
+    its own, so the candidate's latency never adds to the scenario's. The
+    candidate client is a plain httpx.Client: its traffic stays out of the
+    metrics registry, results file and exporter, which describe the primary.
+    """
+
+    def __init__(self, target: str, base_url: str, primary_base_url: str, mirror_writes: bool,
+                 token: Optional[str], headers: Dict[str, str], timeout: httpx.Timeout, limits: httpx.Limits):
+        self.target = target
+        self.base_url = base_url.rstrip("/")
+        self.prefix = httpx.URL(primary_base_url).path.rstrip("/")
+        self.mirror_writes = mirror_writes
+        self.ignore = frozenset(f.strip() for f in os.getenv("SHADOW_IGNORE_FIELDS", "").split(",") if f.strip())
+        self.mismatch_log = int(os.getenv("SHADOW_MISMATCH_LOG", "5"))
+        concurrency = int(os.getenv("SHADOW_CONCURRENCY", "32"))
+        self.headers = dict(headers)
+        if token:
+            self.headers["Authorization"] = f"Bearer {token}"
+        self.client = httpx.Client(headers=self.headers, timeout=timeout, limits=limits)
+        self.pool = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="shadow")
+        # copies waiting or in flight; past this the copy is skipped rather than queued
+        self.slots = threading.BoundedSemaphore(concurrency * 2)
+        self.routes: Dict[Tuple[str, str], _Pairs] = {}
+        self.skipped = 0
+        self.lock = threading.Lock()
+
+    def wants(self, request: httpx.Request) -> bool:
+        return request.method in READ_METHODS or self.mirror_writes
+
+    def _copy(self, request: httpx.Request) -> httpx.Request:
+        path = request.url.raw_path.decode("ascii")
+        if self.prefix and path.startswith(self.prefix):
+            path = path[len(self.prefix):]
+        headers = {k: v for k, v in request.headers.items() if k.lower() not in ("host", "content-length")}
+        if "Authorization" in self.headers:
+            headers["Authorization"] = self.headers["Authorization"]
+        return self.client.build_request(request.method, self.base_url + path, headers=headers,
+                                         content=request.content or None)
+
+    def _send(self, copy: httpx.Request) -> Tuple[int, float, bytes]:
+        t0 = time.perf_counter()
+        try:
+            r = self.client.send(copy)
+        except httpx.HTTPError:
+            return 0, time.perf_counter() - t0, b""
+        finally:
+            self.slots.release()
+        return r.status_code, time.perf_counter() - t0, r.content
+
+    def submit(self, request: httpx.Request) -> Optional[Future]:
+        """Starts the copy now, so both targets see the request at the same moment."""
+        if not self.slots.acquire(blocking=False):
+            with self.lock:
+                self.skipped += 1
+            return None
+        try:
+            return self.pool.submit(self._send, self._copy(request))
+        except Exception:
+            self.slots.release()
+            raise
+
+    def observe(self, route: str, pending: Future, status: int, seconds: float, body: Optional[bytes]) -> None:
+        """Pairs the primary outcome with the copy once it lands (status 0 = transport error)."""
+        key = (metrics.current_scenario(), route)
+        pending.add_done_callback(lambda f: self._record(key, status, seconds, body, *f.result()))
+
+    def _record(self, key: Tuple[str, str], status: int, seconds: float, body: Optional[bytes],
+                c_status: int, c_seconds: float, c_body: bytes) -> None:
+        # compare outside the lock: JSON parsing is the expensive part
+        body_differs = (status == c_status and body is not None and c_status != 0
+                        and not same_body(body, c_body, self.ignore))
+        with self.lock:
+            p = self.routes.get(key)
+            if p is None:
+                p = self.routes[key] = _Pairs()
+            if status == 0:
+                p.primary_errors += 1
+            if c_status == 0:
+                p.candidate_errors += 1
+            if status == 0 or c_status == 0:
+                return
+            p.primary.record(seconds)
+            p.candidate.record(c_seconds)
+            p.delta_total += c_seconds - seconds
+            if c_seconds > seconds:
+                p.slower += 1
+            mismatch = None
+            if status != c_status:
+                p.status_mismatches += 1
+                mismatch = "status"
+            elif body_differs:
+                p.body_mismatches += 1
+                mismatch = "body"
+            if mismatch is None or p.logged >= self.mismatch_log:
+                return
+            p.logged += 1
+        log.warning(json.dumps({"event": "shadow_mismatch", "scenario": key[0], "route": key[1], "on": mismatch,
+                                "primary_status": status, "candidate_status": c_status,
+                                "primary_bytes": len(body or b""), "candidate_bytes": len(c_body)}))
+
+    def close(self) -> Dict[str, Any]:
+        # let copies still in flight land so they are counted
+        self.pool.shutdown(wait=True)
+        self.client.close()
+        with self.lock:
+            routes = {f"{sc} {rt}": p.summary() for (sc, rt), p in sorted(self.routes.items())}
+            report = {
+                "event": "shadow_summary",
+                "target": self.target,
+                "candidate": self.base_url,
+                "mirror_writes": self.mirror_writes,
+                "ignored_fields": sorted(self.ignore),
+                "skipped": self.skipped,
+                "routes": routes,
+            }
+        mismatched = any(r["body_mismatches"] or r["status_mismatches"] for r in routes.values())
+        (log.warning if mismatched else log.info)(json.dumps(report))
+        return report
+
+# ---------- wiring used by http_client / run_task ----------
+_shadows: Dict[str, Shadow] = {}
+_lock = threading.Lock()
+
+def get(target: Target, headers: Dict[str, str], timeout: httpx.Timeout, limits: httpx.Limits) -> Optional[Shadow]:
+    """The target's shadow when it has a SHADOW_BASE_URL, created with the primary's client settings."""
+    if not target.shadow_base_url:
+        return None
+    with _lock:
+        if target.name not in _shadows:
+            s = _shadows[target.name] = Shadow(target.name, target.shadow_base_url, target.base_url,
+                                               get_settings().shadow_mirror_writes, target.shadow_api_token,
+                                               headers, timeout, limits)
+            log.info(json.dumps({"event": "shadow_enabled", "target": target.name, "candidate": s.base_url,
+                                 "mirror_writes": s.mirror_writes}))
+        return _shadows[target.name]
+
+def log_summary() -> None:
+    for s in _shadows.values():
+        s.close()
@@ -0,0 +1,122 @@
+import json, logging, threading, time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+from .config import get_settings
+from . import metrics, pacing
+
+log = logging.getLogger("slo")
+
+# process exit code of a run aborted on a live SLO breach (baseline regressions exit 3)
+EXIT_SLO = 4
+
+# ---------- watcher ----------
+class Watcher:
+    """
+    Every SLO_INTERVAL_SECONDS, judges each HTTP route on the requests of the
+    last SLO_WINDOW_SECONDS: p99 against SLO_P99_MS, error rate against
+    SLO_ERROR_RATE. Windows with fewer than SLO_MIN_REQUESTS requests are not
+    judged. A route breaching on SLO_SUSTAIN evaluations in a row is clearly
+    broken: the run is aborted through pacing.abort(), which stops every pacer
+    at its next tick, and the process exits with EXIT_SLO.
+    """
+
+    def __init__(self):
+        s = get_settings()
+        self.p99_ms = s.slo_p99_ms
+        self.error_rate = s.slo_error_rate
+        self.window = s.slo_window_seconds
+        self.min_requests = s.slo_min_requests
+        self.sustain = s.slo_sustain
+        self.interval = s.slo_interval_seconds
+        # cumulative registry snapshots covering the window; the oldest is the window's start
+        self._snapshots: Deque[Tuple[float, Dict[Tuple[str, str], metrics.Series]]] = deque()
+        self._streaks: Dict[Tuple[str, str], int] = {}
+        self.evaluations = 0
+        self.breached_routes: Dict[str, int] = {}
+        self.aborted: Optional[Dict[str, Any]] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _breaches(self, w: metrics.Series) -> List[Dict[str, Any]]:
+        out = []
+        n = w.hist.count
+        if self.p99_ms is not None:
+            p99 = w.hist.percentile(99)
+            if p99 is not None and p99 * 1000 > self.p99_ms:
+                out.append({"metric": "p99_ms", "value": round(p99 * 1000, 3), "threshold": self.p99_ms})
+        # an empty window has no error rate (errors are counted with the latency)
+        if self.error_rate is not None and n > 0 and w.errors / n > self.error_rate:
+            out.append({"metric": "error_rate", "value": round(w.errors / n, 5), "threshold": self.error_rate})
+        return out
+
+    def evaluate(self, now: float) -> None:
+        current = metrics.REGISTRY.series()
+        self._snapshots.append((now, current))
+        while len(self._snapshots) > 1 and self._snapshots[1][0] <= now - self.window:
+            self._snapshots.popleft()
+        base = self._snapshots[0][1]
+        self.evaluations += 1
+        for key, s in current.items():
+            if not metrics.is_http_route(key[1]):
+                continue
+            w = s.since(base.get(key))
+            if w.hist.count < self.min_requests:
+                # too few requests to judge either way: neither breaks nor extends a streak
+                continue
+            breaches = self._breaches(w)
+            if not breaches:
+                self._streaks[key] = 0
+                continue
+            streak = self._streaks[key] = self._streaks.get(key, 0) + 1
+            name = f"{key[0]} {key[1]}"
+            self.breached_routes[name] = self.breached_routes.get(name, 0) + 1
+            if streak == 1:
+                log.warning(json.dumps({"event": "slo_breach", "route": name, "window_requests": w.hist.count,
+                                        "breaches": breaches, "sustain": self.sustain}))
+            if streak >= self.sustain and self.aborted is None:
+                self.aborted = {"route": name, "window_requests": w.hist.count, "breaches": breaches,
+                                "consecutive": streak, "window_s": self.window}
+                log.error(json.dumps({"event": "slo_abort", **self.aborted,
+                                      "note": f"stopping the run early; exit code {EXIT_SLO}"}))
+                pacing.abort()
+
+    def _loop(self) -> None:
+        self._snapshots.append((time.monotonic(), metrics.REGISTRY.series()))
+        while not self._stop.wait(self.interval):
+            self.evaluate(time.monotonic())
+            if self.aborted is not None:
+                return
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._loop, name="slo", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> Dict[str, Any]:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        return {
+            "p99_ms": self.p99_ms,
+            "error_rate": self.error_rate,
+            "window_s": self.window,
+            "evaluations": self.evaluations,
+            "breached_evaluations": self.breached_routes,
+            "aborted": self.aborted,
+        }
+
+# ---------- wiring used by run_task ----------
+_watcher: Optional[Watcher] = None
+
+def start() -> None:
+    """Starts the watcher when at least one threshold (SLO_P99_MS / SLO_ERROR_RATE) is set."""
+    global _watcher
+    s = get_settings()
+    if (s.slo_p99_ms is not None or s.slo_error_rate is not None) and _watcher is None:
+        _watcher = Watcher()
+        _watcher.start()
+
+def stop() -> Dict[str, Any]:
+    return _watcher.stop() if _watcher is not None else {}
+
+def aborted() -> bool:
+    return _watcher is not None and _watcher.aborted is not None
@@ -0,0 +1,7 @@
+# A Job can't be re-applied once it ran: replace the previous run's controller
+kubectl --kubeconfig ../cluster/kubeconfig-api-traffic-generator \
+  --context api-traffic-generator \
+  -n api-traffic delete job trafficgen-controller --ignore-not-found
+kubectl --kubeconfig ../cluster/kubeconfig-api-traffic-generator \
+  --context api-traffic-generator \
+  -n api-traffic apply -f controller.yaml -f agents.yaml
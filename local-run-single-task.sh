@@ -80,7 +80,7 @@ run_task() {
 
   echo "[$(ts)] Using DOCKER_IMAGE=${DOCKER_IMAGE}"
   echo "[$(ts)] Using BASE_URL=${base_url}"
-  if ((${#envs[@]:-0})); then
+  if ((${#envs[@]})); then
     echo "[$(ts)] Extra env: ${envs[*]}"
   fi
 
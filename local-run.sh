@@ -15,12 +15,27 @@ BASE_URL_DEFAULT="${BASE_URL:-http://host.docker.internal:8085}"
 BASE_URL_MOTEL="${BASE_URL_MOTEL:-$BASE_URL_DEFAULT}"
 BASE_URL_RESV="${BASE_URL_RESV:-${BASE_URL2:-http://host.docker.internal:8086}}"
 
+# Shadow mode: also send each task's reads to a candidate build of the same service and
+# compare latency and bodies (shadow_summary). SHADOW_MIRROR_WRITES=true copies writes too.
+SHADOW_BASE_URL_MOTEL="${SHADOW_BASE_URL_MOTEL:-}"
+SHADOW_BASE_URL_RESV="${SHADOW_BASE_URL_RESV:-}"
+
 # Add-host flag to reach host services from Docker on Linux; safe to keep on Mac as well.
 ADD_HOST_FLAG="${ADD_HOST_FLAG:---add-host=host.docker.internal:host-gateway}"
 
 # Delay (seconds) between tasks
 DELAY_SECS="${DELAY_SECS:-2}"
 
+# Performance smoke test: set BASELINE_DIR to a host directory (one <task>.json per task).
+# BASELINE_MODE=record stores this run as the baseline; check (default) fails the script
+# when any task regresses past the BASELINE_* tolerances.
+BASELINE_DIR="${BASELINE_DIR:-}"
+BASELINE_MODE="${BASELINE_MODE:-check}"
+REGRESSION_RC=3
+# Live SLO (SLO_P99_MS / SLO_ERROR_RATE, see readMe): a task clearly breaching it stops early with this code
+SLO_ABORT_RC=4
+REGRESSED=()
+
 # -----------------------------
 # Helpers
 # -----------------------------
@@ -54,17 +69,38 @@ run_task() {
   print_hdr "Starting task: ${task_name}"
 
   # Build docker -e args
-  local -a docker_env_flags=(-e "TASK=${task_name}" -e "BASE_URL=${base_url}")
+  # Both services as named targets too, so mixes and cross-service tasks reach each one
+  local -a docker_env_flags=(-e "TASK=${task_name}" -e "BASE_URL=${base_url}"
+    -e "MOTEL_BASE_URL=${BASE_URL_MOTEL}" -e "RESERVATION_BASE_URL=${BASE_URL_RESV}")
   # Safe expansion even if envs is empty
   for kv in "${envs[@]:-}"; do
-    docker_env_flags+=(-e "$kv")
+    [[ -n "$kv" ]] && docker_env_flags+=(-e "$kv")
+  done
+  [[ -n "${SHADOW_BASE_URL_MOTEL}" ]] && docker_env_flags+=(-e "MOTEL_SHADOW_BASE_URL=${SHADOW_BASE_URL_MOTEL}")
+  [[ -n "${SHADOW_BASE_URL_RESV}" ]] && docker_env_flags+=(-e "RESERVATION_SHADOW_BASE_URL=${SHADOW_BASE_URL_RESV}")
+  if [[ -n "${SHADOW_BASE_URL_MOTEL}${SHADOW_BASE_URL_RESV}" ]]; then
+    for var in SHADOW_MIRROR_WRITES SHADOW_API_TOKEN SHADOW_IGNORE_FIELDS; do
+      [[ -n "${!var:-}" ]] && docker_env_flags+=(-e "${var}=${!var}")
+    done
+  fi
+  for var in SLO_P99_MS SLO_ERROR_RATE SLO_WINDOW_SECONDS SLO_MIN_REQUESTS SLO_SUSTAIN; do
+    [[ -n "${!var:-}" ]] && docker_env_flags+=(-e "${var}=${!var}")
   done
+  if [[ -n "${BASELINE_DIR}" ]]; then
+    mkdir -p "${BASELINE_DIR}"
+    docker_env_flags+=(-v "$(cd "${BASELINE_DIR}" && pwd):/baselines"
+      -e "BASELINE_FILE=/baselines/${task_name}.json" -e "BASELINE_MODE=${BASELINE_MODE}")
+    for var in BASELINE_P50_TOLERANCE BASELINE_P99_TOLERANCE BASELINE_ERROR_RATE_TOLERANCE \
+               BASELINE_RPS_TOLERANCE BASELINE_MIN_COUNT; do
+      [[ -n "${!var:-}" ]] && docker_env_flags+=(-e "${var}=${!var}")
+    done
+  fi
 
   echo "[$(date +"%Y-%m-%d %H:%M:%S")] Using DOCKER_IMAGE=${DOCKER_IMAGE}"
   echo "[$(date +"%Y-%m-%d %H:%M:%S")] Using BASE_URL=${base_url}"
 
   # Print extras only if present (safe length check under nounset)
-  if ((${#envs[@]:-0})); then
+  if ((${#envs[@]})); then
     echo "[$(date +"%Y-%m-%d %H:%M:%S")] Extra env: ${envs[*]}"
   fi
 
@@ -73,6 +109,11 @@ run_task() {
 
   if [[ $rc -eq 0 ]]; then
     echo "[$(date +"%Y-%m-%d %H:%M:%S")] ✅ Completed task: ${task_name} (exit code 0)"
+  elif [[ $rc -eq $REGRESSION_RC && -n "${BASELINE_DIR}" ]]; then
+    echo "[$(date +"%Y-%m-%d %H:%M:%S")] 📉 Completed task: ${task_name} but regressed against its baseline (see baseline_check)"
+    REGRESSED+=("${task_name}")
+  elif [[ $rc -eq $SLO_ABORT_RC ]]; then
+    echo "[$(date +"%Y-%m-%d %H:%M:%S")] 🛑 Stopped task: ${task_name} early on an SLO breach (see slo_abort)"
   else
     echo "[$(date +"%Y-%m-%d %H:%M:%S")] ❌ Completed task: ${task_name} with errors (exit code ${rc})"
   fi
@@ -180,3 +221,8 @@ run_task "reservation_by_ids" "${BASE_URL_RESV}" \
 
 echo
 echo "[$(ts)] 🎉 All tasks attempted."
+
+if ((${#REGRESSED[@]})); then
+  echo "[$(ts)] ❌ Regressed against baseline: ${REGRESSED[*]}"
+  exit 1
+fi